@@ -1,5 +1,131 @@
 import argparse
+import sys
+import time
+from src.core.batch import check_output_names, list_videos_in_dir, load_manifest, run_batch
+from src.core.config import Config
 from src.core.pipeline import Pipeline
+from src.core.shard import merge_shards
+from src.util.cache import list_cache_entries, prune_cache
+from src.util.profiler import profiler
+from src.util.timestamp import parse_time
+
+
+def run_cache_command(args: argparse.Namespace) -> None:
+    """
+    キャッシュ（output/cache と output/frames）の一覧表示・削除を行う。
+    """
+    config = Config(args.config)
+    cache_dir = config.get("output", "cache", default="output/cache")
+    frames_root = config.get("output", "frames", default="output/frames")
+
+    if args.cache_command == "stats":
+        entries = list_cache_entries(cache_dir, frames_root)
+        for entry in entries:
+            last_used = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["last_used"]))
+            print(f"{entry['size'] / 1024 ** 2:10.1f} MB  {last_used}  {entry['path']}")
+        total = sum(entry["size"] for entry in entries)
+        print(f"合計: {len(entries)} 件、{total / 1024 ** 2:.1f} MB")
+    elif args.cache_command == "prune":
+        max_mb = args.max_mb if args.max_mb is not None else config.get("output", "cache_max_mb", default=0)
+        if not max_mb or max_mb <= 0:
+            print("上限が設定されていない（output.cache_max_mb が 0）ため削除しません。--max-mb で残す合計サイズを指定してください。")
+            sys.exit(1)
+        removed = prune_cache(cache_dir, frames_root, int(max_mb * 1024 ** 2))
+        for entry in removed:
+            print(f"削除: {entry['path']}")
+        print(f"{len(removed)} 件、{sum(entry['size'] for entry in removed) / 1024 ** 2:.1f} MB を削除しました。")
+
+
+def run_reclassify_command(args: argparse.Namespace) -> None:
+    """
+    キャッシュした類似度から閾値ごとの試合数を表示する。閾値が1つの場合はタイムスタンプも保存する。
+    """
+    pipeline = Pipeline(args.input, args.config)
+    try:
+        rows = pipeline.reclassify(args.threshold)
+    except FileNotFoundError as e:
+        print(e)
+        sys.exit(1)
+    base = next((row["match_count"] for row in rows if row["threshold"] == pipeline.threshold), None)
+    print(f"{'閾値':>8}{'試合数':>8}")
+    for row in rows:
+        diff = f"  （{row['match_count'] - base:+d}）" if base is not None else ""
+        print(f"{row['threshold']:>10.3f}{row['match_count']:>9}{diff}")
+
+
+def run_merge_command(args: argparse.Namespace) -> None:
+    """
+    時間範囲ごとに走査した結果を連結し、画面判定結果のキャッシュとタイムスタンプを保存する。
+    """
+    try:
+        merge_shards(args.shard_dir, args.config)
+    except (FileNotFoundError, ValueError) as e:
+        print(e)
+        sys.exit(1)
+
+
+def run_batch_command(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    """
+    ディレクトリまたはマニフェストに含まれる動画を一括処理する。失敗した動画があれば終了コード1で終了する。
+    """
+    if sum(bool(value) for value in (args.input, args.input_dir, args.manifest)) > 1:
+        parser.error("--input、--input-dir、--manifest は同時に指定できません")
+    if args.follow:
+        parser.error("一括処理では --follow を指定できません")
+    if args.start is not None or args.end is not None:
+        parser.error("一括処理では --start・--end を指定できません")
+    if args.workers > 1:
+        parser.error("一括処理では --workers を指定できません（動画単位の並列数は --jobs で指定してください）")
+
+    video_paths = list_videos_in_dir(args.input_dir) if args.input_dir else load_manifest(args.manifest)
+    if not video_paths:
+        parser.error("処理する動画がありません")
+    try:
+        check_output_names(video_paths)
+    except ValueError as e:
+        parser.error(str(e))
+
+    summary = run_batch(video_paths, args.config, with_ocr=args.with_ocr, jobs=args.jobs, decoder=args.decoder)
+    if any(row["status"] != "ok" for row in summary):
+        sys.exit(1)
+
+
+def run_command(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    """
+    一括処理または1本の動画（--follow を含む）の処理を実行する。
+    """
+    if args.input_dir or args.manifest:
+        run_batch_command(parser, args)
+        return
+    if not args.input:
+        parser.error("--input、--input-dir、--manifest のいずれかを指定してください")
+    if args.follow and args.with_ocr:
+        parser.error("--follow と --with-ocr は同時に指定できません")
+    raw_format = None
+    if args.input == "-":
+        if not args.follow or not args.raw_size:
+            parser.error("標準入力を使う場合は --follow と --raw-size を指定してください")
+        width, height = (int(value) for value in args.raw_size.lower().split("x"))
+        raw_format = (width, height, args.raw_fps)
+
+    try:
+        pipeline = Pipeline(
+            args.input, args.config, with_ocr=args.with_ocr, workers=args.workers, follow=args.follow,
+            raw_format=raw_format, decoder=args.decoder, start=args.start, end=args.end,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    pipeline.run_pipeline()
+
+
+def time_arg(text: str) -> float:
+    """
+    --start・--end の時刻（秒または hh:mm:ss）を秒数に変換する。
+    """
+    try:
+        return parse_time(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
 
 
 def main() -> None:
@@ -7,14 +133,68 @@ def main() -> None:
     コマンドライン引数を受け取り、パイプライン処理を実行する。
     """
     parser = argparse.ArgumentParser(description="EXVS2IB 戦績トラッカー")
-    parser.add_argument("--input", required=True, help="入力動画ファイルのパス")
+    parser.add_argument("--input", help="入力動画ファイルのパス（--follow 時は - で標準入力の生フレームを読む）")
+    parser.add_argument("--input-dir", help="このディレクトリ直下の動画をすべて一括処理する")
+    parser.add_argument("--manifest", help="1行に1つの動画パスを書いたファイル。記載した動画をすべて一括処理する")
     parser.add_argument("--config", default="config/config.yaml", help="設定ファイルのパス")
     parser.add_argument("--with-ocr", action="store_true",
                         help="【実験的】プレイヤー名・機体名・勝敗も抽出する（精度は保証されない）")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="フレーム抽出・画面判定の並列プロセス数（動画を時間範囲で分割して処理する）")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="一括処理で同時に処理する動画数（省略時はCPUコア数）")
+    parser.add_argument("--decoder", choices=["opencv", "ffmpeg"],
+                        help="フレームのデコーダー（省略時は設定ファイルの video.decoder.backend）")
+    parser.add_argument("--follow", action="store_true",
+                        help="録画中の動画ファイルや標準入力を逐次処理し、試合が確定するたびにタイムスタンプを追記する")
+    parser.add_argument("--raw-size", help="標準入力の生フレーム（bgr24）の解像度。例: 1280x720")
+    parser.add_argument("--raw-fps", type=float, default=30.0, help="標準入力の生フレームのFPS")
+    parser.add_argument("--start", type=time_arg, metavar="TIME",
+                        help="この時刻（秒または hh:mm:ss）以降だけを走査し、分割走査の結果として保存する（merge で連結する）")
+    parser.add_argument("--end", type=time_arg, metavar="TIME",
+                        help="この時刻（秒または hh:mm:ss）より前だけを走査し、分割走査の結果として保存する")
+    parser.add_argument("--profile", metavar="OUT_JSON",
+                        help="処理段ごとの所要時間・処理数・最大メモリ使用量を計測し、JSONファイルに保存する")
+
+    subparsers = parser.add_subparsers(dest="command")
+    cache_parser = subparsers.add_parser("cache", help="キャッシュの管理")
+    cache_subparsers = cache_parser.add_subparsers(dest="cache_command", required=True)
+    # サブコマンドの後ろでも --config を指定できるようにする（省略時は上位の既定値を使う）
+    config_parent = argparse.ArgumentParser(add_help=False)
+    config_parent.add_argument("--config", default=argparse.SUPPRESS, help="設定ファイルのパス")
+    cache_subparsers.add_parser("stats", parents=[config_parent], help="キャッシュの一覧と合計サイズを表示する")
+    prune_parser = cache_subparsers.add_parser("prune", parents=[config_parent], help="最終利用日時の古いキャッシュから削除する")
+    prune_parser.add_argument("--max-mb", type=float, default=None,
+                              help="残す合計サイズの上限（MB）。省略時は設定ファイルの output.cache_max_mb")
+    reclassify_parser = subparsers.add_parser(
+        "reclassify", parents=[config_parent], help="キャッシュした類似度から、閾値を変えたときの試合数を求める（動画はデコードしない）",
+    )
+    reclassify_parser.add_argument("--input", required=True, help="走査済みの動画ファイルのパス")
+    reclassify_parser.add_argument("--threshold", type=float, nargs="+", required=True,
+                                   help="画面判定の閾値（複数指定で一括比較。1つの場合はタイムスタンプも保存する）")
+    merge_parser = subparsers.add_parser(
+        "merge", parents=[config_parent], help="時間範囲ごとに走査した結果を連結し、タイムスタンプを保存する",
+    )
+    merge_parser.add_argument("shard_dir", help="分割走査の結果のディレクトリ（output/shards/<動画名>_<キャッシュキー>）")
     args = parser.parse_args()
 
-    pipeline = Pipeline(args.input, args.config, with_ocr=args.with_ocr)
-    pipeline.run_pipeline()
+    if args.command == "cache":
+        run_cache_command(args)
+        return
+    if args.command == "reclassify":
+        run_reclassify_command(args)
+        return
+    if args.command == "merge":
+        run_merge_command(args)
+        return
+    if args.profile:
+        profiler.enable()
+    try:
+        run_command(parser, args)
+    finally:
+        if args.profile:
+            profiler.save(args.profile)
+            print(f"計測結果を {args.profile} に保存しました。")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,145 @@
+import os
+import time
+import traceback
+import cv2
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from src.core.config import Config
+from src.core.pipeline import Pipeline
+from src.ocr import Matcher, OcrEngine, OcrMemo, create_ocr_engine, create_ocr_memo
+from src.screen.classifier import ScreenClassifier
+from src.util.io import save_dataframe_csv
+from src.util.profiler import profiler
+
+# 入力ディレクトリから処理対象とする動画の拡張子
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".mov", ".avi", ".webm", ".flv", ".ts")
+
+# 一括処理のまとめCSVの列
+SUMMARY_COLUMNS = ["video", "status", "match_count", "output_path", "elapsed_sec", "error"]
+
+
+def list_videos_in_dir(input_dir: str) -> list[str]:
+    """
+    ディレクトリ直下の動画ファイルのパスを名前順に返す。
+    """
+    names = sorted(name for name in os.listdir(input_dir) if name.lower().endswith(VIDEO_EXTENSIONS))
+    return [os.path.join(input_dir, name) for name in names]
+
+
+def load_manifest(manifest_path: str) -> list[str]:
+    """
+    1行に1つの動画パスを書いたマニフェストファイルを読み込む。
+    空行と # で始まる行は無視し、相対パスはマニフェストのあるディレクトリからのパスとして扱う。
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    videos = []
+    with open(manifest_path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            videos.append(os.path.normpath(os.path.join(base_dir, line)))
+    return videos
+
+
+def check_output_names(video_paths: list[str]) -> None:
+    """
+    出力ファイル名（動画名）が重複する動画がないか確認する。重複があれば ValueError を送出する。
+    """
+    seen: dict[str, str] = {}
+    for path in video_paths:
+        basename = os.path.splitext(os.path.basename(path))[0]
+        if basename in seen:
+            raise ValueError(f"動画名が重複しているため出力を区別できません: {seen[basename]}, {path}")
+        seen[basename] = path
+
+
+# ワーカープロセスごとに保持し、動画をまたいで使い回す画面判定器・Matcher・OCRエンジン・OCRの記憶
+_worker_classifiers: list[ScreenClassifier] = []
+_worker_matcher: Matcher | None = None
+_worker_ocr_engine: OcrEngine | None = None
+_worker_ocr_memo: OcrMemo | None = None
+
+
+def _init_batch_worker(config_path: str, with_ocr: bool, profile: bool = False) -> None:
+    """
+    ワーカープロセスの初期化処理。テンプレート画像・候補リスト・OCRの言語モデルの読み込みを1度だけ行う。
+    profile=True の場合はワーカープロセスでも処理段ごとの計測を行う。
+    """
+    global _worker_classifiers, _worker_matcher, _worker_ocr_engine, _worker_ocr_memo
+    # プロセス並列と OpenCV 内部のスレッド並列が競合しないようにする
+    cv2.setNumThreads(1)
+    if profile:
+        profiler.enable()
+    config = Config(config_path)
+    threads = config.get("video", "pipeline", "threads", default=0)
+    _worker_classifiers = [ScreenClassifier(config_path) for _ in range(max(1, threads))]
+    _worker_matcher = Matcher(config) if with_ocr else None
+    _worker_ocr_engine = create_ocr_engine(config) if with_ocr else None
+    _worker_ocr_memo = create_ocr_memo(config) if with_ocr else None
+
+
+def _process_video(video_path: str, config_path: str, with_ocr: bool, decoder: str | None) -> dict:
+    """
+    ワーカープロセスで1本の動画を処理し、まとめCSVの1行分と処理段ごとの計測結果（"profile"）を返す。
+    例外は送出せずに失敗として記録し、残りの動画の処理を続けられるようにする。
+    """
+    start = time.perf_counter()
+    row = {"video": video_path, "status": "ok", "match_count": None, "output_path": None, "error": None}
+    try:
+        basename = os.path.splitext(os.path.basename(video_path))[0]
+        pipeline = Pipeline(
+            video_path, config_path, with_ocr=with_ocr, decoder=decoder,
+            classifiers=_worker_classifiers, matcher=_worker_matcher, ocr_engine=_worker_ocr_engine,
+            ocr_memo=_worker_ocr_memo, screen_log_name=f"screen_log_{basename}.csv",
+        )
+        row.update(pipeline.run_pipeline())
+    except Exception as e:
+        traceback.print_exc()
+        row.update(status="failed", error=f"{type(e).__name__}: {e}")
+    row["elapsed_sec"] = round(time.perf_counter() - start, 1)
+    row["profile"] = profiler.take()
+    return row
+
+
+def run_batch(
+    video_paths: list[str],
+    config_path: str,
+    with_ocr: bool = False,
+    jobs: int | None = None,
+    decoder: str | None = None,
+) -> list[dict]:
+    """
+    複数の動画をプロセスプールで並列に処理し、動画ごとの結果と一括処理のまとめCSVを保存する。
+    jobs を省略した場合はCPUコア数（動画数が少なければ動画数）のプロセスで処理する。
+    1本の動画が失敗しても残りの動画の処理は続ける。
+    戻り値: 入力順に並べた動画ごとの結果（SUMMARY_COLUMNS の辞書）
+    """
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(video_paths)))
+    print(f"{len(video_paths)} 本の動画を {jobs} プロセスで処理します。")
+
+    rows = {}
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_batch_worker, initargs=(config_path, with_ocr, profiler.enabled)) as executor:
+        futures = {
+            executor.submit(_process_video, video_path, config_path, with_ocr, decoder): video_path
+            for video_path in video_paths
+        }
+        for future in as_completed(futures):
+            video_path = futures[future]
+            try:
+                row = future.result()
+            except Exception as e:
+                # ワーカープロセスの異常終了など、_process_video の外で起きた失敗
+                row = {"video": video_path, "status": "failed", "error": f"{type(e).__name__}: {e}"}
+            profiler.merge(row.pop("profile", None))
+            rows[video_path] = row
+            print(f"[{len(rows)}/{len(video_paths)}] {video_path}: {row['status']}")
+
+    summary = [rows[video_path] for video_path in video_paths]
+    results_dir = Config(config_path).get("output", "results", default="output/results")
+    summary_path = os.path.join(results_dir, "batch_summary.csv")
+    dataframe = pd.DataFrame(summary, columns=SUMMARY_COLUMNS).astype({"match_count": "Int64"})
+    save_dataframe_csv(dataframe, summary_path)
+    failed = sum(row["status"] != "ok" for row in summary)
+    print(f"一括処理のまとめを {summary_path} に保存しました（成功 {len(summary) - failed} 本、失敗 {failed} 本）。")
+    return summary
@@ -0,0 +1,103 @@
+import math
+from typing import Iterable
+from src.screen.classifier import SCORE_TYPES
+from src.util.io import CsvRowWriter, JsonlRowWriter
+from src.util.timestamp import parse_frame_index
+
+
+class ScreenEvent:
+    """
+    走査したフレーム1枚の画面判定結果（Pipeline.iter_screens が返すイベント）。
+    類似度はテンプレートごとの値で、前段フィルタで棄却したフレームなど不明な値は None とする。
+    """
+
+    __slots__ = ("frame", "pts", "screen_type", "duplicate", *(f"{screen_type}_score" for screen_type in SCORE_TYPES))
+
+    def __init__(
+        self, frame: int, pts: float, screen_type: str, duplicate: bool, scores: tuple[float, ...] | None,
+    ) -> None:
+        # 抽出番号と再生位置（秒）
+        self.frame = frame
+        self.pts = pts
+        self.screen_type = screen_type
+        # 直前と同じ画面として判定を省略した重複フレームか
+        self.duplicate = duplicate
+        for screen_type, score in zip(SCORE_TYPES, scores or (math.nan,) * len(SCORE_TYPES)):
+            setattr(self, f"{screen_type}_score", None if math.isnan(score) else float(score))
+
+    @classmethod
+    def from_log_row(cls, row: dict) -> "ScreenEvent":
+        """
+        判定ログの行（log_rows の要素）から作る。
+        """
+        return cls(parse_frame_index(row["frame"]), row["pts"], row["screen_type"], row["duplicate"], row["scores"])
+
+    def as_dict(self) -> dict:
+        """
+        CSV・JSON Lines に書き出す辞書を返す。
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        return f"ScreenEvent(frame={self.frame}, pts={self.pts:.2f}, screen_type={self.screen_type!r})"
+
+
+class MatchEvent:
+    """
+    matching → result の遷移で確定した1試合（Pipeline.iter_matches が返すイベント）。
+    開始位置は試合の最初の matching フレーム、終了位置は result フレーム。
+    """
+
+    __slots__ = ("match_number", "start_time", "start_sec", "start_frame", "result_type", "result_frame")
+
+    def __init__(
+        self, match_number: int, start_time: str, start_sec: float, start_frame: int, result_type: str, result_frame: int,
+    ) -> None:
+        self.match_number = match_number
+        # タイムスタンプCSVと同じ形式の開始時刻と、その秒数
+        self.start_time = start_time
+        self.start_sec = start_sec
+        self.start_frame = start_frame
+        self.result_type = result_type
+        self.result_frame = result_frame
+
+    def as_dict(self) -> dict:
+        """
+        CSV・JSON Lines に書き出す辞書を返す。
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        return f"MatchEvent(match_number={self.match_number}, start_time={self.start_time!r}, result_type={self.result_type!r})"
+
+
+def write_events_csv(events: Iterable[ScreenEvent | MatchEvent], csv_path: str, event_type: type) -> int:
+    """
+    イベントを受け取るたびにCSVファイルへ1行ずつ追記する（列は event_type の項目、既存のファイルには続きから追記する）。
+    書き出した行数を返す。
+    """
+    writer = CsvRowWriter(csv_path, list(event_type.__slots__))
+    count = 0
+    try:
+        for event in events:
+            writer.write(event.as_dict())
+            count += 1
+    finally:
+        writer.close()
+    return count
+
+
+def write_events_jsonl(events: Iterable[ScreenEvent | MatchEvent], jsonl_path: str) -> int:
+    """
+    イベントを受け取るたびに JSON Lines ファイルへ1行ずつ追記する（既存のファイルには続きから追記する）。
+    書き出した行数を返す。
+    """
+    writer = JsonlRowWriter(jsonl_path)
+    count = 0
+    try:
+        for event in events:
+            writer.write(event.as_dict())
+            count += 1
+    finally:
+        writer.close()
+    return count
@@ -1,11 +1,30 @@
 import os
+import sys
+import numpy as np
 import pandas as pd
+from typing import Iterator
 from src.core.config import Config
+from src.core.events import MatchEvent, ScreenEvent
+from src.core.shard import save_shard, shard_name
+from src.ocr import Matcher, OcrEngine, OcrMemo
 from src.processing.match_extractor import MatchExtractor
-from src.util.io import ensure_dir, save_dataframe_csv, save_screen_log
-from src.util.cache import CacheManager
-from src.util.timestamp import calculate_timestamp
-from src.video.handler import extract_and_classify_frames
+from src.processing.match_tracker import MatchTracker
+from src.screen.classifier import ScreenClassifier
+from src.util.io import CsvRowWriter, ensure_dir, save_dataframe_csv, save_screen_log
+from src.util.cache import CacheManager, build_cache_key, prune_cache, touch
+from src.util.frame_index import FrameIndex
+from src.util.timestamp import format_timestamp, match_timestamps
+from src.video.handler import (
+    extract_and_classify_frames,
+    extract_and_classify_frames_adaptive,
+    iter_classified_stream,
+    iter_scanned_frames,
+    screen_frame_index,
+)
+from src.video.stream import iter_growing_video_frames, iter_raw_frames
+
+# 標準入力から生フレームを読む場合の入力パス
+STDIN_INPUT = "-"
 
 
 class Pipeline:
@@ -14,23 +33,85 @@ class Pipeline:
     各処理は専用クラスに委譲し、全体のフローを管理する。
     """
 
-    def __init__(self, video_path: str, config_path: str, with_ocr: bool = False) -> None:
+    def __init__(
+        self,
+        video_path: str,
+        config_path: str,
+        with_ocr: bool = False,
+        workers: int = 1,
+        follow: bool = False,
+        raw_format: tuple[int, int, float] | None = None,
+        decoder: str | None = None,
+        classifiers: list[ScreenClassifier] | None = None,
+        matcher: Matcher | None = None,
+        ocr_engine: OcrEngine | None = None,
+        ocr_memo: OcrMemo | None = None,
+        screen_log_name: str = "screen_log.csv",
+        start: float | None = None,
+        end: float | None = None,
+    ) -> None:
         self.config = Config(config_path)
         self.config_path = config_path
         self.video_path = video_path
-        self.video_basename = os.path.splitext(os.path.basename(video_path))[0]
+        self.video_basename = "stdin" if video_path == STDIN_INPUT else os.path.splitext(os.path.basename(video_path))[0]
         self.with_ocr = with_ocr
+        self.workers = workers
+        # 録画中のファイルや標準入力を逐次処理するか。raw_format は標準入力の生フレームの (幅, 高さ, FPS)
+        self.follow = follow
+        self.raw_format = raw_format
+        # 一括処理では、ワーカープロセスで生成済みの画面判定器・Matcher・OCRエンジン・OCRの記憶を動画間で使い回す
+        self.classifiers = classifiers
+        self.screen_log_name = screen_log_name
+
+        # フレームのデコーダー（opencv / ffmpeg）。省略時は設定ファイルの video.decoder.backend
+        self.decoder = decoder or self.config.get("video", "decoder", "backend", default="opencv")
+        if decoder:
+            # コマンドラインの指定を設定に反映し、キャッシュのキーにも含める
+            self.config.as_dict().setdefault("video", {}).setdefault("decoder", {})["backend"] = decoder
+
+        # 動画の内容と画面判定に関わる設定から作るキャッシュのキー（内容が確定しない逐次処理ではキャッシュを使わない）
+        self.cache_key = None if follow else build_cache_key(video_path, self.config)
 
         # ディレクトリ設定
-        self.frames_dir = os.path.join(self.config.get("output", "frames", default="output/frames"), self.video_basename)
+        self.frames_root = self.config.get("output", "frames", default="output/frames")
+        frames_dir_name = f"{self.video_basename}_{self.cache_key}" if self.cache_key else self.video_basename
+        self.frames_dir = os.path.join(self.frames_root, frames_dir_name)
         self.cache_dir = os.path.join(self.config.get("output", "cache", default="output/cache"))
         self.results_dir = os.path.join(self.config.get("output", "results", default="output/results"))
 
+        # 走査する時間範囲（秒）。指定した場合は分割走査として、その範囲の画面判定結果だけを output.shards に保存する
+        self.start_sec = start or 0.0
+        self.end_sec = end
+        self.shard_dir = None
+        scan_range = None
+        self.scan_mode = self.config.get("video", "scan", default="dense")
+        if start is not None or end is not None:
+            if follow or with_ocr:
+                raise ValueError("時間範囲の指定は --follow・--with-ocr と同時に使えません")
+            if self.scan_mode == "adaptive":
+                raise ValueError("時間範囲の指定は適応的な走査（video.scan: adaptive）では使えません")
+            if end is not None and end <= self.start_sec:
+                raise ValueError(f"走査範囲の終了（{end:g} 秒）は開始（{self.start_sec:g} 秒）より後にしてください")
+            scan_range = shard_name(self.start_sec, end)
+            shards_root = self.config.get("output", "shards", default="output/shards")
+            self.shard_dir = os.path.join(shards_root, f"{self.video_basename}_{self.cache_key}", scan_range)
+
         # 各種マネージャー・プロセッサーの初期化
-        self.cache_manager = CacheManager(self.cache_dir, self.video_basename)
-        self.frame_interval = self.config.get("video", "frame_interval")
+        self.cache_manager = CacheManager(self.cache_dir, self.video_basename, self.cache_key, scan_range)
+        self.fractional_seconds = self.config.get("output", "fractional_seconds", default=False)
+        self.threshold = self.config.get("template", "threshold", default=0.3)
+        # matching/result フレームの画像を保存するか（保存しない場合、OCR時に動画から読み直す）
+        self.save_frames = self.config.get("output", "save_frames", default=False)
+        # adaptive 走査ではフレーム番号が refine_interval 刻みになる
+        if self.scan_mode == "adaptive" and not follow:
+            self.frame_interval = self.config.get("video", "adaptive", "refine_interval", default=0.5)
+        else:
+            self.frame_interval = self.config.get("video", "frame_interval")
         if self.with_ocr:
-            self.match_extractor = MatchExtractor(self.frame_interval, self.config)
+            self.match_extractor = MatchExtractor(
+                self.frame_interval, self.config, video_path=self.video_path, matcher=matcher, ocr_engine=ocr_engine,
+                ocr_memo=ocr_memo,
+            )
 
         self._prepare_output_dirs()
 
@@ -38,88 +119,331 @@ class Pipeline:
         """
         必要なディレクトリを作成する。
         """
-        ensure_dir(self.frames_dir)
+        if self.save_frames:
+            ensure_dir(self.frames_dir)
         ensure_dir(self.results_dir)
 
-    def run_pipeline(self) -> None:
+    def run_pipeline(self) -> dict:
         """
         パイプライン全体を実行する。
+        戻り値: 検出した試合数（match_count）と出力したCSVのパス（output_path）の辞書
         """
+        if self.follow:
+            return self._follow_and_append_timestamps()
+        if self.shard_dir is not None:
+            return self._scan_shard()
+
         # 1. フレーム抽出＋画面判定（統合フロー、キャッシュ対応）
-        screens, match_count = self._extract_and_classify_with_cache()
+        index = self._extract_and_classify_with_cache()
 
         if self.with_ocr:
             # 試合結果抽出（実験的）
-            results = self.match_extractor.extract_match_results(screens, match_count)
-            self._save_results_to_csv(results)
-        else:
-            # タイムスタンプのみ出力（デフォルト）
-            timestamps = self._extract_timestamps(screens)
-            self._save_timestamps_to_csv(timestamps)
+            results = self.match_extractor.extract_match_results(index)
+            output_path = self._save_results_to_csv(results)
+            return {"match_count": len(results), "output_path": output_path}
+
+        # タイムスタンプのみ出力（デフォルト）
+        timestamps = self._extract_timestamps(index)
+        output_path = self._save_timestamps_to_csv(timestamps)
+        return {"match_count": len(timestamps), "output_path": output_path}
 
-    def _extract_and_classify_with_cache(self) -> tuple:
+    def reclassify(self, thresholds: list[float]) -> list[dict]:
         """
-        フレーム抽出＋画面判定の統合フロー（キャッシュ対応）。
-        screens_cache があればそのまま使い、なければ統合処理を実行する。
+        キャッシュした画面判定結果の類似度から、閾値ごとに画面種別を判定し直して試合数を数える（動画はデコードしない）。
+        閾値を1つだけ指定した場合は、その閾値で検出したタイムスタンプをCSVに保存する。
+        キャッシュがない場合はFileNotFoundErrorを投げる。
+        戻り値: 閾値（threshold）と試合数（match_count）の辞書のリスト
         """
-        if self.cache_manager.has_screens_cache():
-            return self.cache_manager.load_screens_cache()
+        if not self.cache_manager.has_screen_index():
+            raise FileNotFoundError(f"画面判定結果のキャッシュがありません。先に --input {self.video_path} で走査してください。")
+        index = self.cache_manager.load_screen_index()
+        # 適応的な走査で調べるフレームや、前段フィルタで棄却するフレームは走査時の閾値で決まっている。
+        # 現在の設定ではなく、キャッシュに記録した走査時の方式で判断する
+        if index.scan == "adaptive" or index.prefilter:
+            print(
+                f"注意: 適応的な走査または前段フィルタ（類似度のないフレーム {index.unscored_count()} 件）の結果のため、"
+                f"走査時の閾値 {index.threshold} と異なる閾値では実際に走査した場合と結果が変わることがあります。"
+            )
+        rows = []
+        for threshold in thresholds:
+            reclassified = index.reclassify(threshold)
+            rows.append({"threshold": threshold, "match_count": reclassified.match_count})
+        if len(thresholds) == 1:
+            self._save_timestamps_to_csv(self._extract_timestamps(reclassified))
+        return rows
 
-        screens, match_count, log_rows = extract_and_classify_frames(
+    def iter_screens(self) -> Iterator[ScreenEvent]:
+        """
+        動画を走査し、フレームを判定するたびにその画面判定結果を ScreenEvent として返すジェネレータ。
+        判定結果は溜め込まず、キャッシュも使わないため、走査の途中から結果を使えてメモリ使用量は一定。
+        走査はこのプロセス内で行う（workers は使わず、video.pipeline.threads は使う）。
+        """
+        if self.follow or self.scan_mode == "adaptive":
+            raise ValueError("逐次の画面判定結果は --follow・適応的な走査（video.scan: adaptive）では取得できません")
+        for row in iter_scanned_frames(
             self.video_path,
-            self.config.get("video", "frame_interval"),
-            self.frames_dir,
+            self.frame_interval,
+            self.frames_dir if self.save_frames else None,
             self.config_path,
+            sampling=self.config.get("video", "sampling", default="grab"),
+            dedup_tolerance=self._dedup_tolerance(),
+            threads=self.config.get("video", "pipeline", "threads", default=0),
+            queue_size=self.config.get("video", "pipeline", "queue_size", default=16),
+            decoder_options=self._decoder_options(),
+            classifiers=self.classifiers,
+            start_sec=self.start_sec,
+            end_sec=self.end_sec,
+        ):
+            yield ScreenEvent.from_log_row(row)
+
+    def iter_matches(self) -> Iterator[MatchEvent]:
+        """
+        iter_screens() の画面判定結果から matching → result の遷移を検出し、試合が確定するたびに MatchEvent を返すジェネレータ。
+        試合番号・開始時刻は run_pipeline() が出力するタイムスタンプと同じになる。
+        """
+        tracker = MatchTracker()
+        for event in self.iter_screens():
+            if event.screen_type == "other":
+                continue
+            first_matching = tracker.feed({"type": event.screen_type, "frame": event.frame})
+            if first_matching is None:
+                continue
+            start_sec = first_matching["frame"] * self.frame_interval
+            yield MatchEvent(
+                tracker.match_count, format_timestamp(start_sec, self.fractional_seconds), start_sec,
+                first_matching["frame"], event.screen_type, event.frame,
+            )
+
+    def _extract_and_classify_with_cache(self) -> FrameIndex:
+        """
+        フレーム抽出＋画面判定の統合フロー（キャッシュ対応）。
+        画面判定結果のキャッシュがあればそのまま使い、なければ統合処理を実行する。
+        """
+        if self.cache_manager.has_screen_index():
+            touch(self.frames_dir)
+            index = self.cache_manager.load_screen_index()
+            if index.threshold != self.threshold:
+                print(f"記録した類似度から閾値 {self.threshold} で画面種別を判定し直します（走査時は {index.threshold}）。")
+                index = index.reclassify(self.threshold)
+            return index
+
+        log_rows = self._scan()
+        save_screen_log(log_rows, self.results_dir, self.screen_log_name)
+        index = FrameIndex.from_scan(
+            log_rows, self.frames_dir if self.save_frames else None, self.threshold, self.scan_mode, self._prefilter_enabled(),
+        )
+        self.cache_manager.save_screen_index(index)
+        self.cache_manager.clear_checkpoint()
+        self._prune_cache()
+        return index
+
+    def _scan_shard(self) -> dict:
+        """
+        指定した時間範囲だけを走査し、画面判定結果を分割走査の結果として保存する（merge で連結する）。
+        抽出番号は動画の先頭から数えるため、範囲ごとの結果をそのまま連結できる。
+        戻り値: 範囲内で検出した試合数（match_count）と保存先のディレクトリ（output_path）の辞書
+        """
+        log_rows = self._scan()
+        index = FrameIndex.from_scan(
+            log_rows, self.frames_dir if self.save_frames else None, self.threshold, self.scan_mode, self._prefilter_enabled(),
         )
-        save_screen_log(log_rows, self.results_dir)
-        self.cache_manager.save_screens_cache(screens, match_count)
-        return screens, match_count
+        save_shard(self.shard_dir, index, {
+            "video": self.video_basename,
+            "cache_key": self.cache_key,
+            "start": self.start_sec,
+            "end": self.end_sec,
+            "frame_interval": self.frame_interval,
+            "threshold": self.threshold,
+        })
+        self.cache_manager.clear_checkpoint()
+        print(f"分割走査の結果を {self.shard_dir} に保存しました（範囲内の試合数 {index.match_count}）。")
+        return {"match_count": index.match_count, "output_path": self.shard_dir}
 
-    def _extract_timestamps(self, screens: list[dict]) -> list[dict]:
+    def _scan(self) -> list[dict]:
+        """
+        設定した走査方式でフレーム抽出＋画面判定を行い、フレームごとの判定結果（log_rows）を返す。
+        """
+        if self.scan_mode == "adaptive":
+            _, _, log_rows = extract_and_classify_frames_adaptive(
+                self.video_path,
+                self.config.get("video", "adaptive", "coarse_interval", default=5),
+                self.frame_interval,
+                self.frames_dir if self.save_frames else None,
+                self.config_path,
+                classifier=self.classifiers[0] if self.classifiers else None,
+                min_screen_sec=self.config.get("video", "adaptive", "min_screen_sec", default=None),
+            )
+        else:
+            _, _, log_rows = extract_and_classify_frames(
+                self.video_path,
+                self.frame_interval,
+                self.frames_dir if self.save_frames else None,
+                self.config_path,
+                sampling=self.config.get("video", "sampling", default="grab"),
+                workers=self.workers,
+                dedup_tolerance=self._dedup_tolerance(),
+                threads=self.config.get("video", "pipeline", "threads", default=0),
+                queue_size=self.config.get("video", "pipeline", "queue_size", default=16),
+                checkpoint_path=self._checkpoint_path(),
+                checkpoint_interval=self.config.get("video", "checkpoint", "interval", default=60),
+                decoder_options=self._decoder_options(),
+                classifiers=self.classifiers,
+                start_sec=self.start_sec,
+                end_sec=self.end_sec,
+            )
+        return log_rows
+
+    def _decoder_options(self) -> dict:
+        """
+        フレームのデコーダーの設定を返す。
+        ffmpeg バックエンドでは画面判定に使うROIの和集合だけを切り出すが、
+        フレーム画像を保存する場合はOCRで画面全体を使うため切り出し・縮小を行わない。
+        """
+        if self.decoder != "ffmpeg":
+            return {"backend": self.decoder, "keyframe_tolerance": self.config.get("video", "keyframe_tolerance", default=0.5)}
+        ffmpeg_config = self.config.get("video", "decoder", "ffmpeg", default={}) or {}
+        crop = ffmpeg_config.get("crop", True) and not self.save_frames
+        return {
+            "backend": "ffmpeg",
+            "ffmpeg_path": ffmpeg_config.get("path", "ffmpeg"),
+            "crop_rois": [self.config.get("roi", key) for key in ("vs", "win", "lose")] if crop else None,
+            "scale": 1.0 if self.save_frames else ffmpeg_config.get("scale", 1.0),
+        }
+
+    def _checkpoint_path(self) -> str | None:
+        """
+        走査のチェックポイントの保存先を返す。チェックポイントが無効の場合はNoneを返す。
+        """
+        if not self.config.get("video", "checkpoint", "enabled", default=True):
+            return None
+        return self.cache_manager.checkpoint_file
+
+    def _prune_cache(self) -> None:
+        """
+        キャッシュとフレーム画像の合計サイズが上限を超えていれば、最終利用日時の古いものから削除する。
+        """
+        max_mb = self.config.get("output", "cache_max_mb", default=0)
+        if not max_mb:
+            return
+        # 今回の結果は削除しない
+        keep = [self.cache_manager.screen_index_dir, self.frames_dir]
+        removed = prune_cache(self.cache_dir, self.frames_root, int(max_mb * 1024 ** 2), keep=keep)
+        for entry in removed:
+            print(f"キャッシュの上限を超えたため {entry['path']} を削除しました。")
+
+    def _prefilter_enabled(self) -> bool:
+        """
+        画面判定の前段フィルタが有効かどうかを返す。
+        """
+        return bool(self.config.get("template", "prefilter", "enabled", default=False))
+
+    def _dedup_tolerance(self) -> float | None:
+        """
+        重複フレーム省略の許容値を返す。無効な場合はNoneを返す。
+        """
+        if not self.config.get("video", "dedup", "enabled", default=False):
+            return None
+        return self.config.get("video", "dedup", "tolerance", default=2.0)
+
+    def _extract_timestamps(self, index: FrameIndex) -> list[dict]:
         """
         画面判定結果から matching → result の遷移を検出し、
         各試合の最初の matching フレームのタイムスタンプを返す。
         """
-        timestamps = []
-        match_number = 0
-        i = 0
-
-        while i < len(screens):
-            # マッチンググループの先頭を記録
-            if screens[i]["type"] == "matching":
-                first_matching_path = screens[i]["path"]
-                # マッチングフレームをスキップ
-                while i < len(screens) and screens[i]["type"] == "matching":
-                    i += 1
-                # 次がリザルト画面なら1試合として記録
-                if i < len(screens) and screens[i]["type"] in ("result_win", "result_lose"):
-                    match_number += 1
-                    frame_name = os.path.basename(first_matching_path)
-                    start_time = calculate_timestamp(frame_name, self.frame_interval)
-                    timestamps.append({
-                        "match_number": match_number,
-                        "start_time": start_time,
-                    })
-                    i += 1
-            else:
-                i += 1
-
-        return timestamps
-
-    def _save_timestamps_to_csv(self, timestamps: list[dict]) -> None:
-        """
-        試合開始タイムスタンプをCSVファイルに保存する。
+        return match_timestamps(index.first_matching_frames().tolist(), self.frame_interval, self.fractional_seconds)
+
+    def _iter_follow_frames(self) -> Iterator[tuple[int, np.ndarray, float]]:
+        """
+        逐次処理の入力（標準入力の生フレーム、または録画中の動画ファイル）から抽出したフレームを返す。
+        """
+        if self.video_path == STDIN_INPUT:
+            width, height, fps = self.raw_format
+            return iter_raw_frames(sys.stdin.buffer, width, height, fps, self.frame_interval)
+        return iter_growing_video_frames(
+            self.video_path,
+            self.frame_interval,
+            poll_interval=self.config.get("video", "follow", "poll_interval", default=1.0),
+            idle_timeout=self.config.get("video", "follow", "idle_timeout", default=60),
+        )
+
+    def _follow_and_append_timestamps(self) -> dict:
+        """
+        録画中の動画ファイルまたは標準入力の生フレームを逐次画面判定し、
+        matching → result の遷移で試合が確定するたびにタイムスタンプをCSVへ追記する。
+        判定結果は溜め込まずにCSVへ書き出すため、入力が長く続いてもメモリ使用量は一定。
+        """
+        classifier = self.classifiers[0] if self.classifiers else ScreenClassifier(self.config_path)
+        tracker = MatchTracker()
+        timestamps_path = os.path.join(self.results_dir, f"timestamps_{self.video_basename}.csv")
+        log_writer = CsvRowWriter(os.path.join(self.results_dir, self.screen_log_name), ["frame", "screen_type"])
+        timestamps_writer = CsvRowWriter(timestamps_path, ["match_number", "start_time"])
+        output_dir = self.frames_dir if self.save_frames else None
+        # 同じ録画ファイルを再び処理する場合は先頭から読み直すため、書き込み済みの行は書き足さない。
+        # 標準入力は前回の続きの入力として、試合番号を書き込み済みの試合数から続ける
+        resume = self.video_path != STDIN_INPUT
+        match_offset = 0 if resume else timestamps_writer.existing_rows
+        if timestamps_writer.existing_rows:
+            print(f"{timestamps_path} の既存の {timestamps_writer.existing_rows} 試合に続けて追記します。")
+        print(f"{self.video_path} の逐次処理を開始します（Ctrl-C で終了）。")
+
+        try:
+            stream = iter_classified_stream(self._iter_follow_frames(), classifier, output_dir)
+            for n, (log_row, screen) in enumerate(stream):
+                if not resume or n >= log_writer.existing_rows:
+                    log_writer.write(log_row)
+                if screen is None:
+                    continue
+                first_matching = tracker.feed(screen)
+                if first_matching is None:
+                    continue
+                match_number = match_offset + tracker.match_count
+                if resume and match_number <= timestamps_writer.existing_rows:
+                    continue
+                start_seconds = screen_frame_index(first_matching) * self.frame_interval
+                start_time = format_timestamp(start_seconds, self.fractional_seconds)
+                timestamps_writer.write({"match_number": match_number, "start_time": start_time})
+                print(f"試合 {match_number} を検出しました（開始 {start_time}）。")
+        except KeyboardInterrupt:
+            print("逐次処理を中断しました。")
+        finally:
+            log_writer.close()
+            timestamps_writer.close()
+        match_count = match_offset + tracker.match_count
+        print(f"タイムスタンプを {timestamps_path} に保存しました（{match_count} 試合）。")
+        return {"match_count": match_count, "output_path": timestamps_path}
+
+    def _save_timestamps_to_csv(self, timestamps: list[dict]) -> str:
+        """
+        試合開始タイムスタンプをCSVファイルに保存し、保存先のパスを返す。
         """
         output_path = os.path.join(self.results_dir, f"timestamps_{self.video_basename}.csv")
         dataframe = pd.DataFrame(timestamps)
         save_dataframe_csv(dataframe, output_path)
         print(f"タイムスタンプを {output_path} に保存しました。")
+        return output_path
 
-    def _save_results_to_csv(self, results: list[dict]) -> None:
+    def _save_results_to_csv(self, results: list[dict]) -> str:
         """
-        試合結果をCSVファイルに保存する。
+        試合結果をCSVファイルに保存し、保存先のパスを返す。
         """
         output_path = os.path.join(self.results_dir, f"result_{self.video_basename}.csv")
         dataframe = pd.DataFrame(results)
         save_dataframe_csv(dataframe, output_path)
         print(f"結果を {output_path} に保存しました。")
+        return output_path
+
+
+def iter_screens(video_path: str, config_path: str = "config/config.yaml", **options) -> Iterator[ScreenEvent]:
+    """
+    動画を走査し、フレームごとの画面判定結果を ScreenEvent として順に返す（Pipeline.iter_screens）。
+    options は Pipeline の引数（decoder、start、end など）。
+    """
+    return Pipeline(video_path, config_path, **options).iter_screens()
+
+
+def iter_matches(video_path: str, config_path: str = "config/config.yaml", **options) -> Iterator[MatchEvent]:
+    """
+    動画を走査し、試合が確定するたびに MatchEvent を返す（Pipeline.iter_matches）。
+    options は Pipeline の引数（decoder、start、end など）。
+    """
+    return Pipeline(video_path, config_path, **options).iter_matches()
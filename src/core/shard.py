@@ -0,0 +1,102 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from src.core.config import Config
+from src.util.cache import CacheManager
+from src.util.frame_index import FrameIndex
+from src.util.io import save_dataframe_csv
+from src.util.timestamp import match_timestamps
+
+# 分割走査の結果ディレクトリに置く、走査範囲などの情報のファイル名
+SHARD_META = "shard.json"
+
+
+def shard_name(start_sec: float, end_sec: float | None) -> str:
+    """
+    走査範囲（秒）から分割走査の結果ディレクトリ名を作る。例: 0-3600、3600-end
+    """
+    end = "end" if end_sec is None else f"{end_sec:g}"
+    return f"{start_sec:g}-{end}"
+
+
+def save_shard(path: str, index: FrameIndex, meta: dict) -> None:
+    """
+    時間範囲を分割して走査した画面判定結果と、その走査範囲などの情報をディレクトリ path に保存する。
+    """
+    index.save(path)
+    with open(os.path.join(path, SHARD_META), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+
+def load_shards(shard_root: str) -> list[tuple[dict, FrameIndex]]:
+    """
+    shard_root 直下の分割走査の結果を、走査範囲の開始位置の順に読み込む。
+    戻り値: (走査範囲などの情報, 画面判定結果) のリスト
+    """
+    shards = []
+    for name in sorted(os.listdir(shard_root)):
+        path = os.path.join(shard_root, name)
+        meta_path = os.path.join(path, SHARD_META)
+        if not os.path.exists(meta_path) or not FrameIndex.exists(path):
+            continue
+        with open(meta_path, encoding="utf-8") as f:
+            shards.append((json.load(f), FrameIndex.load(path)))
+    return sorted(shards, key=lambda shard: shard[0]["start"])
+
+
+def check_shards(metas: list[dict]) -> None:
+    """
+    分割走査の結果が同じ動画・同じ設定のもので、動画の先頭から末尾までを重複も抜けもなく覆っているか確認する。
+    問題があれば ValueError を送出する。
+    """
+    if not metas:
+        raise ValueError("分割走査の結果がありません")
+    for key in ("video", "cache_key", "frame_interval", "threshold"):
+        values = {meta[key] for meta in metas}
+        if len(values) > 1:
+            raise ValueError(f"{key} が異なる分割走査の結果が混ざっています: {sorted(map(str, values))}")
+    if metas[0]["start"] != 0:
+        raise ValueError(f"動画の先頭（0 秒）から {metas[0]['start']:g} 秒までの結果がありません")
+    for prev, meta in zip(metas, metas[1:]):
+        if prev["end"] is None or prev["end"] > meta["start"]:
+            raise ValueError(f"走査範囲が重なっています: {shard_name(prev['start'], prev['end'])} と {shard_name(meta['start'], meta['end'])}")
+        if prev["end"] < meta["start"]:
+            raise ValueError(f"{prev['end']:g} 秒から {meta['start']:g} 秒までの結果がありません")
+    if metas[-1]["end"] is not None:
+        raise ValueError(f"{metas[-1]['end']:g} 秒から動画の末尾までの結果がありません")
+
+
+def merge_shards(shard_root: str, config_path: str) -> dict:
+    """
+    時間範囲ごとに走査した結果を連結し、動画全体の画面判定結果のキャッシュとタイムスタンプのCSVを保存する。
+    範囲の境界をまたぐ試合も、連結した結果から検出するため1試合として数える。動画ファイルは読まない。
+    戻り値: 検出した試合数（match_count）と出力したCSVのパス（output_path）の辞書
+    """
+    config = Config(config_path)
+    shards = load_shards(shard_root)
+    metas = [meta for meta, _ in shards]
+    check_shards(metas)
+    index = FrameIndex.concat([index for _, index in shards])
+    if np.any(np.diff(np.asarray(index.columns["frame"])) <= 0):
+        raise ValueError("分割走査の結果の抽出番号が重なっています")
+
+    video_basename = metas[0]["video"]
+    cache_dir = config.get("output", "cache", default="output/cache")
+    CacheManager(cache_dir, video_basename, metas[0]["cache_key"]).save_screen_index(index)
+
+    threshold = config.get("template", "threshold", default=0.3)
+    if index.threshold != threshold:
+        print(f"記録した類似度から閾値 {threshold} で画面種別を判定し直します（走査時は {index.threshold}）。")
+        if index.scan == "adaptive" or index.prefilter:
+            print("注意: 適応的な走査または前段フィルタの結果のため、実際にこの閾値で走査した場合と結果が変わることがあります。")
+        index = index.reclassify(threshold)
+    timestamps = match_timestamps(
+        index.first_matching_frames().tolist(), metas[0]["frame_interval"],
+        config.get("output", "fractional_seconds", default=False),
+    )
+    results_dir = config.get("output", "results", default="output/results")
+    output_path = os.path.join(results_dir, f"timestamps_{video_basename}.csv")
+    save_dataframe_csv(pd.DataFrame(timestamps, columns=["match_number", "start_time"]), output_path)
+    print(f"{len(shards)} 個の分割走査の結果を連結し、タイムスタンプを {output_path} に保存しました（{len(timestamps)} 試合）。")
+    return {"match_count": len(timestamps), "output_path": output_path}
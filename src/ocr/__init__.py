@@ -1,4 +1,18 @@
-from .ocr import ocr_roi, preprocess_ocr_text, get_preprocessed_text_from_roi, ocr_on_matching_regions
+from .ocr import (
+    OcrEngine,
+    PytesseractEngine,
+    TesserocrEngine,
+    create_ocr_engine,
+    ocr_roi,
+    preprocess_ocr_text,
+    get_preprocessed_text_from_roi,
+    ocr_on_matching_regions,
+    ocr_on_matching_frames,
+    ocr_tiled,
+    recognize_regions,
+    tile_for_ocr,
+)
 from .matcher import Matcher
-from .preprocess import preprocess_for_ocr
+from .memo import OcrMemo, create_ocr_memo
+from .preprocess import OcrPreprocessPlan, get_preprocess_plan, preprocess_for_ocr
 from .scorer import matching_scorer_for_unit_name, matching_scorer_for_player_name
@@ -1,14 +1,73 @@
+import numpy as np
+from collections import OrderedDict
 from src.core.config import Config
 from src.util.io import load_csv_candidates
-from .scorer import matching_scorer_for_unit_name, matching_scorer_for_player_name
-from rapidfuzz import process
+from src.util.profiler import profiler, timed
+from .scorer import PLAYER_NAME_WEIGHTS, UNIT_NAME_WEIGHTS, get_pattern
+from rapidfuzz import fuzz, process
 from typing import Callable
 
 
+class _CandidateIndex:
+    """
+    候補リストの文字種パターン・文字数と、文字から候補への転置インデックスを前計算したもの。
+    scorer.py のスコアリング関数と同じ値を、複数のクエリ×全候補について process.cdist でまとめて求める。
+    """
+
+    def __init__(self, candidates: list[str], weights: tuple[float, float, int]) -> None:
+        self.candidates = candidates
+        self.text_weight, self.pattern_weight, self.penalty = weights
+        self.patterns = [get_pattern(candidate) for candidate in candidates]
+        self.lengths = np.array([len(candidate) for candidate in candidates], dtype=np.int64)
+        self.char_index: dict[str, list[int]] = {}
+        for i, candidate in enumerate(candidates):
+            for ch in set(candidate):
+                self.char_index.setdefault(ch, []).append(i)
+
+    def _candidate_ids(self, queries: list[str], score_cutoff: float) -> np.ndarray:
+        """
+        閾値に届きうる候補の番号を昇順で返す。
+        クエリと共通の文字を持たない候補は文字列類似度が0になるため、
+        文字種パターン一致度だけでは閾値に届かない場合に限り除外する。
+        """
+        if self.pattern_weight * 100 >= score_cutoff:
+            return np.arange(len(self.candidates))
+        ids = set()
+        for query in queries:
+            for ch in set(query):
+                ids.update(self.char_index.get(ch, ()))
+        return np.array(sorted(ids), dtype=np.int64)
+
+    def best_matches(self, queries: list[str], score_cutoff: float) -> list[str | None]:
+        """
+        各クエリについて、スコアが score_cutoff 以上で最大の候補（同点は候補リストで先のもの）を返す。
+        process.extractOne と同じ結果になる。
+        """
+        ids = self._candidate_ids(queries, score_cutoff)
+        if len(ids) == 0:
+            return [None] * len(queries)
+        candidates = [self.candidates[i] for i in ids]
+        scores = process.cdist(queries, candidates, scorer=fuzz.ratio, dtype=np.float64)
+        if self.pattern_weight:
+            patterns = [self.patterns[i] for i in ids]
+            query_patterns = [get_pattern(query) for query in queries]
+            pattern_scores = process.cdist(query_patterns, patterns, scorer=fuzz.ratio, dtype=np.float64)
+            scores = scores * self.text_weight + pattern_scores * self.pattern_weight
+        query_lengths = np.array([len(query) for query in queries], dtype=np.int64)
+        scores = scores - np.abs(query_lengths[:, None] - self.lengths[ids][None, :]) * self.penalty
+
+        best = np.argmax(scores, axis=1)
+        return [
+            candidates[j] if scores[row, j] >= score_cutoff else None
+            for row, j in enumerate(best)
+        ]
+
+
 class Matcher:
     """
     OCRテキストを候補リストにマッチングするクラス。
-    初期化時に一度だけ候補リストをロードする。
+    初期化時に一度だけ候補リストをロードし、照合用のインデックスを作る。
+    照合結果はテキストごとに記憶する（一括処理では動画をまたいで使い回すため、上限を超えたら最後に使われたのが古いものから捨てる）。
     """
 
     def __init__(self, config: Config) -> None:
@@ -17,6 +76,13 @@ class Matcher:
         unit_path = config.get("data", "unit_names", default="data/unit_names.csv")
         self.player_candidates: list[str] = load_csv_candidates(player_path)
         self.unit_candidates: list[str] = load_csv_candidates(unit_path)
+        self.score_cutoff = config.get("ocr", "score_cutoff", default=30)
+        self._indexes = {
+            "name": _CandidateIndex(self.player_candidates, PLAYER_NAME_WEIGHTS),
+            "unit": _CandidateIndex(self.unit_candidates, UNIT_NAME_WEIGHTS),
+        }
+        self.memo_max_entries = config.get("ocr", "match_memo_max_entries", default=10000)
+        self._memo: OrderedDict[tuple[str, str], str | None] = OrderedDict()
 
     def match_candidate(self, text: str, candidates: list[str], scorer: Callable) -> str | None:
         """
@@ -26,9 +92,8 @@ class Matcher:
         """
         if not text:
             return None
-        score_cutoff = self.config.get("ocr", "score_cutoff", default=30)
         result = process.extractOne(
-            text, candidates, scorer=scorer, score_cutoff=score_cutoff
+            text, candidates, scorer=scorer, score_cutoff=self.score_cutoff
         )
         if result is None:
             return None
@@ -39,7 +104,36 @@ class Matcher:
         """
         領域種別（name/unit）に応じて、テキストを候補リストとマッチングして返す関数。
         """
-        if "name" in key:
-            return self.match_candidate(text, self.player_candidates, matching_scorer_for_player_name)
-        else:
-            return self.match_candidate(text, self.unit_candidates, matching_scorer_for_unit_name)
+        return self.match_texts({key: text})[key]
+
+    @timed("matcher")
+    def match_texts(self, texts: dict[str, str]) -> dict[str, str | None]:
+        """
+        領域名→OCRテキストの辞書を受け取り、領域種別（name/unit）ごとにまとめて候補リストとマッチングする。
+        結果は領域名→候補（閾値未満ならNone）の辞書で返す。
+        """
+        results: dict[str, str | None] = {}
+        pending: dict[str, dict[str, list[str]]] = {"name": {}, "unit": {}}
+        for key, text in texts.items():
+            kind = "name" if "name" in key else "unit"
+            if not text:
+                results[key] = None
+            elif (kind, text) in self._memo:
+                results[key] = self._memo[(kind, text)]
+                self._memo.move_to_end((kind, text))
+                profiler.count("matcher_memo_hits")
+            else:
+                pending[kind].setdefault(text, []).append(key)
+
+        for kind, keys_by_text in pending.items():
+            if not keys_by_text:
+                continue
+            queries = list(keys_by_text)
+            profiler.count("matcher_queries", len(queries))
+            for query, match in zip(queries, self._indexes[kind].best_matches(queries, self.score_cutoff)):
+                self._memo[(kind, query)] = match
+                for key in keys_by_text[query]:
+                    results[key] = match
+        while len(self._memo) > self.memo_max_entries:
+            self._memo.popitem(last=False)
+        return {key: results[key] for key in texts}
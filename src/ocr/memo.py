@@ -0,0 +1,94 @@
+import hashlib
+import os
+from collections import OrderedDict
+import numpy as np
+from src.core.config import Config
+from src.util.io import file_lock, load_pickle, save_pickle
+
+
+class OcrMemo:
+    """
+    前処理（二値化）済みの領域画像のハッシュをキーに、OCR生テキストを記憶するLRUキャッシュ。
+    同じ試合の連続したマッチングフレームや、複数の試合に登場する同じプレイヤーの領域は
+    二値化後に同じ画像になることが多いため、OCRを省略できる。
+    path を指定すると、起動時に読み込み、save() で保存して実行や動画をまたいで使い回す。
+    """
+
+    def __init__(self, max_entries: int = 10000, path: str | None = None) -> None:
+        self.max_entries = max_entries
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, str] = OrderedDict()
+        if path and os.path.exists(path):
+            self._entries = load_pickle(path)
+
+    @staticmethod
+    def key(processed_img: np.ndarray, variant: str) -> str:
+        """
+        領域画像とOCRの設定（言語・Page Segmentation Mode など）からキーを作る。
+        """
+        digest = hashlib.sha1(f"{variant}:{processed_img.shape}".encode())
+        digest.update(np.ascontiguousarray(processed_img).tobytes())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> str | None:
+        """
+        記憶しているOCR生テキストを返す。なければNoneを返す。
+        """
+        text = self._entries.get(key)
+        if text is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return text
+
+    def put(self, key: str, text: str) -> None:
+        """
+        OCR生テキストを記憶する。上限を超えたら最後に使われたのが最も古いものから捨てる。
+        """
+        self._entries[key] = text
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def save(self) -> None:
+        """
+        path を指定している場合、記憶している内容をファイルに保存する。
+        一括処理の他のワーカープロセスが先に保存した内容を消さないよう、ロックを取って保存済みの内容を読み直し、
+        合わせてから保存する（同じキーは自分の内容を優先し、上限を超えた分は古いものから捨てる）。
+        """
+        if not self.path:
+            return
+        with file_lock(self.path):
+            entries: OrderedDict[str, str] = OrderedDict()
+            if os.path.exists(self.path):
+                entries = load_pickle(self.path)
+            for key, text in self._entries.items():
+                entries[key] = text
+                entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+            save_pickle(entries, self.path)
+
+    def summary(self) -> str:
+        """
+        ヒット率の表示用文字列を返す。
+        """
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        return f"OCRメモ: {total} 領域中 {self.hits} 領域でOCRを省略（ヒット率 {rate:.1f}%、記憶 {len(self._entries)} 件）"
+
+
+def create_ocr_memo(config: Config) -> OcrMemo | None:
+    """
+    設定の ocr.memo に応じて OcrMemo を生成する。無効な場合はNoneを返す。
+    """
+    memo_conf = config.get("ocr", "memo", default={}) or {}
+    if not memo_conf.get("enabled", True):
+        return None
+    path = None
+    if memo_conf.get("persist", False):
+        path = os.path.join(config.get("output", "cache", default="output/cache"), "ocr_memo.pkl")
+    return OcrMemo(memo_conf.get("max_entries", 10000), path)
@@ -1,19 +1,180 @@
+import bisect
+import queue
+import threading
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from src.core.config import Config
 from src.util.image import get_roi, get_player_unit_roi_from_ratio
-from .preprocess import preprocess_for_ocr
+from src.util.profiler import timed
+from .preprocess import get_preprocess_plan
 from .matcher import Matcher
+from .memo import OcrMemo
 import pytesseract
 
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
 
-def ocr_roi(processed_img: np.ndarray, config: Config) -> str:
+
+class OcrEngine:
     """
-    前処理済み画像からOCR生テキストを抽出して返す関数。
+    前処理済み画像からOCR生テキストを抽出するエンジンの基底クラス。
+    calls はOCRの呼び出し回数（pytesseract では tesseract の起動回数）。
+    """
+
+    calls = 0
+    # 複数スレッドから呼ばれても calls を数え損なわないようにするロック
+    _calls_lock = threading.Lock()
+
+    def _count_call(self) -> None:
+        """
+        OCRの呼び出し回数を1つ増やす。
+        """
+        with self._calls_lock:
+            self.calls += 1
+
+    def image_to_string(self, processed_img: np.ndarray) -> str:
+        """
+        前処理済み画像1枚のOCR生テキストを返す。
+        """
+        raise NotImplementedError
+
+    def images_to_strings(self, processed_imgs: list[np.ndarray]) -> list[str]:
+        """
+        前処理済み画像それぞれのOCR生テキストを、入力と同じ順で返す。
+        """
+        return [self.image_to_string(img) for img in processed_imgs]
+
+    def image_to_words(self, processed_img: np.ndarray, psm: int) -> list[tuple[str, tuple[int, int, int, int]]]:
+        """
+        前処理済み画像を指定した Page Segmentation Mode でOCRし、単語ごとの (テキスト, (x1, y1, x2, y2)) を返す。
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """
+        エンジンが保持する資源を解放する。
+        """
+
+
+class PytesseractEngine(OcrEngine):
+    """
+    pytesseract で1枚ごとに tesseract のプロセスを起動するエンジン。
+    """
+
+    def __init__(self, lang: str, psm: int) -> None:
+        self.lang = lang
+        self.psm = psm
+
+    @timed("tesseract")
+    def image_to_string(self, processed_img: np.ndarray) -> str:
+        self._count_call()
+        return pytesseract.image_to_string(processed_img, lang=self.lang, config=f"--psm {self.psm}").strip()
+
+    @timed("tesseract")
+    def image_to_words(self, processed_img: np.ndarray, psm: int) -> list[tuple[str, tuple[int, int, int, int]]]:
+        self._count_call()
+        data = pytesseract.image_to_data(
+            processed_img, lang=self.lang, config=f"--psm {psm}", output_type=pytesseract.Output.DICT,
+        )
+        words = []
+        for text, left, top, width, height in zip(data["text"], data["left"], data["top"], data["width"], data["height"]):
+            if text.strip():
+                words.append((text.strip(), (left, top, left + width, top + height)))
+        return words
+
+
+class TesserocrEngine(OcrEngine):
+    """
+    言語モデルを読み込み済みの tesseract（tesserocr の PyTessBaseAPI）を pool_size 個保持し、使い回すエンジン。
+    画像はファイルを介さずメモリ上のバッファのまま渡す。
+    複数の画像は各 API で並行に認識する（認識中は GIL が解放される）。
+    """
+
+    def __init__(self, lang: str, psm: int, pool_size: int = 4) -> None:
+        self.psm = psm
+        self._apis: queue.Queue = queue.Queue()
+        self._all_apis = []
+        for _ in range(max(1, pool_size)):
+            api = tesserocr.PyTessBaseAPI(lang=lang, psm=psm)
+            self._all_apis.append(api)
+            self._apis.put(api)
+        self._executor = ThreadPoolExecutor(max_workers=len(self._all_apis))
+
+    @timed("tesseract")
+    def image_to_string(self, processed_img: np.ndarray) -> str:
+        img = np.ascontiguousarray(processed_img)
+        height, width = img.shape[:2]
+        channels = 1 if img.ndim == 2 else img.shape[2]
+        self._count_call()
+        api = self._apis.get()
+        try:
+            api.SetImageBytes(img.tobytes(), width, height, channels, width * channels)
+            return api.GetUTF8Text().strip()
+        finally:
+            self._apis.put(api)
+
+    @timed("tesseract")
+    def image_to_words(self, processed_img: np.ndarray, psm: int) -> list[tuple[str, tuple[int, int, int, int]]]:
+        img = np.ascontiguousarray(processed_img)
+        height, width = img.shape[:2]
+        channels = 1 if img.ndim == 2 else img.shape[2]
+        level = tesserocr.RIL.WORD
+        self._count_call()
+        api = self._apis.get()
+        try:
+            api.SetPageSegMode(psm)
+            api.SetImageBytes(img.tobytes(), width, height, channels, width * channels)
+            api.Recognize()
+            iterator = api.GetIterator()
+            words = []
+            if iterator is not None:
+                for word in tesserocr.iterate_level(iterator, level):
+                    text = word.GetUTF8Text(level)
+                    if text and text.strip():
+                        words.append((text.strip(), word.BoundingBox(level)))
+            return words
+        finally:
+            api.SetPageSegMode(self.psm)
+            self._apis.put(api)
+
+    def images_to_strings(self, processed_imgs: list[np.ndarray]) -> list[str]:
+        return list(self._executor.map(self.image_to_string, processed_imgs))
+
+    def close(self) -> None:
+        self._executor.shutdown()
+        for api in self._all_apis:
+            api.End()
+        self._all_apis = []
+
+
+def create_ocr_engine(config: Config, backend: str | None = None) -> OcrEngine:
+    """
+    設定の ocr.engine（auto / tesserocr / pytesseract）に応じたOCRエンジンを生成する。
+    auto では tesserocr が使えればそれを、使えなければ pytesseract を使う。
     """
     ocr_conf = config.get("ocr", default={})
     lang = ocr_conf.get("lang", "jpn+eng")
     psm = ocr_conf.get("psm", 7)
-    return pytesseract.image_to_string(processed_img, lang=lang, config=f"--psm {psm}").strip()
+    backend = backend or ocr_conf.get("engine", "auto")
+    if backend == "pytesseract":
+        return PytesseractEngine(lang, psm)
+    if tesserocr is None:
+        if backend == "tesserocr":
+            raise ImportError("ocr.engine に tesserocr が指定されていますが、tesserocr がインストールされていません。")
+        return PytesseractEngine(lang, psm)
+    return TesserocrEngine(lang, psm, pool_size=ocr_conf.get("engine_pool_size", 4))
+
+
+def ocr_roi(processed_img: np.ndarray, config: Config, engine: OcrEngine | None = None) -> str:
+    """
+    前処理済み画像からOCR生テキストを抽出して返す関数。
+    engine を省略した場合は pytesseract で抽出する。
+    """
+    if engine is None:
+        engine = create_ocr_engine(config, backend="pytesseract")
+    return engine.image_to_string(processed_img)
 
 
 def preprocess_ocr_text(text: str) -> str:
@@ -32,31 +193,157 @@ def preprocess_ocr_text(text: str) -> str:
     return text
 
 
-def get_preprocessed_text_from_roi(img: np.ndarray, roi: tuple[int, int, int, int], config: Config) -> str:
+def get_preprocessed_text_from_roi(
+    img: np.ndarray,
+    roi: tuple[int, int, int, int],
+    config: Config,
+    engine: OcrEngine | None = None,
+    memo: OcrMemo | None = None,
+) -> str:
     """
     指定画像とROIから前処理済みテキストを返す関数。
+    memo を指定した場合、前処理後の画像が同じ領域はOCRを省略して記憶したテキストを使う。
     """
-    processed = preprocess_for_ocr(get_roi(img, roi), config)
-    ocr_text = ocr_roi(processed, config)
+    processed = get_preprocess_plan(config).apply(get_roi(img, roi))
+    if engine is None:
+        engine = create_ocr_engine(config, backend="pytesseract")
+    ocr_text = recognize_regions([processed], config, engine, memo)[0]
     preprocessed_text = preprocess_ocr_text(ocr_text)
     return preprocessed_text
 
 
-def ocr_on_matching_regions(img: np.ndarray, config: Config, matcher: Matcher) -> dict[str, str | None]:
+def tile_for_ocr(processed_imgs: list[np.ndarray], gap: int) -> tuple[np.ndarray, list[int]]:
+    """
+    前処理済み（二値化済み）の画像を、白い余白 gap ピクセルを挟んで縦に並べた1枚の画像にする。
+    戻り値: (並べた画像, 隣り合う画像の境界となるy座標のリスト（余白の中央）)
+    """
+    width = max(img.shape[1] for img in processed_imgs) + gap * 2
+    height = sum(img.shape[0] for img in processed_imgs) + gap * (len(processed_imgs) + 1)
+    canvas = np.full((height, width), 255, dtype=np.uint8)
+    boundaries = []
+    y = gap
+    for img in processed_imgs:
+        h, w = img.shape[:2]
+        canvas[y:y + h, gap:gap + w] = img
+        y += h + gap
+        boundaries.append(y - gap // 2)
+    return canvas, boundaries[:-1]
+
+
+def ocr_tiled(processed_imgs: list[np.ndarray], config: Config, engine: OcrEngine) -> list[str]:
+    """
+    前処理済みの画像を1枚に並べて1回だけOCRし、単語の位置から元の画像ごとのOCR生テキストに振り分けて返す。
+    """
+    batch_conf = config.get("ocr", "batch", default={}) or {}
+    canvas, boundaries = tile_for_ocr(processed_imgs, batch_conf.get("gap", 40))
+    words: list[list[tuple[int, str]]] = [[] for _ in processed_imgs]
+    for text, (x1, y1, x2, y2) in engine.image_to_words(canvas, batch_conf.get("psm", 6)):
+        # 単語の中心がどの画像の範囲にあるかで振り分ける
+        words[bisect.bisect_right(boundaries, (y1 + y2) / 2)].append((x1, text))
+    return [" ".join(text for _, text in sorted(tile_words)) for tile_words in words]
+
+
+def recognize_regions(
+    processed_imgs: list[np.ndarray],
+    config: Config,
+    engine: OcrEngine,
+    memo: OcrMemo | None = None,
+    tiled: bool = False,
+) -> list[str]:
+    """
+    前処理済みの領域画像それぞれのOCR生テキストを、入力と同じ順で返す。
+    memo を指定した場合は記憶済みの領域を除いた残りだけをOCRし、その結果を記憶する。
+    tiled が true の場合は残りの領域を1枚に並べて1回でOCRする。
+    """
+    ocr_conf = config.get("ocr", default={})
+    if tiled:
+        variant = f"{ocr_conf.get('lang', 'jpn+eng')}:tiled:{(ocr_conf.get('batch') or {}).get('psm', 6)}"
+    else:
+        variant = f"{ocr_conf.get('lang', 'jpn+eng')}:{ocr_conf.get('psm', 7)}"
+
+    keys = [memo.key(img, variant) for img in processed_imgs] if memo is not None else []
+    texts = [memo.get(key) for key in keys] if memo is not None else [None] * len(processed_imgs)
+    missing = [i for i, text in enumerate(texts) if text is None]
+    if missing:
+        imgs = [processed_imgs[i] for i in missing]
+        recognized = ocr_tiled(imgs, config, engine) if tiled else engine.images_to_strings(imgs)
+        for i, text in zip(missing, recognized):
+            texts[i] = text
+            if memo is not None:
+                memo.put(keys[i], text)
+    return texts
+
+
+def _player_unit_regions(
+    img: np.ndarray, config: Config, keys: list[str] | None = None,
+) -> dict[str, tuple[int, int, int, int]]:
+    """
+    プレイヤー名・機体名の領域座標を返す。keys を指定した場合はその領域だけを返す。
+    """
+    roi_config = config.get("roi", "player_unit", default={})
+    if keys is not None:
+        roi_config = {key: roi_config[key] for key in keys}
+    return get_player_unit_roi_from_ratio(img, roi_config)
+
+
+def ocr_on_matching_frames(
+    imgs: list[np.ndarray],
+    config: Config,
+    matcher: Matcher,
+    engine: OcrEngine,
+    memo: OcrMemo | None = None,
+    keys: list[str] | None = None,
+) -> list[dict[str, str | None]]:
+    """
+    複数のマッチング画面画像のプレイヤー名・機体名の領域をすべて1枚に並べて1回でOCRし、
+    画像ごとに ocr_on_matching_regions と同じ形式の辞書を返す。
+    keys を指定した場合は、各画像のその領域だけをOCRする。
+    """
+    if any(img is None for img in imgs):
+        raise FileNotFoundError("Image not found")
+
+    plan = get_preprocess_plan(config)
+    frame_keys_list = []
+    processed = []
+    for img in imgs:
+        regions = _player_unit_regions(img, config, keys)
+        frame_keys_list.append(list(regions))
+        processed += plan.apply_regions(img, list(regions.values()))
+
+    texts = iter(recognize_regions(processed, config, engine, memo, tiled=True))
+    return [
+        matcher.match_texts({key: preprocess_ocr_text(next(texts)) for key in frame_keys})
+        for frame_keys in frame_keys_list
+    ]
+
+
+def ocr_on_matching_regions(
+    img: np.ndarray,
+    config: Config,
+    matcher: Matcher,
+    engine: OcrEngine | None = None,
+    memo: OcrMemo | None = None,
+    keys: list[str] | None = None,
+) -> dict[str, str | None]:
     """
     マッチング画面画像から各領域を切り出し、OCR・候補マッチングを行い、
     プレイヤー名・機体名を辞書で返す。
     領域ごと（プレイヤー名・機体名）に適切なスコアリング関数を利用。
+    engine を指定した場合、全領域をまとめてエンジンに渡す（エンジンによっては並行に認識する）。
+    ocr.batch.enabled が true の場合は、全領域を1枚に並べて1回でOCRする。
+    memo を指定した場合、前処理後の画像が同じ領域はOCRを省略する。
+    keys を指定した場合はその領域だけをOCRする。
     """
     if img is None:
         raise FileNotFoundError("Image not found")
 
-    results = {}
-    roi_config = config.get("roi", "player_unit", default={})
-    regions = get_player_unit_roi_from_ratio(img, roi_config)
+    if engine is None:
+        engine = create_ocr_engine(config, backend="pytesseract")
+    if config.get("ocr", "batch", "enabled", default=False):
+        return ocr_on_matching_frames([img], config, matcher, engine, memo, keys)[0]
 
-    for key, roi in regions.items():
-        preprocessed_text = get_preprocessed_text_from_roi(img, roi, config)
-        results[key] = matcher.match_text(key, preprocessed_text)
+    regions = _player_unit_regions(img, config, keys)
 
-    return results
+    processed = get_preprocess_plan(config).apply_regions(img, list(regions.values()))
+    texts = recognize_regions(processed, config, engine, memo)
+    return matcher.match_texts({key: preprocess_ocr_text(text) for key, text in zip(regions, texts)})
@@ -1,6 +1,8 @@
+import weakref
 import cv2
 import numpy as np
 from src.core.config import Config
+from src.util.profiler import timed
 
 
 def preprocess_for_ocr(img: np.ndarray, config: Config) -> np.ndarray:
@@ -35,3 +37,83 @@ def preprocess_for_ocr(img: np.ndarray, config: Config) -> np.ndarray:
     _, target = cv2.threshold(target, thresh, 255, cv2.THRESH_BINARY)
 
     return target
+
+
+class OcrPreprocessPlan:
+    """
+    preprocess_for_ocr と同じ前処理を、設定から1度だけ組み立てた手順で行うクラス。
+    1フレーム分の領域は、全領域を含む範囲のグレースケール化・反転を1度で済ませ、
+    拡大以降の中間結果は領域ごとに確保したバッファを使い回す。
+    """
+
+    def __init__(self, config: Config) -> None:
+        preprocess = config.get("preprocess", default={})
+        self.scale = preprocess.get("scale", 4)
+        self.alpha = preprocess.get("alpha", 1)
+        self.beta = preprocess.get("beta", 10)
+        self.kernel = np.array(preprocess.get("sharp_kernel", [[0, -1, 0], [-1, 5, -1], [0, -1, 0]]))
+        self.thresh = preprocess.get("thresh", 127)
+        # 拡大後の大きさ (高さ, 幅) ごとの中間バッファ（拡大・コントラスト強調・シャープ化）
+        self._buffers: dict[tuple[int, int], tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+
+    def _buffers_for(self, height: int, width: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        拡大後の大きさに対応する中間バッファを返す。
+        """
+        size = (round(height * self.scale), round(width * self.scale))
+        if size not in self._buffers:
+            self._buffers[size] = tuple(np.empty(size, dtype=np.uint8) for _ in range(3))
+        return self._buffers[size]
+
+    def _apply_inverted(self, inverted: np.ndarray) -> np.ndarray:
+        """
+        グレースケール化・反転済みの領域に、拡大以降の処理を行って二値化画像を返す。
+        返す画像は呼び出しごとに新しく確保する。
+        """
+        resized, contrasted, sharpened = self._buffers_for(*inverted.shape[:2])
+        cv2.resize(inverted, (resized.shape[1], resized.shape[0]), dst=resized,
+                   fx=self.scale, fy=self.scale, interpolation=cv2.INTER_CUBIC)
+        cv2.convertScaleAbs(resized, dst=contrasted, alpha=self.alpha, beta=self.beta)
+        cv2.filter2D(contrasted, -1, self.kernel, dst=sharpened)
+        _, binary = cv2.threshold(sharpened, self.thresh, 255, cv2.THRESH_BINARY)
+        return binary
+
+    @timed("ocr_preprocess")
+    def apply(self, img: np.ndarray) -> np.ndarray:
+        """
+        1枚の画像を前処理する。preprocess_for_ocr と同じ画像を返す。
+        """
+        return self._apply_inverted(cv2.bitwise_not(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)))
+
+    @timed("ocr_preprocess")
+    def apply_regions(self, img: np.ndarray, rois: list[tuple[int, int, int, int]]) -> list[np.ndarray]:
+        """
+        フレーム画像の各ROI (x1, y1, x2, y2) を前処理し、ROIと同じ順で返す。
+        各ROIを切り出して preprocess_for_ocr にかけた場合と同じ画像になる。
+        """
+        if not rois:
+            return []
+        x1 = min(roi[0] for roi in rois)
+        y1 = min(roi[1] for roi in rois)
+        x2 = max(roi[2] for roi in rois)
+        y2 = max(roi[3] for roi in rois)
+        # グレースケール化・反転は画素ごとの処理のため、全ROIを含む範囲でまとめて行う
+        inverted = cv2.bitwise_not(cv2.cvtColor(img[y1:y2, x1:x2], cv2.COLOR_BGR2GRAY))
+        return [
+            self._apply_inverted(inverted[ry1 - y1:ry2 - y1, rx1 - x1:rx2 - x1])
+            for rx1, ry1, rx2, ry2 in rois
+        ]
+
+
+# 設定ごとに組み立てた前処理の手順
+_plans: "weakref.WeakKeyDictionary[Config, OcrPreprocessPlan]" = weakref.WeakKeyDictionary()
+
+
+def get_preprocess_plan(config: Config) -> OcrPreprocessPlan:
+    """
+    設定に対応する前処理の手順を返す。同じ設定オブジェクトに対しては1度だけ組み立てる。
+    """
+    plan = _plans.get(config)
+    if plan is None:
+        plan = _plans[config] = OcrPreprocessPlan(config)
+    return plan
@@ -1,6 +1,10 @@
 import re
 from rapidfuzz import fuzz
 
+# 文字列類似度・文字種パターン一致度の重みと、長さの差1文字あたりのペナルティ
+UNIT_NAME_WEIGHTS = (0.7, 0.3, 10)
+PLAYER_NAME_WEIGHTS = (1.0, 0.0, 5)
+
 
 def get_char_type(ch: str) -> str:
     """
@@ -18,12 +22,37 @@ def get_char_type(ch: str) -> str:
         return "S"
 
 
+class _CharTypeTable(dict):
+    """
+    str.translate 用の、文字コードから文字種への変換表。
+    get_char_type と同じ判定を範囲指定で表し、空白文字は取り除く。
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        for first, last, char_type in (
+            (0x4E00, 0x9FFF, "K"),
+            (0x30A0, 0x30FF, "C"),
+            (ord("A"), ord("Z"), "E"),
+            (ord("a"), ord("z"), "E"),
+            (ord("0"), ord("9"), "N"),
+            (ord("０"), ord("９"), "N"),
+        ):
+            self.update(dict.fromkeys(range(first, last + 1), char_type))
+
+    def __missing__(self, code: int) -> str | None:
+        return None if chr(code).isspace() else "S"
+
+
+_CHAR_TYPE_TABLE = _CharTypeTable()
+
+
 def get_pattern(s: str) -> str:
     """
     文字列sの各文字の文字種パターンを連結して返す。
     例: "騎士ガンダム" → "KKCCCC", "νガンダム" → "SCCCC"
     """
-    return "".join(get_char_type(ch) for ch in s if ch.strip())
+    return s.translate(_CHAR_TYPE_TABLE)
 
 
 def matching_scorer_for_unit_name(a: str, b: str, **kwargs) -> float:
@@ -33,12 +62,13 @@ def matching_scorer_for_unit_name(a: str, b: str, **kwargs) -> float:
     機体名はOCR検出しづらい漢字やギリシャ文字を含む名称が少なく、文字種パターン列の違いがマッチング精度に比較的大きく影響するため、
     文字種パターン列を考慮したスコアリングを行う。
     """
+    text_weight, pattern_weight, penalty = UNIT_NAME_WEIGHTS
     score_text = fuzz.ratio(a, b)
     pattern_a = get_pattern(a)
     pattern_b = get_pattern(b)
     score_pattern = fuzz.ratio(pattern_a, pattern_b)
-    length_penalty = abs(len(a) - len(b)) * 10
-    return score_text * 0.7 + score_pattern * 0.3 - length_penalty
+    length_penalty = abs(len(a) - len(b)) * penalty
+    return score_text * text_weight + score_pattern * pattern_weight - length_penalty
 
 
 def matching_scorer_for_player_name(a: str, b: str, **kwargs) -> float:
@@ -47,5 +77,5 @@ def matching_scorer_for_player_name(a: str, b: str, **kwargs) -> float:
     文字列類似度－長さペナルティでスコアを算出。
     """
     score = fuzz.ratio(a, b)
-    length_penalty = abs(len(a) - len(b)) * 5
+    length_penalty = abs(len(a) - len(b)) * PLAYER_NAME_WEIGHTS[2]
     return score - length_penalty
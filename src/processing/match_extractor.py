@@ -1,9 +1,15 @@
 import os
+from collections import Counter
 import cv2
+import numpy as np
 from tqdm import tqdm
+from typing import Iterator
 from src.core.config import Config
-from src.ocr import ocr_on_matching_regions, Matcher
-from src.util.timestamp import calculate_timestamp
+from src.ocr import OcrEngine, OcrMemo, create_ocr_engine, create_ocr_memo, ocr_on_matching_frames, ocr_on_matching_regions, Matcher
+from src.util.frame_index import FrameIndex
+from src.util.profiler import profiler, timed
+from src.util.timestamp import format_timestamp
+from src.video.handler import open_video, read_frame_at, screen_frame_index
 
 
 class MatchExtractor:
@@ -11,90 +17,193 @@ class MatchExtractor:
     マッチング画面→リザルト画面のペアごとにOCRを実行し、試合結果を抽出するクラス。
     """
 
-    def __init__(self, frame_interval: float, config: Config) -> None:
+    def __init__(
+        self,
+        frame_interval: float,
+        config: Config,
+        video_path: str | None = None,
+        matcher: Matcher | None = None,
+        ocr_engine: OcrEngine | None = None,
+        ocr_memo: OcrMemo | None = None,
+    ) -> None:
         self.frame_interval = frame_interval
         self.config = config
-        self.matcher = Matcher(config)
-
-    def _get_match_timestamp(self, frame_name: str) -> str:
+        # 候補リストを読み込み済みの Matcher を渡された場合は使い回す
+        self.matcher = matcher if matcher is not None else Matcher(config)
+        # tesseract を起動済みのOCRエンジンを渡された場合も同様に使い回す
+        self.ocr_engine = ocr_engine if ocr_engine is not None else create_ocr_engine(config)
+        # 前処理後の領域画像ごとのOCR結果の記憶（試合や動画をまたいで使い回す）
+        self.ocr_memo = ocr_memo if ocr_memo is not None else create_ocr_memo(config)
+        self.fractional_seconds = config.get("output", "fractional_seconds", default=False)
+        # 画像が保存されていないフレームは、この動画からシークして読み込む
+        self.video_path = video_path
+        self._cap: cv2.VideoCapture | None = None
+        # 項目ごとに結果を確定させ、未確定の領域だけを後続のフレームでOCRするか
+        self.consensus = config.get("ocr", "consensus", "enabled", default=False)
+        # 同じ候補がこの回数だけ得られたら項目を確定する
+        self.consensus_votes = max(1, config.get("ocr", "consensus", "votes", default=1))
+        # 試合ごとのOCRした領域数（OCRの記憶で省略したものを含む）
+        self.ocr_region_counts: list[int] = []
+        self._region_count = 0
+
+    def _get_match_timestamp(self, screen: dict) -> str:
         """
-        フレーム名からタイムスタンプを計算する。
+        画面判定結果の抽出番号からタイムスタンプを計算する。
         """
-        return calculate_timestamp(frame_name, self.frame_interval)
+        return format_timestamp(screen_frame_index(screen) * self.frame_interval, self.fractional_seconds)
 
-    def extract_match_results(self, screens: list[dict], match_count: int) -> list[dict]:
+    def _load_frame(self, screen: dict) -> np.ndarray | None:
+        """
+        画面判定結果のフレーム画像を読み込む。
+        保存済みの画像があればそれを使い、なければ動画の再生位置へシークして読み込む。
+        """
+        path = screen.get("path")
+        if path and os.path.exists(path):
+            with profiler.stage("imread"):
+                return cv2.imread(path)
+        if self.video_path is None or "pts" not in screen:
+            return None
+        if self._cap is None:
+            self._cap = open_video(self.video_path)
+        return read_frame_at(self._cap, screen["pts"])
+
+    def extract_match_results(self, index: FrameIndex) -> list[dict]:
         """
         マッチング画面→リザルト画面のペアごとにOCRを実行し、
         1試合分の情報を辞書としてまとめてリストで返す。
         """
         results = []
-        i = 0
-        pbar = tqdm(total=match_count, desc="試合情報抽出")
-
-        while i < len(screens) - 1:
-            # マッチンググループの収集
-            matching_frames = []
-            while i < len(screens) and screens[i]["type"] == "matching":
-                matching_frames.append(screens[i])
-                i += 1
-
-            # 次がリザルト画面か判定
-            if i < len(screens) and screens[i]["type"] in ("result_win", "result_lose") and matching_frames:
-                match_info = self._extract_single_match(matching_frames, screens[i])
-                if match_info:
-                    results.append(match_info)
-                i += 1
-                pbar.update(1)
-            else:
-                i += 1
+        pbar = tqdm(total=index.match_count, desc="試合情報抽出")
+        for matching_frames, result_screen in index.iter_matches():
+            match_info = self._extract_single_match(matching_frames, result_screen)
+            if match_info:
+                results.append(match_info)
+            pbar.update(1)
 
         pbar.close()
+        if self.ocr_region_counts:
+            total = sum(self.ocr_region_counts)
+            print(f"OCRした領域: {len(self.ocr_region_counts)} 試合で計 {total}（試合あたり {total / len(self.ocr_region_counts):.1f}）")
+        if self.ocr_memo is not None:
+            print(self.ocr_memo.summary())
+            self.ocr_memo.save()
+        if self._cap is not None:
+            self._cap.release()
+            self._cap = None
         return results
 
+    @timed("extract_match")
     def _extract_single_match(self, matching_frames: list[dict], result_screen: dict) -> dict | None:
         """
         単一試合の情報を抽出する。
         """
         # OCR処理で最適なフレームを選択
-        final_info, used_frame_name = self._find_best_ocr_result(matching_frames)
+        self._region_count = 0
+        if self.consensus:
+            final_info, used_frame = self._resolve_fields(matching_frames)
+        else:
+            final_info, used_frame = self._find_best_ocr_result(matching_frames)
+        self.ocr_region_counts.append(self._region_count)
+        profiler.count("ocr_regions", self._region_count)
 
         # 勝敗情報を設定
         result_info = self._get_result_info(result_screen["type"])
 
-        # タイムスタンプを追加
-        match_timestamp = self._get_match_timestamp(used_frame_name)
+        # タイムスタンプは OCR に使ったフレームによらず、試合の最初の matching フレームから計算する
+        match_timestamp = self._get_match_timestamp(matching_frames[0])
 
         # 最終的な試合情報を作成
         return {
             **final_info,
             **result_info,
             "start_time": match_timestamp,
-            "ocr_frame_name": used_frame_name
+            "ocr_frame_name": f"frame_{screen_frame_index(used_frame):05d}.png"
+        }
+
+    def _frames_per_call(self) -> int:
+        """
+        1回のOCRで処理するマッチングフレーム数を返す（ocr.batch.enabled が true の場合のみ ocr.batch.frames）。
+        """
+        if not self.config.get("ocr", "batch", "enabled", default=False):
+            return 1
+        return max(1, self.config.get("ocr", "batch", "frames", default=1))
+
+    def _ocr_frames(self, frames: list[dict], keys: list[str]) -> list[dict]:
+        """
+        マッチングフレームの keys の領域をOCRし、フレームごとのOCR結果を返す。
+        """
+        self._region_count += len(frames) * len(keys)
+        if len(frames) == 1 and not self.config.get("ocr", "batch", "enabled", default=False):
+            match_img = self._load_frame(frames[0])
+            return [ocr_on_matching_regions(match_img, self.config, self.matcher, self.ocr_engine, self.ocr_memo, keys)]
+        match_imgs = [self._load_frame(frame) for frame in frames]
+        return ocr_on_matching_frames(match_imgs, self.config, self.matcher, self.ocr_engine, self.ocr_memo, keys)
+
+    def _iter_ocr_results(self, matching_frames: list[dict]) -> Iterator[tuple[dict, dict]]:
+        """
+        マッチングフレームを先頭から順にOCRし、(画面判定結果, OCR結果) を返すジェネレータ。
+        ocr.batch.enabled が true の場合は ocr.batch.frames 枚ずつまとめて1回でOCRする。
+        """
+        keys = list(self.config.get("roi", "player_unit", default={}))
+        frames_per_call = self._frames_per_call()
+        for i in range(0, len(matching_frames), frames_per_call):
+            chunk = matching_frames[i:i + frames_per_call]
+            yield from zip(chunk, self._ocr_frames(chunk, keys))
+
+    def _resolve_fields(self, matching_frames: list[dict]) -> tuple[dict, dict]:
+        """
+        マッチングフレームを先頭から順にOCRし、項目（プレイヤー名・機体名）ごとに結果を確定させる。
+        同じ候補が ocr.consensus.votes 回得られた項目は確定し、以降のフレームでは確定していない領域だけをOCRする。
+        全フレームを見ても確定しなかった項目は、最も多く得られた候補（同数なら先に得られたもの）とする。
+        戻り値: (OCR結果, 最後に項目の候補が得られたフレームの画面判定結果)
+        """
+        keys = list(self.config.get("roi", "player_unit", default={}))
+        votes = {key: Counter() for key in keys}
+        resolved: dict[str, str] = {}
+        used_frame = matching_frames[0]
+        frames_per_call = self._frames_per_call()
+
+        i = 0
+        while i < len(matching_frames) and len(resolved) < len(keys):
+            chunk = matching_frames[i:i + frames_per_call]
+            i += frames_per_call
+            pending = [key for key in keys if key not in resolved]
+            for frame, match_info in zip(chunk, self._ocr_frames(chunk, pending)):
+                for key, value in match_info.items():
+                    if value is None or key in resolved:
+                        continue
+                    used_frame = frame
+                    votes[key][value] += 1
+                    if votes[key][value] >= self.consensus_votes:
+                        resolved[key] = value
+
+        final_info = {
+            key: resolved.get(key) or (votes[key].most_common(1)[0][0] if votes[key] else None)
+            for key in keys
         }
+        return final_info, used_frame
 
-    def _find_best_ocr_result(self, matching_frames: list[dict]) -> tuple[dict | None, str | None]:
+    def _find_best_ocr_result(self, matching_frames: list[dict]) -> tuple[dict | None, dict | None]:
         """
         マッチングフレーム群から最適なOCR結果を選択する。
+        戻り値: (OCR結果, 採用したフレームの画面判定結果)
         """
         final_info = None
-        used_frame_name = None
-
-        for frame in matching_frames:
-            match_img = cv2.imread(frame["path"])
-            match_info = ocr_on_matching_regions(match_img, self.config, self.matcher)
+        used_frame = None
 
+        for frame, match_info in self._iter_ocr_results(matching_frames):
             # 欠損がなければ採用して終了
             if all(v is not None for v in match_info.values()):
                 final_info = match_info
-                used_frame_name = os.path.basename(frame["path"])
+                used_frame = frame
                 break
 
             # 欠損がある場合も、より多く埋まったものを優先
             if final_info is None or sum(v is not None for v in match_info.values()) > sum(v is not None for v in final_info.values()):
                 final_info = match_info
-                used_frame_name = os.path.basename(frame["path"])
+                used_frame = frame
 
-        return final_info, used_frame_name
+        return final_info, used_frame
 
     def _get_result_info(self, result_type: str) -> dict:
         """
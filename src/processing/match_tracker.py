@@ -0,0 +1,26 @@
+class MatchTracker:
+    """
+    matching/result フレームの画面判定結果を時系列順に受け取り、matching → result の遷移（試合）を検出するクラス。
+    直前の画面種別と試合の最初の matching フレームだけを保持するため、長時間の入力でもメモリ使用量は一定。
+    """
+
+    def __init__(self) -> None:
+        self.match_count = 0
+        self._prev_type: str | None = None
+        self._first_matching: dict | None = None
+
+    def feed(self, screen: dict) -> dict | None:
+        """
+        画面判定結果を1つ受け取る。
+        matching → result の遷移で試合が確定した場合は、その試合の最初の matching フレームの画面判定結果を返す。
+        """
+        screen_type = screen["type"]
+        confirmed = None
+        if screen_type == "matching":
+            if self._prev_type != "matching":
+                self._first_matching = screen
+        elif screen_type in ("result_win", "result_lose") and self._prev_type == "matching":
+            self.match_count += 1
+            confirmed = self._first_matching
+        self._prev_type = screen_type
+        return confirmed
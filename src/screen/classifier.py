@@ -1,7 +1,76 @@
 import cv2
+import math
 import numpy as np
+from typing import Iterator
 from src.core.config import Config
 from src.util.image import resize_to_template, roi_ratio_to_absolute
+from src.util.profiler import timed
+
+# 重複フレーム判定に使うROI縮小画像のサイズ (幅, 高さ)
+SIGNATURE_SIZE = (32, 16)
+# 類似度を記録する画面種別（判定順）
+SCORE_TYPES = ("matching", "result_win", "result_lose")
+
+
+class _TemplatePlan:
+    """
+    1つのテンプレートについて、特定の入力解像度向けに前計算した照合パラメータ。
+    ROIをテンプレートサイズへ拡縮する処理（INTER_AREA）を行列 Ry, Rx で表し、
+    TM_CCOEFF_NORMED の値をROI上の内積だけで求められるように変形しておく。
+    """
+
+    def __init__(self, template: np.ndarray, height: int, width: int) -> None:
+        th, tw = template.shape[:2]
+        # 単位行列をリサイズすると、各軸のリサイズ行列がそのまま得られる
+        ry = cv2.resize(np.eye(height, dtype=np.float32), (height, th), interpolation=cv2.INTER_AREA)
+        rx_t = cv2.resize(np.eye(width, dtype=np.float32), (tw, width), interpolation=cv2.INTER_AREA)
+        t0 = template.astype(np.float64)
+        t0 -= t0.mean()
+
+        self.size = th * tw
+        self.template_norm2 = float(np.sum(t0 * t0))
+        # 相関の分子 <Ry I Rx^T, T0> = <I, Ry^T T0 Rx>
+        self.kernel = (ry.T @ t0.astype(np.float32) @ rx_t.T).astype(np.float32)
+        # リサイズ後画像の平均を求める重み
+        self.mean_y = ry.sum(axis=0)
+        self.mean_x = rx_t.sum(axis=1)
+        # リサイズ後画像の二乗和 ||Ry I Rx^T||^2 = sum((Gy I) * (I Gx))
+        self.gram_y = ry.T @ ry
+        self.gram_x = rx_t @ rx_t.T
+
+    def score(self, region: np.ndarray) -> float:
+        """
+        グレースケールのROI（float32）とテンプレートの正規化相関係数を返す。
+        cv2.resize → cv2.matchTemplate(TM_CCOEFF_NORMED)（_match_score）に相当する値を求める。
+        リサイズ結果を8bitに丸めないことと浮動小数点の計算順の違いから、値は完全には一致せず 8e-5 程度の差が出る。
+        """
+        # 定数を引いても相関係数は変わらないため、桁落ちを避けるために中心化しておく
+        region = region - region.mean()
+        numerator = float(np.sum(region * self.kernel, dtype=np.float64))
+        mean = float(self.mean_y @ region @ self.mean_x) / self.size
+        sum_sq = float(np.sum((self.gram_y @ region) * (region @ self.gram_x), dtype=np.float64))
+        denominator = (sum_sq - self.size * mean * mean) * self.template_norm2
+        if denominator <= 0:
+            return 0.0
+        return numerator / math.sqrt(denominator)
+
+
+class _ResolutionPlan:
+    """
+    入力解像度ごとに前計算した画面判定の手順。
+    ピクセル単位のROIと、切り出し領域ごとの照合パラメータを保持する。
+    win/lose のようにROIが重なるテンプレートは、和集合の領域を1度だけ切り出してグレースケール化する。
+    """
+
+    def __init__(
+        self,
+        groups: list[tuple[tuple[int, int, int, int], list[tuple[str, tuple[int, int, int, int], _TemplatePlan | None, np.ndarray]]]],
+        coarse_entries: list[tuple[str, tuple[int, int, int, int], _TemplatePlan | None]],
+    ) -> None:
+        # groups: [(切り出し領域, [(画面種別, 切り出し領域内のROI, 照合パラメータ, テンプレート), ...]), ...]
+        self.groups = groups
+        # coarse_entries: 前段フィルタ用 [(画面種別, ROI, 間引いたROI向けの照合パラメータ), ...]
+        self.coarse_entries = coarse_entries
 
 
 class ScreenClassifier:
@@ -21,6 +90,15 @@ class ScreenClassifier:
         self.vs_template = self._load_template(self.template_config.get("vs"))
         self.win_template = self._load_template(self.template_config.get("win"))
         self.lose_template = self._load_template(self.template_config.get("lose"))
+        # 前段フィルタ（ROIを間引いた粗い照合で、明らかに該当しないフレームを早期に棄却する）
+        prefilter = self.template_config.get("prefilter", {}) or {}
+        self.prefilter_enabled = prefilter.get("enabled", False)
+        self.prefilter_stride = max(1, int(prefilter.get("stride", 4)))
+        self.prefilter_margin = prefilter.get("margin", 0.15)
+        # 段ごとの処理フレーム数
+        self.stage_counts = {"prefilter": 0, "template": 0}
+        # 入力解像度 (h, w) ごとの判定手順
+        self._plans: dict[tuple[int, int], _ResolutionPlan] = {}
 
     def _load_template(self, template_path: str | None) -> np.ndarray | None:
         """
@@ -34,28 +112,173 @@ class ScreenClassifier:
         """
         指定したROI領域でテンプレートマッチングを行い、類似度が閾値以上ならTrueを返す。
         """
-        threshold = self.threshold
+        return self._match_score(img, template, roi) >= self.threshold
+
+    def _match_score(self, img: np.ndarray, template: np.ndarray, roi: tuple | None = None) -> float:
+        """
+        指定したROI領域をテンプレートサイズにリサイズし、テンプレートとの類似度を返す。
+        """
         if roi:
             x1, y1, x2, y2 = roi
             img = img[y1:y2, x1:x2]
         region_resized = resize_to_template(img, template)
-        region_gray = cv2.cvtColor(region_resized, cv2.COLOR_BGR2GRAY)
-        res = cv2.matchTemplate(region_gray, template, cv2.TM_CCOEFF_NORMED)
+        if region_resized.ndim == 3:
+            region_resized = cv2.cvtColor(region_resized, cv2.COLOR_BGR2GRAY)
+        res = cv2.matchTemplate(region_resized, template, cv2.TM_CCOEFF_NORMED)
         _, max_val, _, _ = cv2.minMaxLoc(res)
-        return max_val >= threshold
+        return max_val
 
+    def _build_plan(self, img: np.ndarray) -> _ResolutionPlan:
+        """
+        入力画像の解像度に合わせて判定手順を組み立てる。
+        """
+        targets = [
+            [("matching", self.vs_template, self.roi_config.get("vs"))],
+            [("result_win", self.win_template, self.roi_config.get("win")),
+             ("result_lose", self.lose_template, self.roi_config.get("lose"))],
+        ]
+        groups = []
+        coarse_entries = []
+        stride = self.prefilter_stride
+        for group in targets:
+            entries = []
+            for screen_type, template, roi_ratio in group:
+                if template is None or not roi_ratio:
+                    continue
+                x1, y1, x2, y2 = roi_ratio_to_absolute(img, roi_ratio)
+                if x2 <= x1 or y2 <= y1:
+                    continue
+                entries.append((screen_type, (x1, y1, x2, y2), template))
+            if not entries:
+                continue
+
+            # 重なるROIはまとめて1度だけ切り出す
+            crop = (
+                min(roi[0] for _, roi, _ in entries),
+                min(roi[1] for _, roi, _ in entries),
+                max(roi[2] for _, roi, _ in entries),
+                max(roi[3] for _, roi, _ in entries),
+            )
+            plans = []
+            for screen_type, (x1, y1, x2, y2), template in entries:
+                local_roi = (x1 - crop[0], y1 - crop[1], x2 - crop[0], y2 - crop[1])
+                plans.append((screen_type, local_roi, self._build_template_plan(template, y2 - y1, x2 - x1), template))
+                if self.prefilter_enabled:
+                    # ROIを stride ごとに間引いた画像を、そのままテンプレートと照合する
+                    coarse_plan = self._build_template_plan(template, -(-(y2 - y1) // stride), -(-(x2 - x1) // stride))
+                    coarse_entries.append((screen_type, (x1, y1, x2, y2), coarse_plan))
+            groups.append((crop, plans))
+        return _ResolutionPlan(groups, coarse_entries)
+
+    def _build_template_plan(self, template: np.ndarray, height: int, width: int) -> _TemplatePlan | None:
+        """
+        height×width のROIをテンプレートと照合するための照合パラメータを作成する。
+        縦横で拡大・縮小の向きが異なる場合、OpenCVのリサイズは軸ごとに分解できないためNoneを返し、従来の方法で照合する。
+        """
+        th, tw = template.shape[:2]
+        if (th > height) != (tw > width) and th != height and tw != width:
+            return None
+        return _TemplatePlan(template, height, width)
+
+    def _get_plan(self, img: np.ndarray) -> _ResolutionPlan:
+        """
+        入力画像の解像度に対応する判定手順を返す。初めての解像度の場合は組み立ててキャッシュする。
+        """
+        key = img.shape[:2]
+        plan = self._plans.get(key)
+        if plan is None:
+            plan = self._build_plan(img)
+            self._plans[key] = plan
+        return plan
+
+    def signature(self, img: np.ndarray) -> np.ndarray:
+        """
+        画面判定に使う切り出し領域ごとに、SIGNATURE_SIZE へ縮小したグレースケール画像を返す。
+        連続するフレームが同じ画面かどうかを安価に比較するために使う。
+        戻り値の形状: (切り出し領域数, 高さ, 幅)
+        """
+        plan = self._get_plan(img)
+        thumbnails = [
+            cv2.cvtColor(cv2.resize(img[cy1:cy2, cx1:cx2], SIGNATURE_SIZE, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+            for (cx1, cy1, cx2, cy2), _ in plan.groups
+        ]
+        return np.stack(thumbnails).astype(np.float32)
+
+    def _iter_scores(self, img: np.ndarray, plan: _ResolutionPlan) -> Iterator[tuple[str, float]]:
+        """
+        判定順（matching, result_win, result_lose）に (画面種別, 類似度) を返すジェネレータ。
+        """
+        for (cx1, cy1, cx2, cy2), entries in plan.groups:
+            gray = cv2.cvtColor(img[cy1:cy2, cx1:cx2], cv2.COLOR_BGR2GRAY)
+            region_f32 = None
+            for screen_type, (x1, y1, x2, y2), template_plan, template in entries:
+                if template_plan is None:
+                    yield screen_type, self._match_score(gray, template, (x1, y1, x2, y2))
+                    continue
+                if region_f32 is None:
+                    region_f32 = gray.astype(np.float32)
+                yield screen_type, template_plan.score(region_f32[y1:y2, x1:x2])
+
+    def scores(self, img: np.ndarray) -> dict[str, float]:
+        """
+        各画面種別のテンプレートとの類似度を辞書で返す。
+        """
+        return dict(self._iter_scores(img, self._get_plan(img)))
+
+    def prefilter_scores(self, img: np.ndarray) -> dict[str, float]:
+        """
+        前段フィルタで用いる、ROIを間引いた粗い類似度を辞書で返す。
+        粗い照合ができない画面種別は棄却しないよう無限大とする。
+        """
+        plan = self._get_plan(img)
+        stride = self.prefilter_stride
+        result = {}
+        for screen_type, (x1, y1, x2, y2), template_plan in plan.coarse_entries:
+            if template_plan is None:
+                result[screen_type] = math.inf
+                continue
+            region = np.ascontiguousarray(img[y1:y2:stride, x1:x2:stride])
+            gray = cv2.cvtColor(region, cv2.COLOR_BGR2GRAY)
+            result[screen_type] = template_plan.score(gray.astype(np.float32))
+        return result
+
+    def _passes_prefilter(self, img: np.ndarray) -> bool:
+        """
+        前段フィルタを通過したか（テンプレートマッチングを行うか）を返し、段ごとの処理フレーム数を数える。
+        前段フィルタが有効な場合、粗い類似度がいずれも threshold - margin 未満のフレームは棄却する。
+        """
+        if self.prefilter_enabled:
+            self.stage_counts["prefilter"] += 1
+            cutoff = self.threshold - self.prefilter_margin
+            if all(score < cutoff for score in self.prefilter_scores(img).values()):
+                return False
+        self.stage_counts["template"] += 1
+        return True
+
+    @timed("classify")
     def classify(self, img: np.ndarray) -> str:
         """
         画面種別（matching, result_win, result_lose, unknown）を判定して返す。
+        前段フィルタで棄却したフレームは、テンプレートマッチングを行わずに other とする。
         """
-        vs_roi = self.roi_config.get("vs")
-        win_roi = self.roi_config.get("win")
-        lose_roi = self.roi_config.get("lose")
-
-        if self.vs_template is not None and vs_roi and self.match_template(img, self.vs_template, roi_ratio_to_absolute(img, vs_roi)):
-            return "matching"
-        if self.win_template is not None and win_roi and self.match_template(img, self.win_template, roi_ratio_to_absolute(img, win_roi)):
-            return "result_win"
-        if self.lose_template is not None and lose_roi and self.match_template(img, self.lose_template, roi_ratio_to_absolute(img, lose_roi)):
-            return "result_lose"
+        plan = self._get_plan(img)
+        if not self._passes_prefilter(img):
+            return "other"
+        for screen_type, score in self._iter_scores(img, plan):
+            if score >= self.threshold:
+                return screen_type
         return "other"
+
+    @timed("classify")
+    def classify_with_scores(self, img: np.ndarray) -> tuple[str, tuple[float, ...]]:
+        """
+        画面種別と、SCORE_TYPES の順の各テンプレートとの類似度を返す。
+        画面種別は classify と同じだが、閾値以上の類似度が見つかっても残りの類似度まで求める。
+        前段フィルタで棄却したフレームや、テンプレート・ROIが設定されていない画面種別の類似度は NaN とする。
+        """
+        plan = self._get_plan(img)
+        if not self._passes_prefilter(img):
+            return "other", (math.nan,) * len(SCORE_TYPES)
+        scores = dict(self._iter_scores(img, plan))
+        screen_type = next((key for key, score in scores.items() if score >= self.threshold), "other")
+        return screen_type, tuple(scores.get(key, math.nan) for key in SCORE_TYPES)
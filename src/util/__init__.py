@@ -1,4 +1,4 @@
 from .io import ensure_dir, load_csv_candidates, save_csv
 from .cache import CacheManager
 from .image import get_player_unit_roi_from_ratio, get_roi, resize_to_template, roi_ratio_to_absolute
-from .timestamp import calculate_timestamp
+from .timestamp import calculate_timestamp, format_timestamp, parse_frame_index
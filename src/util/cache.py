@@ -1,17 +1,179 @@
+import hashlib
+import json
 import os
+import shutil
+import time
+import cv2
+from src.core.config import Config
+from src.util.frame_index import FrameIndex
 from src.util.io import save_pickle, load_pickle, ensure_dir
 
+# 動画の指紋に使う、ファイル内から読み込むブロックの数と大きさ
+FINGERPRINT_SAMPLES = 16
+FINGERPRINT_BLOCK_SIZE = 64 * 1024
+
+# キャッシュディレクトリのうち、LRUで削除してよい項目の名前の接頭辞（画面判定結果とフレーム抽出結果）。
+# OCRのメモ・ロックファイル・走査のチェックポイント・書き込み途中の一時ファイルは削除しない
+PRUNABLE_PREFIXES = ("screen_index_", "frame_cache_")
+# 書き込み途中の一時ファイル・ディレクトリの接尾辞
+TEMP_SUFFIXES = (".tmp", ".lock")
+
+
+def video_fingerprint(video_path: str) -> str:
+    """
+    動画ファイルの指紋（ファイルサイズ・再生時間・ファイル内の数か所のバイト列のハッシュ）を返す。
+    ファイル全体を読まずに、同名の別動画や再ダウンロードによる差し替えを区別する。
+    """
+    size = os.path.getsize(video_path)
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+    cap.release()
+    duration = frame_count / fps if fps else 0.0
+
+    digest = hashlib.sha256(f"{size}:{duration:.3f}".encode())
+    with open(video_path, "rb") as f:
+        for i in range(FINGERPRINT_SAMPLES):
+            f.seek(max(0, size - FINGERPRINT_BLOCK_SIZE) * i // max(1, FINGERPRINT_SAMPLES - 1))
+            digest.update(f.read(FINGERPRINT_BLOCK_SIZE))
+    return digest.hexdigest()
+
+
+def config_fingerprint(config: Config) -> str:
+    """
+    画面判定の結果に影響する設定（走査方式・フレーム取得方式・テンプレート・閾値・ROI）とテンプレート画像の内容のハッシュを返す。
+    並列数など結果に影響しない設定は含めない。
+    デコーダーは色変換などで画素が一致するとは限らないため、バックエンドと ffmpeg バックエンドの縮小率を含める。
+    フレーム取得方式（video.sampling）も、シーク先のフレームが順に読んだ場合と一致するとは限らないため含める。
+    密な走査で前段フィルタを使わない場合、閾値を変えても記録した類似度から判定し直せるため閾値は含めない。
+    """
+    video_conf = config.get("video", default={}) or {}
+    template_conf = dict(config.get("template", default={}) or {})
+    prefilter_enabled = (template_conf.get("prefilter", {}) or {}).get("enabled", False)
+    if video_conf.get("scan", "dense") == "dense" and not prefilter_enabled:
+        template_conf.pop("threshold", None)
+    roi_conf = config.get("roi", default={}) or {}
+    decoder_conf = video_conf.get("decoder", {}) or {}
+    decoder_backend = decoder_conf.get("backend", "opencv")
+    decoder_scale = 1.0
+    if decoder_backend == "ffmpeg":
+        decoder_scale = (decoder_conf.get("ffmpeg", {}) or {}).get("scale", 1.0)
+    relevant = {
+        "video": {key: video_conf.get(key) for key in ("frame_interval", "sampling", "keyframe_tolerance", "scan", "adaptive", "dedup")},
+        "decoder_backend": decoder_backend,
+        "decoder_scale": decoder_scale,
+        "template": template_conf,
+        "roi": {key: roi_conf.get(key) for key in ("vs", "win", "lose")},
+        "save_frames": config.get("output", "save_frames", default=False),
+    }
+    digest = hashlib.sha256(json.dumps(relevant, sort_keys=True, ensure_ascii=False).encode())
+    for key in ("vs", "win", "lose"):
+        template_path = template_conf.get(key)
+        if template_path and os.path.exists(template_path):
+            with open(template_path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+def build_cache_key(video_path: str, config: Config) -> str:
+    """
+    動画の指紋と設定の指紋から、キャッシュのキー（16桁の16進数）を作る。
+    """
+    return hashlib.sha256((video_fingerprint(video_path) + config_fingerprint(config)).encode()).hexdigest()[:16]
+
+
+def _entry_size(path: str) -> int:
+    """
+    ファイルまたはディレクトリのサイズ（バイト）を返す。
+    """
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, file)) for root, _, files in os.walk(path) for file in files)
+    return os.path.getsize(path)
+
+
+def _is_prunable(path: str, name: str, frames_root: bool) -> bool:
+    """
+    キャッシュディレクトリ直下の項目が、LRUで削除してよいキャッシュかどうかを判定する。
+    frames_root が True の場合は動画ごとのフレームディレクトリ、False の場合は画面判定結果・フレーム抽出結果のキャッシュのみ対象とする。
+    """
+    if name.endswith(TEMP_SUFFIXES):
+        return False
+    if frames_root:
+        return os.path.isdir(path)
+    return name.startswith(PRUNABLE_PREFIXES)
+
+
+def list_cache_entries(cache_dir: str, frames_root: str) -> list[dict]:
+    """
+    キャッシュディレクトリ直下のキャッシュ（画面判定結果・フレーム抽出結果）と、フレーム画像の保存先の動画ごとのディレクトリを、
+    最終利用日時の古い順に返す。最終利用日時は更新日時で表す。
+    OCRのメモ・ロックファイル・走査のチェックポイント・一時ファイルは含めない。
+    """
+    entries = []
+    for dir_path, is_frames_root in ((cache_dir, False), (frames_root, True)):
+        if not os.path.isdir(dir_path):
+            continue
+        for name in os.listdir(dir_path):
+            path = os.path.join(dir_path, name)
+            if not _is_prunable(path, name, is_frames_root):
+                continue
+            entries.append({"path": path, "size": _entry_size(path), "last_used": os.path.getmtime(path)})
+    return sorted(entries, key=lambda entry: entry["last_used"])
+
+
+def prune_cache(cache_dir: str, frames_root: str, max_bytes: int, keep: list[str] | None = None) -> list[dict]:
+    """
+    キャッシュの合計サイズが max_bytes 以下になるまで、最終利用日時の古い項目から削除する（LRU）。
+    keep に含まれるパスは削除しない。削除した項目のリストを返す。
+    max_bytes が0以下の場合は上限なしとして何も削除しない。
+    """
+    if max_bytes <= 0:
+        return []
+    keep_paths = {os.path.abspath(path) for path in keep or []}
+    entries = list_cache_entries(cache_dir, frames_root)
+    total = sum(entry["size"] for entry in entries)
+    removed = []
+    for entry in entries:
+        if total <= max_bytes:
+            break
+        if os.path.abspath(entry["path"]) in keep_paths:
+            continue
+        if os.path.isdir(entry["path"]):
+            shutil.rmtree(entry["path"])
+        else:
+            os.remove(entry["path"])
+        total -= entry["size"]
+        removed.append(entry)
+    return removed
+
+
+def touch(path: str) -> None:
+    """
+    LRUの最終利用日時として、ファイルまたはディレクトリの更新日時を現在時刻にする。
+    """
+    if os.path.exists(path):
+        now = time.time()
+        os.utime(path, (now, now))
+
 
 class CacheManager:
     """
     フレーム抽出・画面検出結果のキャッシュ管理を行うクラス。
+    cache_key を指定した場合、キャッシュファイル名にキーを含め、動画や設定が変わったときに別のキャッシュとして扱う。
+    scan_range（shard_name() の走査範囲）を指定した場合、走査のチェックポイントを範囲ごとに分ける。
     """
 
-    def __init__(self, cache_dir: str, video_basename: str) -> None:
+    def __init__(
+        self, cache_dir: str, video_basename: str, cache_key: str | None = None, scan_range: str | None = None,
+    ) -> None:
         self.cache_dir = cache_dir
         self.video_basename = video_basename
-        self.frames_cache_file = os.path.join(cache_dir, f"frame_cache_{video_basename}.pkl")
-        self.screens_cache_file = os.path.join(cache_dir, f"screen_cache_{video_basename}.pkl")
+        self.cache_key = cache_key
+        suffix = f"{video_basename}_{cache_key}" if cache_key else video_basename
+        self.frames_cache_file = os.path.join(cache_dir, f"frame_cache_{suffix}.pkl")
+        self.screen_index_dir = os.path.join(cache_dir, f"screen_index_{suffix}")
+        range_suffix = f"_{scan_range}" if scan_range else ""
+        self.checkpoint_file = os.path.join(cache_dir, f"scan_checkpoint_{suffix}{range_suffix}.pkl")
         ensure_dir(cache_dir)
 
     def has_frames_cache(self) -> bool:
@@ -20,17 +182,18 @@ class CacheManager:
         """
         return os.path.exists(self.frames_cache_file)
 
-    def has_screens_cache(self) -> bool:
+    def has_screen_index(self) -> bool:
         """
-        画面判定のキャッシュファイルが存在するかどうかを判定する。
+        画面判定結果のキャッシュが存在するかどうかを判定する。
         """
-        return os.path.exists(self.screens_cache_file)
+        return FrameIndex.exists(self.screen_index_dir)
 
     def load_frames_cache(self) -> list:
         """
         フレーム抽出結果をキャッシュから読み込む。
         """
         print(f"フレーム抽出キャッシュを {self.frames_cache_file} から読み込みました。")
+        touch(self.frames_cache_file)
         return load_pickle(self.frames_cache_file)
 
     def save_frames_cache(self, frame_paths: list) -> None:
@@ -40,17 +203,24 @@ class CacheManager:
         save_pickle(frame_paths, self.frames_cache_file)
         print(f"フレーム抽出結果を {self.frames_cache_file} に保存しました。")
 
-    def load_screens_cache(self) -> tuple:
+    def load_screen_index(self) -> FrameIndex:
         """
-        画面判定結果をキャッシュから読み込む。
+        画面判定結果をキャッシュから読み込む（各列はメモリマップする）。
         """
-        print(f"画面判定キャッシュを {self.screens_cache_file} から読み込みました。")
-        return load_pickle(self.screens_cache_file)
+        print(f"画面判定キャッシュを {self.screen_index_dir} から読み込みました。")
+        touch(self.screen_index_dir)
+        return FrameIndex.load(self.screen_index_dir)
 
-    def save_screens_cache(self, screens: list, match_count: int) -> None:
+    def save_screen_index(self, index: FrameIndex) -> None:
         """
         画面判定結果をキャッシュに保存する。
         """
-        result = (screens, match_count)
-        save_pickle(result, self.screens_cache_file)
-        print(f"画面判定結果を {self.screens_cache_file} に保存しました。")
+        index.save(self.screen_index_dir)
+        print(f"画面判定結果を {self.screen_index_dir} に保存しました。")
+
+    def clear_checkpoint(self) -> None:
+        """
+        走査のチェックポイントを削除する。画面判定結果をキャッシュに保存した後に呼ぶ。
+        """
+        if os.path.exists(self.checkpoint_file):
+            os.remove(self.checkpoint_file)
@@ -0,0 +1,198 @@
+import json
+import os
+import shutil
+import numpy as np
+from typing import Iterator
+from src.util.io import ensure_dir
+from src.util.timestamp import parse_frame_index
+
+# 画面種別とコード（配列の位置がコード）。other 以外は ScreenClassifier の判定順（SCORE_TYPES）と同じ並び
+SCREEN_TYPES = ("other", "matching", "result_win", "result_lose")
+MATCHING_CODE = SCREEN_TYPES.index("matching")
+RESULT_CODES = (SCREEN_TYPES.index("result_win"), SCREEN_TYPES.index("result_lose"))
+_SCREEN_CODES = {screen_type: code for code, screen_type in enumerate(SCREEN_TYPES)}
+
+# 列名と型。列ごとに .npy ファイルとして保存する
+COLUMNS = {
+    "frame": np.int64,      # 抽出番号
+    "pts": np.float64,      # 再生位置（秒）
+    "code": np.int8,        # 画面種別のコード
+    "duplicate": np.bool_,  # 直前と同じ画面として判定を省略した重複フレームか
+    "scores": np.float64,   # matching/result_win/result_lose のテンプレートとの類似度（フレーム数×3、不明な値は NaN）
+}
+FORMAT_VERSION = 3
+
+
+class FrameIndex:
+    """
+    走査したフレームごとの抽出番号・再生位置・画面種別を、列ごとの numpy 配列で持つ画面判定結果。
+    列ごとの .npy ファイルを1つのディレクトリに保存し、読み込み時はメモリマップするため、
+    動画が長くても読み込みはほぼ一瞬で終わる。試合（matching → result の遷移）の検出も配列演算で行う。
+    """
+
+    def __init__(
+        self,
+        columns: dict[str, np.ndarray],
+        frames_dir: str | None = None,
+        threshold: float | None = None,
+        scan: str = "dense",
+        prefilter: bool = False,
+    ) -> None:
+        self.columns = columns
+        # matching/result フレームの画像の保存先（保存していない場合はNone）
+        self.frames_dir = frames_dir
+        # 画面種別の判定に使った類似度の閾値
+        self.threshold = threshold
+        # 走査方式（dense / adaptive）と前段フィルタを使ったか。調べたフレームや棄却したフレームが閾値で決まるかの判断に使う
+        self.scan = scan
+        self.prefilter = prefilter
+
+    @classmethod
+    def from_scan(
+        cls,
+        log_rows: list[dict],
+        frames_dir: str | None = None,
+        threshold: float | None = None,
+        scan: str = "dense",
+        prefilter: bool = False,
+    ) -> "FrameIndex":
+        """
+        走査結果（extract_and_classify_frames などの log_rows）から作る。
+        """
+        count = len(log_rows)
+        no_scores = (np.nan,) * (len(SCREEN_TYPES) - 1)
+        scores = np.array([row["scores"] or no_scores for row in log_rows], dtype=np.float64).reshape(count, len(no_scores))
+        return cls({
+            "frame": np.fromiter((parse_frame_index(row["frame"]) for row in log_rows), dtype=np.int64, count=count),
+            "pts": np.fromiter((row["pts"] for row in log_rows), dtype=np.float64, count=count),
+            "code": np.fromiter((_SCREEN_CODES[row["screen_type"]] for row in log_rows), dtype=np.int8, count=count),
+            "duplicate": np.fromiter((row["duplicate"] for row in log_rows), dtype=np.bool_, count=count),
+            "scores": scores,
+        }, frames_dir, threshold, scan, prefilter)
+
+    @classmethod
+    def concat(cls, indexes: list["FrameIndex"]) -> "FrameIndex":
+        """
+        時間順に並べた複数の画面判定結果（時間範囲ごとに走査した結果など）を連結する。
+        フレーム画像の保存先と閾値は最初の結果のものを使う。いずれかが適応的な走査・前段フィルタの結果なら、連結した結果もそうみなす。
+        """
+        columns = {name: np.concatenate([np.asarray(index.columns[name]) for index in indexes]) for name in COLUMNS}
+        scan = "adaptive" if any(index.scan == "adaptive" for index in indexes) else indexes[0].scan
+        return cls(columns, indexes[0].frames_dir, indexes[0].threshold, scan, any(index.prefilter for index in indexes))
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        """
+        path に現在の形式で保存した画面判定結果があるかどうかを判定する。
+        """
+        meta_path = os.path.join(path, "meta.json")
+        if not os.path.exists(meta_path):
+            return False
+        with open(meta_path, encoding="utf-8") as f:
+            return json.load(f).get("version") == FORMAT_VERSION
+
+    @classmethod
+    def load(cls, path: str) -> "FrameIndex":
+        """
+        save() で保存したディレクトリから、各列をメモリマップして読み込む。
+        """
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        columns = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in COLUMNS}
+        return cls(columns, meta.get("frames_dir"), meta.get("threshold"), meta.get("scan", "dense"), meta.get("prefilter", False))
+
+    def save(self, path: str) -> None:
+        """
+        各列を .npy ファイルとしてディレクトリ path に保存する。
+        書き込み途中で中断しても壊れたディレクトリが残らないよう、一時ディレクトリに書いてから置き換える。
+        """
+        tmp_path = f"{path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        ensure_dir(tmp_path)
+        for name, dtype in COLUMNS.items():
+            np.save(os.path.join(tmp_path, f"{name}.npy"), np.asarray(self.columns[name], dtype=dtype))
+        with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+            meta = {
+                "version": FORMAT_VERSION, "rows": len(self), "frames_dir": self.frames_dir, "threshold": self.threshold,
+                "scan": self.scan, "prefilter": self.prefilter,
+            }
+            json.dump(meta, f, ensure_ascii=False)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+
+    def __len__(self) -> int:
+        return len(self.columns["frame"])
+
+    def screen_rows(self) -> np.ndarray:
+        """
+        screens に相当する行（重複フレームを含む matching/result フレーム）の番号を返す。
+        """
+        return np.flatnonzero(np.asarray(self.columns["code"]) != 0)
+
+    def reclassify(self, threshold: float) -> "FrameIndex":
+        """
+        記録した類似度から、閾値 threshold で画面種別を判定し直した結果を返す（ScreenClassifier.classify と同じ規則）。
+        類似度が NaN のフレーム（前段フィルタで棄却したフレームなど）は other とする。
+        """
+        scores = np.asarray(self.columns["scores"])
+        passed = scores >= threshold
+        # 閾値以上の類似度のうち、判定順で最初の画面種別（なければ other）
+        code = np.where(passed.any(axis=1), passed.argmax(axis=1) + 1, 0).astype(np.int8)
+        return FrameIndex({**self.columns, "code": code}, self.frames_dir, threshold, self.scan, self.prefilter)
+
+    def unscored_count(self) -> int:
+        """
+        類似度を記録していないフレーム（前段フィルタで棄却したフレームなど）の数を返す。
+        """
+        return int(np.isnan(np.asarray(self.columns["scores"])).all(axis=1).sum())
+
+    def screen(self, row: int) -> dict:
+        """
+        行 row の画面判定結果を screens の要素と同じ形式の辞書で返す。
+        重複フレームは画像を保存しないため、path の代わりに duplicate=True を付ける。
+        """
+        idx = int(self.columns["frame"][row])
+        screen = {"type": SCREEN_TYPES[self.columns["code"][row]], "frame": idx, "pts": float(self.columns["pts"][row])}
+        if self.columns["duplicate"][row]:
+            screen["duplicate"] = True
+        elif self.frames_dir is not None:
+            screen["path"] = os.path.join(self.frames_dir, f"frame_{idx:05d}.png")
+        return screen
+
+    def _match_bounds(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        screens に相当する行の番号と、その中での各試合の最初の matching の位置・result の位置を返す。
+        """
+        rows = self.screen_rows()
+        codes = np.asarray(self.columns["code"])[rows]
+        is_matching = codes == MATCHING_CODE
+        is_result = np.isin(codes, RESULT_CODES)
+        # matching の直後が result の位置で試合が確定する
+        ends = np.flatnonzero(is_matching[:-1] & is_result[1:]) + 1
+        prev_matching = np.zeros_like(is_matching)
+        prev_matching[1:] = is_matching[:-1]
+        starts = np.flatnonzero(is_matching & ~prev_matching)
+        firsts = starts[np.searchsorted(starts, ends, side="right") - 1] if len(ends) else ends
+        return rows, firsts, ends
+
+    @property
+    def match_count(self) -> int:
+        """
+        matching → result の遷移回数（試合数）。count_matches(screens) と同じ値。
+        """
+        return len(self._match_bounds()[2])
+
+    def first_matching_frames(self) -> np.ndarray:
+        """
+        試合ごとの最初の matching フレームの抽出番号を返す。
+        """
+        rows, firsts, _ = self._match_bounds()
+        return np.asarray(self.columns["frame"])[rows[firsts]]
+
+    def iter_matches(self) -> Iterator[tuple[list[dict], dict]]:
+        """
+        試合ごとに (matching フレームの画面判定結果のリスト, result フレームの画面判定結果) を返すジェネレータ。
+        """
+        rows, firsts, ends = self._match_bounds()
+        for first, end in zip(firsts.tolist(), ends.tolist()):
+            yield [self.screen(row) for row in rows[first:end].tolist()], self.screen(int(rows[end]))
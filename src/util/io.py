@@ -1,16 +1,24 @@
 import os
 import csv
+import json
 import pickle
-from typing import Any
+import tempfile
+from contextlib import contextmanager
+from typing import Any, Iterator
 import pandas as pd
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
 
 def ensure_dir(dir_path: str) -> None:
     """
     ディレクトリが存在しない場合は作成する。
+    複数のプロセスが同時に作成しても失敗しないようにする。
     """
-    if not os.path.exists(dir_path):
-        os.makedirs(dir_path)
+    os.makedirs(dir_path, exist_ok=True)
 
 
 def load_csv_candidates(csv_path: str) -> list[str]:
@@ -41,6 +49,75 @@ def save_csv(data: list, header: list, csv_path: str) -> None:
         writer.writerows(data)
 
 
+def _count_lines(file_path: str) -> int:
+    """
+    ファイルの空でない行の数を返す。ファイルがない場合は0を返す。
+    """
+    if not os.path.exists(file_path):
+        return 0
+    with open(file_path, encoding="utf-8-sig") as f:
+        return sum(1 for line in f if line.strip())
+
+
+class CsvRowWriter:
+    """
+    CSVファイルに1行ずつ追記するクラス。
+    行を書くたびにフラッシュするため、処理の途中でもファイルを読める。
+    既存のファイルには続きから追記し、ヘッダーはファイルが新しいか空の場合だけ書く。
+    existing_rows は開いた時点で書き込み済みだったデータ行の数。
+    """
+
+    def __init__(self, csv_path: str, header: list[str]) -> None:
+        ensure_dir(os.path.dirname(csv_path))
+        self.header = header
+        self.existing_rows = max(0, _count_lines(csv_path) - 1)
+        is_new = _count_lines(csv_path) == 0
+        self._file = open(csv_path, "a", newline="", encoding="utf-8-sig")
+        self._writer = csv.writer(self._file, lineterminator=os.linesep)
+        if is_new:
+            self._writer.writerow(header)
+            self._file.flush()
+
+    def write(self, row: dict) -> None:
+        """
+        1行を追記する。
+        """
+        self._writer.writerow([row[key] for key in self.header])
+        self._file.flush()
+
+    def close(self) -> None:
+        """
+        ファイルを閉じる。
+        """
+        self._file.close()
+
+
+class JsonlRowWriter:
+    """
+    JSON Lines ファイルに1行ずつ追記するクラス。
+    行を書くたびにフラッシュするため、処理の途中でもファイルを読める。
+    既存のファイルには続きから追記する。existing_rows は開いた時点で書き込み済みだった行の数。
+    """
+
+    def __init__(self, jsonl_path: str) -> None:
+        ensure_dir(os.path.dirname(jsonl_path) or ".")
+        self.existing_rows = _count_lines(jsonl_path)
+        self._file = open(jsonl_path, "a", encoding="utf-8")
+
+    def write(self, row: dict) -> None:
+        """
+        1行を追記する。
+        """
+        self._file.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        """
+        ファイルを閉じる。
+        """
+        self._file.close()
+
+
 def save_dataframe_csv(dataframe: pd.DataFrame, csv_path: str) -> None:
     """
     DataFrameをCSVファイルに保存する。
@@ -49,13 +126,40 @@ def save_dataframe_csv(dataframe: pd.DataFrame, csv_path: str) -> None:
     dataframe.to_csv(csv_path, index=False, encoding="utf-8-sig")
 
 
+@contextmanager
+def file_lock(file_path: str) -> Iterator[None]:
+    """
+    file_path に対応するロックファイル（file_path.lock）で、複数のプロセスの処理を1つずつに制限するコンテキストマネージャー。
+    fcntl のない環境（Windows）ではロックしない。
+    """
+    ensure_dir(os.path.dirname(file_path) or ".")
+    with open(f"{file_path}.lock", "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
 def save_pickle(data: Any, file_path: str) -> None:
     """
     データをpickleファイルに保存する。
+    書き込み途中で中断しても壊れたファイルが残らないよう、一時ファイルに書いてから置き換える。
+    複数のプロセスが同じファイルに同時に保存しても衝突しないよう、一時ファイルは保存ごとに別の名前にする。
     """
-    ensure_dir(os.path.dirname(file_path))
-    with open(file_path, "wb") as f:
-        pickle.dump(data, f)
+    dir_path = os.path.dirname(file_path) or "."
+    ensure_dir(dir_path)
+    fd, tmp_path = tempfile.mkstemp(prefix=f"{os.path.basename(file_path)}.", suffix=".tmp", dir=dir_path)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(data, f)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
 
 
 def load_pickle(file_path: str) -> Any:
@@ -66,11 +170,11 @@ def load_pickle(file_path: str) -> Any:
         return pickle.load(f)
 
 
-def save_screen_log(log_rows: list[dict], results_dir: str) -> None:
+def save_screen_log(log_rows: list[dict], results_dir: str, file_name: str = "screen_log.csv") -> None:
     """
-    画面判定結果をCSVファイルに保存する。
+    画面判定結果（フレーム名と画面種別）をCSVファイルに保存する。
     """
     ensure_dir(results_dir)
-    log_path = os.path.join(results_dir, "screen_log.csv")
-    pd.DataFrame(log_rows).to_csv(log_path, index=False, encoding="utf-8-sig")
+    log_path = os.path.join(results_dir, file_name)
+    pd.DataFrame(log_rows, columns=["frame", "screen_type"]).to_csv(log_path, index=False, encoding="utf-8-sig")
     print(f"画面判定結果を {log_path} に保存しました。")
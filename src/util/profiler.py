@@ -0,0 +1,188 @@
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import nullcontext
+from typing import Any, Callable, Iterator
+import numpy as np
+from src.util.io import ensure_dir
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# 計測が無効なときに stage() が返す、何もしないコンテキストマネージャー
+_NULL_STAGE = nullcontext()
+
+
+class _Stage:
+    """
+    with ブロックの所要時間を Profiler に記録するコンテキストマネージャー。
+    """
+
+    __slots__ = ("_profiler", "_name", "_start")
+
+    def __init__(self, profiler: "Profiler", name: str) -> None:
+        self._profiler = profiler
+        self._name = name
+
+    def __enter__(self) -> None:
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc: Any) -> None:
+        self._profiler.add_time(self._name, time.perf_counter() - self._start)
+
+
+def _peak_rss_mb(who: int) -> float | None:
+    """
+    最大常駐メモリ（MB）を返す。取得できない環境ではNoneを返す。
+    """
+    if resource is None:
+        return None
+    # ru_maxrss は macOS ではバイト単位、Linux などでは KB 単位
+    divisor = 1024 ** 2 if sys.platform == "darwin" else 1024
+    return resource.getrusage(who).ru_maxrss / divisor
+
+
+class Profiler:
+    """
+    処理段ごとの所要時間とカウンタを記録するクラス。
+    enable() するまでは何も記録せず、stage() などの呼び出しはほぼ何もしない。
+    ワーカープロセスでは take() で記録を取り出し、親プロセスで merge() してまとめる。
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self._timings: dict[str, list[float]] = {}
+        self._counters: dict[str, int] = {}
+        # 判定スレッドやOCRのスレッドから同時に数えても取りこぼさないよう、カウンタの更新はロックで1つずつ行う
+        self._counters_lock = threading.Lock()
+        self._worker_peak_rss_mb: float | None = None
+        self._start = 0.0
+
+    def enable(self) -> None:
+        """
+        記録を開始する。
+        """
+        self.enabled = True
+        self._start = time.perf_counter()
+
+    def stage(self, name: str) -> Any:
+        """
+        with ブロックの所要時間を処理段 name の1回分として記録するコンテキストマネージャーを返す。
+        """
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def add_time(self, name: str, elapsed: float) -> None:
+        """
+        処理段 name の1回分の所要時間（秒）を記録する。
+        """
+        self._timings.setdefault(name, []).append(elapsed)
+
+    def count(self, name: str, n: int = 1) -> None:
+        """
+        カウンタ name に n を加える。
+        """
+        if self.enabled:
+            with self._counters_lock:
+                self._counters[name] = self._counters.get(name, 0) + n
+
+    def timed_iter(self, name: str, iterator: Iterator) -> Iterator:
+        """
+        iterator から要素を1つ取り出すたびに、その所要時間を処理段 name として記録するイテレータを返す。
+        """
+        if not self.enabled:
+            return iterator
+        return self._iter_timed(name, iterator)
+
+    def _iter_timed(self, name: str, iterator: Iterator) -> Iterator:
+        iterator = iter(iterator)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.add_time(name, time.perf_counter() - start)
+            yield item
+
+    def take(self) -> dict | None:
+        """
+        ここまでの記録を取り出して消去する。無効な場合はNoneを返す。
+        """
+        if not self.enabled:
+            return None
+        with self._counters_lock:
+            snapshot = {"timings": self._timings, "counters": self._counters, "peak_rss_mb": _peak_rss_mb(0)}
+            self._timings = {}
+            self._counters = {}
+        return snapshot
+
+    def merge(self, snapshot: dict | None) -> None:
+        """
+        ワーカープロセスで take() した記録を加える。
+        """
+        if not self.enabled or snapshot is None:
+            return
+        for name, timings in snapshot["timings"].items():
+            self._timings.setdefault(name, []).extend(timings)
+        for name, n in snapshot["counters"].items():
+            self.count(name, n)
+        if snapshot["peak_rss_mb"] is not None:
+            self._worker_peak_rss_mb = max(self._worker_peak_rss_mb or 0.0, snapshot["peak_rss_mb"])
+
+    def report(self) -> dict:
+        """
+        処理段ごとの回数・合計時間・p50/p95/最大の所要時間、カウンタ、最大常駐メモリを辞書で返す。
+        """
+        stages = {}
+        for name, timings in sorted(self._timings.items()):
+            values = np.array(timings) * 1000
+            stages[name] = {
+                "count": len(values),
+                "total_sec": round(float(values.sum()) / 1000, 4),
+                "mean_ms": round(float(values.mean()), 4),
+                "p50_ms": round(float(np.percentile(values, 50)), 4),
+                "p95_ms": round(float(np.percentile(values, 95)), 4),
+                "max_ms": round(float(values.max()), 4),
+            }
+        return {
+            "wall_sec": round(time.perf_counter() - self._start, 4),
+            "peak_rss_mb": _peak_rss_mb(0),
+            "peak_rss_children_mb": _peak_rss_mb(-1),
+            "peak_rss_worker_max_mb": self._worker_peak_rss_mb,
+            "stages": stages,
+            "counters": dict(sorted(self._counters.items())),
+        }
+
+    def save(self, path: str) -> None:
+        """
+        report() の内容をJSONファイルに保存する。
+        """
+        ensure_dir(os.path.dirname(path) or ".")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+
+
+# プロセス全体で共有する計測器
+profiler = Profiler()
+
+
+def timed(name: str) -> Callable:
+    """
+    関数の呼び出しごとの所要時間を処理段 name として記録するデコレーター。
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not profiler.enabled:
+                return func(*args, **kwargs)
+            with _Stage(profiler, name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,11 +1,61 @@
-def calculate_timestamp(frame_name: str, frame_interval: float) -> str:
+from typing import Iterable
+
+
+def parse_frame_index(frame_name: str) -> int:
     """
-    フレーム画像ファイル名から連番を取得し、frame_intervalからタイムスタンプをhh:mm:ss形式で返す。
+    frame_00001.png形式のフレーム画像ファイル名から連番を取得する。
+    """
+    return int(frame_name.split("_")[1].split(".")[0])
+
+
+def format_timestamp(total_seconds: float, fractional: bool = False) -> str:
+    """
+    秒数をhh:mm:ss形式で返す（秒未満は切り捨て）。
+    fractional=True の場合は秒を小数第2位まで含めたhh:mm:ss.ss形式で返す。
     """
-    # frame_00001.png形式から番号を抽出
-    frame_num = int(frame_name.split("_")[1].split(".")[0])
-    total_seconds = int(frame_num * frame_interval)
+    if fractional:
+        hours = int(total_seconds // 3600)
+        minutes = int((total_seconds % 3600) // 60)
+        seconds = total_seconds % 60
+        return f"{hours:02d}:{minutes:02d}:{seconds:05.2f}"
+    total_seconds = int(total_seconds)
     hours = total_seconds // 3600
     minutes = (total_seconds % 3600) // 60
     seconds = total_seconds % 60
     return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+def match_timestamps(first_frames: Iterable[int], frame_interval: float, fractional: bool = False) -> list[dict]:
+    """
+    試合ごとの最初の matching フレームの抽出番号から、1始まりの試合番号と開始タイムスタンプの辞書のリストを作る。
+    """
+    return [
+        {"match_number": n, "start_time": format_timestamp(idx * frame_interval, fractional)}
+        for n, idx in enumerate(first_frames, start=1)
+    ]
+
+
+def parse_time(text: str) -> float:
+    """
+    秒数（例: 90, 90.5）または hh:mm:ss / mm:ss 形式（例: 01:30:00, 1:30.5）の時刻を秒数に変換する。
+    形式が正しくない場合はValueErrorを投げる。
+    """
+    parts = text.strip().split(":")
+    try:
+        values = [float(part) for part in parts]
+    except ValueError:
+        values = []
+    if not values or len(values) > 3 or any(value < 0 for value in values):
+        raise ValueError(f"時刻の形式が正しくありません: {text}")
+    seconds = 0.0
+    for value in values:
+        seconds = seconds * 60 + value
+    return seconds
+
+
+def calculate_timestamp(frame_name: str, frame_interval: float, fractional: bool = False) -> str:
+    """
+    フレーム画像ファイル名から連番を取得し、frame_intervalからタイムスタンプをhh:mm:ss形式で返す。
+    fractional=True の場合は秒を小数第2位まで含めたhh:mm:ss.ss形式で返す。
+    """
+    return format_timestamp(parse_frame_index(frame_name) * frame_interval, fractional)
@@ -1,8 +1,19 @@
+import bisect
 import cv2
+import math
 import os
+import queue
+import subprocess
+import threading
+import time
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterator
 from tqdm import tqdm
-from src.util.io import ensure_dir
+from src.core.config import Config
+from src.util.io import ensure_dir, load_pickle, save_pickle
+from src.util.profiler import profiler
+from src.util.timestamp import parse_frame_index
 from src.screen.classifier import ScreenClassifier
 
 
@@ -29,7 +40,9 @@ def save_frame(frame: np.ndarray, output_dir: str, idx: int) -> str:
     フレーム画像を指定ディレクトリに保存し、保存パスを返す。
     """
     frame_path = os.path.join(output_dir, f"frame_{idx:05d}.png")
-    cv2.imwrite(frame_path, frame)
+    with profiler.stage("imwrite"):
+        cv2.imwrite(frame_path, frame)
+    profiler.count("frames_written")
     return frame_path
 
 
@@ -65,57 +78,1065 @@ def extract_frames(video_path: str, frame_interval_sec: float, output_dir: str)
     return saved_paths
 
 
+def read_frame_at(cap: cv2.VideoCapture, pts: float) -> np.ndarray | None:
+    """
+    再生位置 pts（秒）のフレームへシークして読み込む。読み込めない場合はNoneを返す。
+    """
+    with profiler.stage("seek_read"):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, round(pts * get_fps(cap)))
+        ret, frame = cap.read()
+    return frame if ret else None
+
+
+def screen_frame_index(screen: dict) -> int:
+    """
+    画面判定結果の抽出番号を返す。抽出番号を持たない古いキャッシュの場合は画像ファイル名から求める。
+    """
+    if "frame" in screen:
+        return screen["frame"]
+    return parse_frame_index(os.path.basename(screen["path"]))
+
+
+def _iter_frames_grab(cap: cv2.VideoCapture, frame_interval: int, start_idx: int = 0, end_idx: int | None = None) -> Iterator[tuple[int, np.ndarray]]:
+    """
+    全フレームを順にgrabし、frame_intervalごとにretrieveしたフレームを返すジェネレータ。
+    start_idx が指定された場合は、その抽出位置へシークしてから読み始める。
+    """
+    frame_count = start_idx * frame_interval
+    idx = start_idx
+    if frame_count > 0:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_count)
+    while end_idx is None or idx < end_idx:
+        if not cap.grab():
+            break
+        if frame_count % frame_interval == 0:
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+            yield idx, frame
+            idx += 1
+        frame_count += 1
+
+
+def _iter_frames_seek(cap: cv2.VideoCapture, frame_interval: int, total_frames: int, start_idx: int = 0, end_idx: int | None = None) -> Iterator[tuple[int, np.ndarray]]:
+    """
+    抽出対象のフレーム位置へ直接シークし、必要なフレームだけをデコードして返すジェネレータ。
+    抽出位置はgrab方式と同じ（idx * frame_interval 番目のフレーム）。
+    """
+    idx = start_idx
+    while idx * frame_interval < total_frames and (end_idx is None or idx < end_idx):
+        target = idx * frame_interval
+        # 直前の読み込みで既に目的位置にいる場合はシークしない
+        if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != target:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+        ret, frame = cap.read()
+        if not ret:
+            break
+        yield idx, frame
+        idx += 1
+
+
+def list_keyframes(video_path: str) -> list[int]:
+    """
+    動画のキーフレームのフレーム番号を昇順で返す。
+    パケットをデコードせずに読み進める（CAP_PROP_FORMAT=-1）ため、全フレームを grab するより大幅に速い。
+    """
+    cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG)
+    if not cap.isOpened():
+        raise FileNotFoundError(f"動画ファイルが開けません: {video_path}")
+    cap.set(cv2.CAP_PROP_FORMAT, -1)
+    keyframes = []
+    frame_count = 0
+    while cap.grab():
+        if cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+            keyframes.append(frame_count)
+        frame_count += 1
+    cap.release()
+    return keyframes
+
+
+def _iter_frames_seek_keyframe(
+    cap: cv2.VideoCapture,
+    frame_interval: int,
+    total_frames: int,
+    keyframes: list[int],
+    tolerance: int,
+    start_idx: int = 0,
+    end_idx: int | None = None,
+) -> Iterator[tuple[int, np.ndarray]]:
+    """
+    抽出位置から tolerance フレーム以内にキーフレームがあればそのキーフレームへ、なければ抽出位置へシークしてフレームを返すジェネレータ。
+    キーフレームへのシークは直前のキーフレームからのデコードが不要なため、seek 方式より速い。
+    抽出番号（再生位置・タイムスタンプ）は seek 方式と同じで、フレームの内容だけが最大 tolerance フレームずれる。
+    """
+    idx = start_idx
+    while idx * frame_interval < total_frames and (end_idx is None or idx < end_idx):
+        target = idx * frame_interval
+        # 抽出位置に最も近いキーフレーム
+        i = bisect.bisect_left(keyframes, target)
+        nearest = min(keyframes[max(0, i - 1):i + 1], key=lambda keyframe: abs(keyframe - target), default=target)
+        position = nearest if abs(nearest - target) <= tolerance else target
+        if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) != position:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, position)
+        ret, frame = cap.read()
+        if not ret:
+            break
+        yield idx, frame
+        idx += 1
+
+
+def iter_sampled_frames(
+    cap: cv2.VideoCapture,
+    frame_interval: int,
+    sampling: str = "grab",
+    start_idx: int = 0,
+    end_idx: int | None = None,
+    keyframes: list[int] | None = None,
+    keyframe_tolerance: int = 0,
+) -> Iterator[tuple[int, np.ndarray]]:
+    """
+    動画からframe_intervalフレームごとに (抽出番号, フレーム画像) を返すジェネレータ。
+    sampling="grab" は全フレームを順に読み飛ばし、sampling="seek" は抽出位置へ直接シークする。
+    sampling="seek_keyframe" は抽出位置から keyframe_tolerance フレーム以内のキーフレーム（keyframes）があればそこへシークする。
+    start_idx / end_idx で抽出番号の範囲 [start_idx, end_idx) を指定できる。
+    """
+    if sampling == "grab":
+        return _iter_frames_grab(cap, frame_interval, start_idx, end_idx)
+    if sampling == "seek":
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        return _iter_frames_seek(cap, frame_interval, total_frames, start_idx, end_idx)
+    if sampling == "seek_keyframe":
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        return _iter_frames_seek_keyframe(cap, frame_interval, total_frames, keyframes or [], keyframe_tolerance, start_idx, end_idx)
+    raise ValueError(f"未対応のサンプリング方式です: {sampling}")
+
+
+class FrameDecoder:
+    """
+    動画から抽出間隔ごとのフレームを取り出すデコーダーの共通インターフェース。
+    fps と frame_count（総フレーム数）を持ち、iter_frames で (抽出番号, フレーム画像) を返す。
+    """
+
+    fps: float
+    frame_count: int
+
+    def iter_frames(self, frame_interval: int, start_idx: int = 0, end_idx: int | None = None) -> Iterator[tuple[int, np.ndarray]]:
+        """
+        frame_interval フレームごとに、抽出番号の範囲 [start_idx, end_idx) のフレームを返すジェネレータ。
+        """
+        raise NotImplementedError
+
+    def release(self) -> None:
+        """
+        デコーダーが保持する資源を解放する。
+        """
+
+
+class OpenCVDecoder(FrameDecoder):
+    """
+    cv2.VideoCapture でフレームを取り出すデコーダー。全フレームを元の解像度・BGRでデコードする。
+    sampling="seek_keyframe" の場合は開くときにキーフレームの位置を調べ、keyframe_tolerance 秒以内のキーフレームへシークする。
+    """
+
+    def __init__(self, video_path: str, sampling: str = "grab", keyframe_tolerance: float = 0.5) -> None:
+        self.cap = open_video(video_path)
+        self.sampling = sampling
+        self.fps = get_fps(self.cap)
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.keyframes = list_keyframes(video_path) if sampling == "seek_keyframe" else None
+        self.keyframe_tolerance = int(keyframe_tolerance * self.fps)
+
+    def iter_frames(self, frame_interval: int, start_idx: int = 0, end_idx: int | None = None) -> Iterator[tuple[int, np.ndarray]]:
+        return iter_sampled_frames(
+            self.cap, frame_interval, self.sampling, start_idx, end_idx, self.keyframes, self.keyframe_tolerance,
+        )
+
+    def release(self) -> None:
+        self.cap.release()
+
+
+class FFmpegDecoder(FrameDecoder):
+    """
+    ffmpeg のサブプロセスでデコードし、生フレーム（bgr24）をパイプで受け取るデコーダー。
+    抽出するフレームの選別・ROIの和集合の切り出し・縮小を ffmpeg のフィルタで行うため、
+    Python側に渡るのは画面判定に必要な画素だけになる。
+    返すフレーム画像は元の動画と同じ縦横比の画像で、切り出した領域の外側は黒で埋める（ROIの割合指定がそのまま使える）。
+    """
+
+    # 切り出し境界での色差補間の影響を避けるため、ROIの和集合の周囲に加える余白（ピクセル）
+    CROP_MARGIN = 8
+
+    def __init__(
+        self,
+        video_path: str,
+        ffmpeg_path: str = "ffmpeg",
+        crop_rois: list | None = None,
+        scale: float = 1.0,
+    ) -> None:
+        # 動画の情報は OpenCV で取得する（ffprobe がない環境でも動くように）
+        cap = open_video(video_path)
+        self.fps = get_fps(cap)
+        self.frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        cap.release()
+        self.video_path = video_path
+        self.ffmpeg_path = ffmpeg_path
+
+        # 切り出し領域（元の解像度）。色差の間引きに合わせて偶数座標にそろえる
+        crop = (0, 0, width, height)
+        if crop_rois:
+            rects = [(int(width * x1), int(height * y1), int(width * x2), int(height * y2)) for x1, y1, x2, y2 in crop_rois]
+            margin = self.CROP_MARGIN
+            crop = (
+                max(0, min(r[0] for r in rects) - margin) // 2 * 2,
+                max(0, min(r[1] for r in rects) - margin) // 2 * 2,
+                min(width, -(-(max(r[2] for r in rects) + margin) // 2) * 2),
+                min(height, -(-(max(r[3] for r in rects) + margin) // 2) * 2),
+            )
+        self.crop = crop
+        # 出力する画像の大きさと、その中で切り出し領域を置く位置
+        self.output_size = (round(width * scale), round(height * scale))
+        self.region = (
+            round(crop[0] * scale),
+            round(crop[1] * scale),
+            round(crop[0] * scale) + round((crop[2] - crop[0]) * scale),
+            round(crop[1] * scale) + round((crop[3] - crop[1]) * scale),
+        )
+        self.full_frame = crop == (0, 0, width, height) and scale == 1.0
+
+    def _build_command(self, frame_interval: int, start_idx: int, end_idx: int | None) -> list[str]:
+        """
+        抽出番号の範囲 [start_idx, end_idx) のフレームを出力する ffmpeg のコマンドを組み立てる。
+        """
+        command = [self.ffmpeg_path, "-v", "error", "-nostdin"]
+        if start_idx > 0:
+            command += ["-ss", f"{start_idx * frame_interval / self.fps:.6f}"]
+        command += ["-i", self.video_path, "-an", "-sn", "-dn"]
+        # grab方式と同じく frame_interval 番目ごとのフレームを選ぶ（fps フィルタは時刻で選ぶため位置がずれうる）
+        filters = [f"select='not(mod(n,{frame_interval}))'"]
+        x1, y1, x2, y2 = self.crop
+        if not self.full_frame:
+            filters.append(f"crop={x2 - x1}:{y2 - y1}:{x1}:{y1}")
+            rx1, ry1, rx2, ry2 = self.region
+            if (rx2 - rx1, ry2 - ry1) != (x2 - x1, y2 - y1):
+                filters.append(f"scale={rx2 - rx1}:{ry2 - ry1}:flags=area")
+        command += ["-vf", ",".join(filters), "-fps_mode", "passthrough"]
+        if end_idx is not None:
+            command += ["-frames:v", str(end_idx - start_idx)]
+        command += ["-f", "rawvideo", "-pix_fmt", "bgr24", "pipe:1"]
+        return command
+
+    def iter_frames(self, frame_interval: int, start_idx: int = 0, end_idx: int | None = None) -> Iterator[tuple[int, np.ndarray]]:
+        rx1, ry1, rx2, ry2 = self.region
+        output_width, output_height = self.output_size
+        # パイプからの読み込みには同じバッファを使い回す
+        buffer = bytearray((rx2 - rx1) * (ry2 - ry1) * 3)
+        view = memoryview(buffer)
+        region = np.frombuffer(buffer, dtype=np.uint8).reshape(ry2 - ry1, rx2 - rx1, 3)
+
+        process = subprocess.Popen(
+            self._build_command(frame_interval, start_idx, end_idx), stdout=subprocess.PIPE, bufsize=0
+        )
+        try:
+            idx = start_idx
+            while True:
+                filled = 0
+                while filled < len(buffer):
+                    n = process.stdout.readinto(view[filled:])
+                    if not n:
+                        break
+                    filled += n
+                if filled < len(buffer):
+                    break
+                # 判定スレッドが複数のフレームを同時に保持できるよう、返す画像はフレームごとに確保する
+                if self.full_frame:
+                    frame = region.copy()
+                else:
+                    frame = np.zeros((output_height, output_width, 3), dtype=np.uint8)
+                    frame[ry1:ry2, rx1:rx2] = region
+                yield idx, frame
+                idx += 1
+        finally:
+            if process.poll() is None:
+                process.kill()
+            process.stdout.close()
+            process.wait()
+
+
+def open_decoder(
+    video_path: str,
+    backend: str = "opencv",
+    sampling: str = "grab",
+    ffmpeg_path: str = "ffmpeg",
+    crop_rois: list | None = None,
+    scale: float = 1.0,
+    keyframe_tolerance: float = 0.5,
+) -> FrameDecoder:
+    """
+    指定したバックエンド（opencv / ffmpeg）のデコーダーを開く。
+    sampling / keyframe_tolerance は opencv、ffmpeg_path / crop_rois / scale は ffmpeg バックエンドでのみ使う。
+    """
+    if backend == "opencv":
+        return OpenCVDecoder(video_path, sampling, keyframe_tolerance)
+    if backend == "ffmpeg":
+        return FFmpegDecoder(video_path, ffmpeg_path, crop_rois, scale)
+    raise ValueError(f"未対応のデコーダーです: {backend}")
+
+
+def count_matches(screens: list[dict]) -> int:
+    """
+    画面判定結果から matching → result の遷移回数（試合数）を数える。
+    """
+    match_count = 0
+    prev_type = None
+    for screen in screens:
+        if prev_type == "matching" and screen["type"] in ("result_win", "result_lose"):
+            match_count += 1
+        prev_type = screen["type"]
+    return match_count
+
+
+def _print_scan_counts(counts: dict[str, int]) -> None:
+    """
+    走査中の段ごとの処理フレーム数（前段フィルタ・重複フレームの省略）を表示する。
+    どちらも無効な場合は何も表示しない。
+    """
+    if counts.get("prefilter"):
+        rejected = counts["prefilter"] - counts["template"]
+        print(
+            f"前段フィルタ: {counts['prefilter']} フレーム中 {rejected} フレームを棄却"
+            f"（テンプレートマッチング: {counts['template']} フレーム）"
+        )
+    if counts.get("dedup_checked"):
+        hit_rate = counts["duplicates"] / counts["dedup_checked"]
+        print(f"重複フレーム: {counts['dedup_checked']} フレーム中 {counts['duplicates']} フレームで判定を省略（ヒット率 {hit_rate:.1%}）")
+
+
+def _signature_distance(a: np.ndarray, b: np.ndarray) -> float:
+    """
+    2つのROI縮小画像の差（切り出し領域ごとの平均絶対差の最大値）を返す。
+    """
+    return float(np.abs(a - b).mean(axis=(1, 2)).max())
+
+
+def _record_frame(
+    idx: int,
+    frame: np.ndarray,
+    screen_type: str,
+    pts: float,
+    output_dir: str | None,
+    screens: list[dict],
+    log_rows: list[dict],
+    duplicate: bool = False,
+    scores: tuple[float, ...] | None = None,
+) -> None:
+    """
+    1フレーム分の画面判定結果を記録する。
+    matching/result フレームは抽出番号と再生位置（秒）を screens に追加し、
+    output_dir が指定されている場合のみ画像をディスクに保存する。
+    duplicate=True の場合（直前と同じ画面の重複フレーム）は screens に重複の印を付けて追加し、画像は保存しない。
+    scores はテンプレートとの類似度（SCORE_TYPES の順）で、判定ログに記録する。
+    """
+    log_rows.append({
+        "frame": f"frame_{idx:05d}.png", "screen_type": screen_type, "pts": pts, "duplicate": duplicate, "scores": scores,
+    })
+    profiler.count("frames_decoded")
+    profiler.count("frames_duplicate" if duplicate else "frames_classified")
+
+    if screen_type not in ("matching", "result_win", "result_lose"):
+        return
+    screen = {"type": screen_type, "frame": idx, "pts": pts}
+    if duplicate:
+        screen["duplicate"] = True
+    elif output_dir is not None:
+        frame_path = os.path.join(output_dir, f"frame_{idx:05d}.png")
+        with profiler.stage("imwrite"):
+            cv2.imwrite(frame_path, frame)
+        profiler.count("frames_written")
+        screen["path"] = frame_path
+    screens.append(screen)
+
+
+def iter_classified_stream(
+    frames: Iterator[tuple[int, np.ndarray, float]],
+    classifier: ScreenClassifier,
+    output_dir: str | None,
+) -> Iterator[tuple[dict, dict | None]]:
+    """
+    (抽出番号, フレーム画像, 再生位置) を順に受け取って画面判定し、
+    フレームごとに (判定ログの行, matching/result フレームの場合は screens の要素、それ以外はNone) を返すジェネレータ。
+    結果を溜め込まないため、終わりのない入力でもメモリ使用量は一定。
+    """
+    for idx, frame, pts in frames:
+        screens: list[dict] = []
+        log_rows: list[dict] = []
+        _record_frame(idx, frame, classifier.classify(frame), pts, output_dir, screens, log_rows)
+        yield log_rows[0], screens[0] if screens else None
+
+
+# 重複判定の比較元（最後に判定したフレーム）を必ず取り直す抽出番号の間隔。並列処理のチャンク境界もこの倍数にそろえる
+DEDUP_ANCHOR_INTERVAL = 256
+
+
+class _ScanRecorder:
+    """
+    抽出番号順に届くフレームの判定結果を記録し、screens / log_rows を組み立てるクラス。
+    dedup_tolerance を指定すると、最後に判定したフレームとROIの縮小画像の差が許容値以内のフレームを
+    重複とみなし、同じ画面種別として記録する（画像の保存は省き、screens には重複の印を付けて追加する）。
+    抽出番号が DEDUP_ANCHOR_INTERVAL の倍数のフレームは必ず判定し直すため、その位置で区切った範囲を
+    別々に走査しても（並列処理のチャンクなど）、続けて走査した場合と同じ結果になる。
+    """
+
+    def __init__(self, output_dir: str | None, sample_duration: float, dedup_tolerance: float | None = None) -> None:
+        self.output_dir = output_dir
+        # 抽出番号1つあたりの再生時間（秒）
+        self.sample_duration = sample_duration
+        self.dedup_tolerance = dedup_tolerance
+        self.screens: list[dict] = []
+        self.log_rows: list[dict] = []
+        self.dedup_checked = 0
+        self.duplicates = 0
+        self._anchor_signature: np.ndarray | None = None
+        self._anchor_type: str | None = None
+        self._anchor_scores: tuple[float, ...] | None = None
+
+    @property
+    def uses_signature(self) -> bool:
+        """
+        重複判定のためにROIの縮小画像が必要かどうか。
+        """
+        return self.dedup_tolerance is not None
+
+    def record_if_duplicate(self, idx: int, frame: np.ndarray, signature: np.ndarray | None) -> bool:
+        """
+        フレームが重複であれば最後に判定した画面種別・類似度で記録してTrueを返す。重複でなければFalseを返す。
+        """
+        if self.dedup_tolerance is None or signature is None or idx % DEDUP_ANCHOR_INTERVAL == 0:
+            return False
+        self.dedup_checked += 1
+        # 徐々に変化する画面で判定がずれていかないよう、直前ではなく最後に判定したフレームと比べる
+        if self._anchor_signature is None or _signature_distance(signature, self._anchor_signature) > self.dedup_tolerance:
+            return False
+        self.duplicates += 1
+        _record_frame(
+            idx, frame, self._anchor_type, idx * self.sample_duration, self.output_dir, self.screens, self.log_rows,
+            duplicate=True, scores=self._anchor_scores,
+        )
+        return True
+
+    def record(
+        self, idx: int, frame: np.ndarray, screen_type: str, scores: tuple[float, ...], signature: np.ndarray | None,
+    ) -> None:
+        """
+        画面判定したフレームを記録する。
+        """
+        _record_frame(
+            idx, frame, screen_type, idx * self.sample_duration, self.output_dir, self.screens, self.log_rows,
+            scores=scores,
+        )
+        self._anchor_signature, self._anchor_type, self._anchor_scores = signature, screen_type, scores
+
+    def counts(self) -> dict[str, int]:
+        """
+        重複判定の件数を返す。
+        """
+        return {"dedup_checked": self.dedup_checked, "duplicates": self.duplicates}
+
+    def state(self) -> dict:
+        """
+        チェックポイントに保存する記録の途中経過を返す。
+        """
+        return {
+            "screens": self.screens,
+            "log_rows": self.log_rows,
+            "dedup_checked": self.dedup_checked,
+            "duplicates": self.duplicates,
+            "anchor_signature": self._anchor_signature,
+            "anchor_type": self._anchor_type,
+            "anchor_scores": self._anchor_scores,
+        }
+
+    def restore(self, state: dict) -> None:
+        """
+        チェックポイントから記録の途中経過を復元する。
+        """
+        self.screens = state["screens"]
+        self.log_rows = state["log_rows"]
+        self.dedup_checked = state["dedup_checked"]
+        self.duplicates = state["duplicates"]
+        self._anchor_signature = state["anchor_signature"]
+        self._anchor_type = state["anchor_type"]
+        self._anchor_scores = state["anchor_scores"]
+
+
+# チェックポイントの途中経過の形式。判定ログの項目を変えたら上げる
+CHECKPOINT_VERSION = 3
+
+class _ScanCheckpoint:
+    """
+    走査の途中経過をファイルに保存し、中断した走査を再開できるようにするクラス。
+    params（抽出間隔・取得方式・チャンク分割など）と途中経過の形式が保存時と一致する場合のみ、途中経過を再開に使う。
+    """
+
+    def __init__(self, path: str, interval_sec: float, params: dict) -> None:
+        self.path = path
+        # 保存の間隔（秒）。0以下の場合は区切りごとに毎回保存する
+        self.interval_sec = interval_sec
+        self.params = {**params, "version": CHECKPOINT_VERSION}
+        self._last_saved = time.monotonic()
+
+    def load(self) -> dict | None:
+        """
+        再開に使える途中経過を返す。チェックポイントがない、または条件が異なる場合はNoneを返す。
+        """
+        if not os.path.exists(self.path):
+            return None
+        checkpoint = load_pickle(self.path)
+        if checkpoint.get("params") != self.params:
+            print(f"チェックポイント {self.path} は走査条件が異なるため使用しません。")
+            return None
+        return checkpoint["state"]
+
+    def due(self) -> bool:
+        """
+        前回の保存から保存間隔が経過したかどうか。
+        """
+        return time.monotonic() - self._last_saved >= self.interval_sec
+
+    def save(self, state: dict) -> None:
+        """
+        途中経過を保存する。
+        """
+        save_pickle({"params": self.params, "state": state}, self.path)
+        self._last_saved = time.monotonic()
+
+
+# 判定スレッドの終了を知らせる目印
+_DONE = object()
+
+
+def _iter_classified_threaded(
+    frames: Iterator[tuple[int, np.ndarray]],
+    start_idx: int,
+    classifiers: list[ScreenClassifier],
+    with_signature: bool,
+    queue_size: int,
+) -> Iterator[tuple[int, np.ndarray, str, tuple[float, ...], np.ndarray | None]]:
+    """
+    デコードと画面判定を別スレッドで並行に行い、(抽出番号, フレーム, 画面種別, 類似度, ROI縮小画像) を抽出番号順に返すジェネレータ。
+    frames は start_idx から連番の抽出番号でフレームを返すこと。
+    デコードスレッドが判定待ちキューにフレームを詰め、classifiers の数だけの判定スレッドがそれぞれの判定器で処理する。
+    処理中のフレーム数は queue_size 枚までに制限する。
+    """
+    in_queue: queue.Queue = queue.Queue()
+    out_queue: queue.Queue = queue.Queue()
+    slots = threading.Semaphore(queue_size)
+    stop = threading.Event()
+
+    def decode() -> None:
+        try:
+            for item in frames:
+                while not slots.acquire(timeout=0.1):
+                    if stop.is_set():
+                        return
+                if stop.is_set():
+                    return
+                in_queue.put(item)
+        except Exception as e:
+            out_queue.put(e)
+        finally:
+            for _ in classifiers:
+                in_queue.put(_DONE)
+
+    def classify(classifier: ScreenClassifier) -> None:
+        try:
+            while True:
+                item = in_queue.get()
+                if item is _DONE:
+                    break
+                idx, frame = item
+                signature = classifier.signature(frame) if with_signature else None
+                out_queue.put((idx, frame, *classifier.classify_with_scores(frame), signature))
+        except Exception as e:
+            out_queue.put(e)
+        finally:
+            out_queue.put(_DONE)
+
+    threads = [threading.Thread(target=decode, daemon=True)]
+    threads += [threading.Thread(target=classify, args=(classifier,), daemon=True) for classifier in classifiers]
+    for thread in threads:
+        thread.start()
+
+    # 判定の終わった順に届く結果を、抽出番号順に並べ直して返す
+    pending = {}
+    next_idx = start_idx
+    running = len(classifiers)
+    try:
+        while running:
+            item = out_queue.get()
+            if item is _DONE:
+                running -= 1
+                continue
+            if isinstance(item, Exception):
+                raise item
+            pending[item[0]] = item
+            while next_idx in pending:
+                yield pending.pop(next_idx)
+                slots.release()
+                next_idx += 1
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+def _iter_recorded(
+    decoder: FrameDecoder,
+    classifiers: list[ScreenClassifier],
+    recorder: _ScanRecorder,
+    frame_interval: int,
+    start_idx: int = 0,
+    end_idx: int | None = None,
+    queue_size: int = 16,
+) -> Iterator[int]:
+    """
+    抽出番号の範囲 [start_idx, end_idx) のフレームを画面判定して recorder に記録し、記録するたびにその抽出番号を返すジェネレータ。
+    classifiers が2つ以上の場合は、デコードと判定をスレッドで並行に行う（結果は逐次処理と同じ）。
+    """
+    frames = profiler.timed_iter("decode", decoder.iter_frames(frame_interval, start_idx, end_idx))
+
+    if len(classifiers) > 1:
+        # 判定済みの結果を順に記録する（重複フレームも判定はされるが、記録は逐次処理と同じになる）
+        for idx, frame, screen_type, scores, signature in _iter_classified_threaded(frames, start_idx, classifiers, recorder.uses_signature, queue_size):
+            if not recorder.record_if_duplicate(idx, frame, signature):
+                recorder.record(idx, frame, screen_type, scores, signature)
+            yield idx
+    else:
+        classifier = classifiers[0]
+        for idx, frame in frames:
+            signature = classifier.signature(frame) if recorder.uses_signature else None
+            if not recorder.record_if_duplicate(idx, frame, signature):
+                recorder.record(idx, frame, *classifier.classify_with_scores(frame), signature)
+            yield idx
+
+
+def _scan_range(
+    decoder: FrameDecoder,
+    classifiers: list[ScreenClassifier],
+    frame_interval: int,
+    output_dir: str | None,
+    start_idx: int = 0,
+    end_idx: int | None = None,
+    pbar: tqdm | None = None,
+    dedup_tolerance: float | None = None,
+    queue_size: int = 16,
+    checkpoint: _ScanCheckpoint | None = None,
+) -> tuple[list[dict], list[dict], dict[str, int]]:
+    """
+    抽出番号の範囲 [start_idx, end_idx) のフレームを画面判定し、
+    matching/result フレームを記録する（output_dir を指定した場合は画像も保存する）。
+    classifiers が2つ以上の場合は、デコードと判定をスレッドで並行に行う（結果は逐次処理と同じ）。
+    dedup_tolerance を指定すると、直前と同じ画面とみなせるフレームの判定と保存を省略する。
+    checkpoint を指定すると途中経過を定期的に保存し、保存済みの途中経過があればその続きから再開する。
+    戻り値: (screens, log_rows, 段ごとの処理フレーム数)
+    """
+    recorder = _ScanRecorder(output_dir, frame_interval / decoder.fps, dedup_tolerance)
+    stage_counts_before = [dict(classifier.stage_counts) for classifier in classifiers]
+    # 再開前に処理した分を含む、段ごとの処理フレーム数
+    resumed_stage_counts: dict[str, int] = {}
+
+    def stage_counts() -> dict[str, int]:
+        counts = dict(resumed_stage_counts)
+        for classifier, before in zip(classifiers, stage_counts_before):
+            for key, count in classifier.stage_counts.items():
+                counts[key] = counts.get(key, 0) + count - before[key]
+        return counts
+
+    def after_record(idx: int) -> None:
+        if pbar is not None:
+            pbar.update(1)
+        if checkpoint is not None and checkpoint.due():
+            checkpoint.save({"next_idx": idx + 1, "recorder": recorder.state(), "stage_counts": stage_counts()})
+
+    state = checkpoint.load() if checkpoint is not None else None
+    if state is not None:
+        print(f"チェックポイントから再開します（抽出番号 {state['next_idx']} から）。")
+        recorder.restore(state["recorder"])
+        resumed_stage_counts = state["stage_counts"]
+        if pbar is not None:
+            pbar.update(state["next_idx"] - start_idx)
+        start_idx = state["next_idx"]
+    for idx in _iter_recorded(decoder, classifiers, recorder, frame_interval, start_idx, end_idx, queue_size):
+        after_record(idx)
+
+    return recorder.screens, recorder.log_rows, {**recorder.counts(), **stage_counts()}
+
+
+def _create_classifiers(config_path: str, threads: int) -> list[ScreenClassifier]:
+    """
+    判定スレッドごとの画面判定器を生成する。threads が0以下の場合は逐次処理用に1つだけ生成する。
+    """
+    return [ScreenClassifier(config_path) for _ in range(max(1, threads))]
+
+
+# ワーカープロセスごとに保持する画面判定器
+_worker_classifiers: list[ScreenClassifier] = []
+
+
+def _init_scan_worker(config_path: str, threads: int, profile: bool = False) -> None:
+    """
+    ワーカープロセスの初期化処理。画面判定器を1度だけ生成する。
+    profile=True の場合はワーカープロセスでも処理段ごとの計測を行う。
+    """
+    global _worker_classifiers
+    # プロセス並列と OpenCV 内部のスレッド並列が競合しないようにする
+    cv2.setNumThreads(1)
+    if profile:
+        profiler.enable()
+    _worker_classifiers = _create_classifiers(config_path, threads)
+
+
+def _scan_chunk(
+    video_path: str,
+    frame_interval: int,
+    output_dir: str | None,
+    decoder_options: dict,
+    start_idx: int,
+    end_idx: int | None,
+    dedup_tolerance: float | None,
+    queue_size: int,
+) -> tuple[int, list[dict], list[dict], dict[str, int], dict | None]:
+    """
+    ワーカープロセスで1チャンク分のフレームを画面判定する。
+    戻り値: (start_idx, screens, log_rows, 段ごとの処理フレーム数, 処理段ごとの計測結果（計測しない場合はNone）)
+    """
+    decoder = open_decoder(video_path, **decoder_options)
+    try:
+        screens, log_rows, counts = _scan_range(
+            decoder, _worker_classifiers, frame_interval, output_dir, start_idx, end_idx,
+            dedup_tolerance=dedup_tolerance, queue_size=queue_size,
+        )
+    finally:
+        decoder.release()
+    return start_idx, screens, log_rows, counts, profiler.take()
+
+
+def _split_chunks(
+    total_extracted: int, num_chunks: int, start_idx: int = 0, end_idx: int | None = None, align: int = 1,
+) -> list[tuple[int, int | None]]:
+    """
+    抽出番号の範囲 [start_idx, end_idx) を最大 num_chunks 個の連続した範囲に分割する。
+    範囲の境界は align の倍数にそろえる（そろえた結果、範囲の数は num_chunks より少なくなることがある）。
+    end_idx が None の場合は total_extracted までを分割し、最後の範囲は終端を None として動画の末尾まで読み切る。
+    """
+    stop = total_extracted if end_idx is None else end_idx
+    num_chunks = max(1, min(num_chunks, stop - start_idx))
+    inner = [start_idx + (stop - start_idx) * i // num_chunks for i in range(1, num_chunks)]
+    inner = sorted({-(-bound // align) * align for bound in inner} & set(range(start_idx + 1, stop)))
+    bounds = [start_idx, *inner, stop]
+    chunks = [(bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1)]
+    chunks[-1] = (chunks[-1][0], end_idx)
+    return chunks
+
+
+def time_to_index(seconds: float, fps: float, frame_interval: int) -> int:
+    """
+    再生位置 seconds（秒）以降で最初に抽出されるフレームの抽出番号を返す。
+    同じ時刻を境に分けた範囲が、重複も抜けもなく隣り合うようにする。
+    """
+    return math.ceil(round(seconds * fps / frame_interval, 6))
+
+
+def _scan_parallel(
+    video_path: str,
+    frame_interval: int,
+    total_extracted: int,
+    output_dir: str | None,
+    config_path: str,
+    decoder_options: dict,
+    workers: int,
+    dedup_tolerance: float | None = None,
+    threads: int = 0,
+    queue_size: int = 16,
+    checkpoint_path: str | None = None,
+    checkpoint_interval: float = 60,
+    start_idx: int = 0,
+    end_idx: int | None = None,
+) -> tuple[list[dict], list[dict], dict[str, int]]:
+    """
+    動画の抽出番号の範囲 [start_idx, end_idx) を時間範囲ごとのチャンクに分割し、複数プロセスで並列に画面判定する。
+    各チャンクの結果は開始位置順に連結するため、逐次処理と同じ並びになる。
+    checkpoint_path を指定すると完了したチャンクの結果を保存し、再開時は未完了のチャンクだけを処理する。
+    戻り値: (screens, log_rows, 段ごとの処理フレーム数)
+    """
+    # 負荷の偏りを均すため、ワーカー数より細かくチャンクを切る
+    # 重複フレームを省略する場合、チャンク境界を比較元の取り直し位置にそろえて逐次処理と同じ結果にする
+    align = DEDUP_ANCHOR_INTERVAL if dedup_tolerance is not None else 1
+    chunks = _split_chunks(total_extracted, workers * 4, start_idx, end_idx, align)
+    checkpoint = None
+    results = {}
+    if checkpoint_path:
+        checkpoint = _ScanCheckpoint(checkpoint_path, checkpoint_interval, {
+            "frame_interval": frame_interval, "decoder_options": decoder_options, "output_dir": output_dir,
+            "dedup_tolerance": dedup_tolerance, "chunks": chunks,
+            # 閾値はキャッシュのキーに含めないため、閾値を変えて再開した場合に判定の混ざった結果にならないようにする
+            "threshold": Config(config_path).get("template", "threshold", default=0.3),
+        })
+        results = checkpoint.load() or {}
+        if results:
+            print(f"チェックポイントから再開します（{len(results)}/{len(chunks)} チャンク完了済み）。")
+    pbar = tqdm(total=len(chunks), initial=len(results), desc=f"フレーム抽出・画面判定（{workers}並列）")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_scan_worker, initargs=(config_path, threads, profiler.enabled)) as executor:
+        futures = [
+            executor.submit(
+                _scan_chunk, video_path, frame_interval, output_dir, decoder_options, start_idx, end_idx, dedup_tolerance,
+                queue_size,
+            )
+            for start_idx, end_idx in chunks
+            if start_idx not in results
+        ]
+        for future in as_completed(futures):
+            start_idx, chunk_screens, chunk_log_rows, chunk_counts, chunk_profile = future.result()
+            profiler.merge(chunk_profile)
+            results[start_idx] = (chunk_screens, chunk_log_rows, chunk_counts)
+            if checkpoint is not None and checkpoint.due():
+                checkpoint.save(results)
+            pbar.update(1)
+
+    pbar.close()
+    screens = []
+    log_rows = []
+    counts: dict[str, int] = {}
+    for start_idx in sorted(results):
+        chunk_screens, chunk_log_rows, chunk_counts = results[start_idx]
+        screens.extend(chunk_screens)
+        log_rows.extend(chunk_log_rows)
+        for key, count in chunk_counts.items():
+            counts[key] = counts.get(key, 0) + count
+    return screens, log_rows, counts
+
+
 def extract_and_classify_frames(
     video_path: str,
     frame_interval_sec: float,
-    output_dir: str,
+    output_dir: str | None,
     config_path: str,
+    sampling: str = "grab",
+    workers: int = 1,
+    dedup_tolerance: float | None = None,
+    threads: int = 0,
+    queue_size: int = 16,
+    checkpoint_path: str | None = None,
+    checkpoint_interval: float = 60,
+    decoder_options: dict | None = None,
+    classifiers: list[ScreenClassifier] | None = None,
+    start_sec: float = 0.0,
+    end_sec: float | None = None,
 ) -> tuple[list[dict], int, list[dict]]:
     """
     動画からフレームを抽出しつつ画面判定を行い、
-    matching/result フレームのみディスクに保存する。
+    matching/result フレームの抽出番号と再生位置を screens に記録する。
+    output_dir を指定した場合のみ、matching/result フレームの画像をディスクに保存する。
+    sampling でフレームの取得方式（grab / seek / seek_keyframe）を、workers で並列プロセス数を指定する。
+    dedup_tolerance を指定すると、直前と同じ画面とみなせるフレームの判定と保存を省略する。
+    threads を2以上にすると、デコードと画面判定を別スレッドで並行に行う（判定待ちは queue_size 枚まで）。
+    checkpoint_path を指定すると checkpoint_interval 秒ごとに途中経過を保存し、
+    同じ条件で再実行したときは保存済みの位置から走査を再開する（結果は中断しなかった場合と同じになる）。
+    チェックポイントの削除は呼び出し側で行う。
+    decoder_options でデコーダーのバックエンドと設定を指定する（open_decoder の引数。省略時は OpenCV）。
+    classifiers を指定した場合、逐次処理ではその画面判定器を使い回す（並列プロセスでは各プロセスで生成する）。
+    start_sec / end_sec を指定すると、その時間範囲（秒）のフレームだけを走査する。抽出番号は動画の先頭から数える。
     戻り値: (screens, match_count, log_rows)
     """
-    ensure_dir(output_dir)
-    classifier = ScreenClassifier(config_path)
+    if output_dir is not None:
+        ensure_dir(output_dir)
+    decoder_options = {"sampling": sampling, **(decoder_options or {})}
+    decoder = open_decoder(video_path, **decoder_options)
+    frame_interval = int(decoder.fps * frame_interval_sec)
+    total_extracted = decoder.frame_count // frame_interval
+    start_idx = time_to_index(start_sec, decoder.fps, frame_interval)
+    end_idx = time_to_index(end_sec, decoder.fps, frame_interval) if end_sec is not None else None
+    range_extracted = max(0, (total_extracted if end_idx is None else min(end_idx, total_extracted)) - start_idx)
+
+    # 総フレーム数が取得できない動画はチャンク分割できないため逐次処理する
+    if workers > 1 and range_extracted > 1:
+        decoder.release()
+        screens, log_rows, counts = _scan_parallel(
+            video_path, frame_interval, total_extracted, output_dir, config_path, decoder_options, workers,
+            dedup_tolerance, threads, queue_size, checkpoint_path, checkpoint_interval, start_idx, end_idx,
+        )
+    else:
+        if classifiers is None:
+            classifiers = _create_classifiers(config_path, threads)
+        checkpoint = None
+        if checkpoint_path:
+            checkpoint = _ScanCheckpoint(checkpoint_path, checkpoint_interval, {
+                "frame_interval": frame_interval, "decoder_options": decoder_options, "output_dir": output_dir,
+                "dedup_tolerance": dedup_tolerance, "start_idx": start_idx, "end_idx": end_idx,
+                "threshold": classifiers[0].threshold,
+            })
+        pbar = tqdm(total=range_extracted, desc="フレーム抽出・画面判定")
+        screens, log_rows, counts = _scan_range(
+            decoder, classifiers, frame_interval, output_dir, start_idx, end_idx, pbar=pbar,
+            dedup_tolerance=dedup_tolerance, queue_size=queue_size, checkpoint=checkpoint,
+        )
+        decoder.release()
+        pbar.close()
+    _print_scan_counts(counts)
+
+    # チャンク境界をまたぐ matching → result の遷移も数えられるよう、連結後の結果から試合数を数える
+    match_count = count_matches(screens)
+    return screens, match_count, log_rows
+
+
+def iter_scanned_frames(
+    video_path: str,
+    frame_interval_sec: float,
+    output_dir: str | None,
+    config_path: str,
+    sampling: str = "grab",
+    dedup_tolerance: float | None = None,
+    threads: int = 0,
+    queue_size: int = 16,
+    decoder_options: dict | None = None,
+    classifiers: list[ScreenClassifier] | None = None,
+    start_sec: float = 0.0,
+    end_sec: float | None = None,
+) -> Iterator[dict]:
+    """
+    extract_and_classify_frames と同じ走査を行い、フレームを判定するたびに判定ログの行（log_rows の要素）を返すジェネレータ。
+    判定結果は溜め込まないため、動画が長くてもメモリ使用量は一定。走査はこのプロセス内で行う（threads は指定できる）。
+    途中で読むのをやめた場合はデコーダーを解放して走査を終える。
+    """
+    if output_dir is not None:
+        ensure_dir(output_dir)
+    decoder = open_decoder(video_path, **{"sampling": sampling, **(decoder_options or {})})
+    try:
+        frame_interval = int(decoder.fps * frame_interval_sec)
+        start_idx = time_to_index(start_sec, decoder.fps, frame_interval)
+        end_idx = time_to_index(end_sec, decoder.fps, frame_interval) if end_sec is not None else None
+        if classifiers is None:
+            classifiers = _create_classifiers(config_path, threads)
+        recorder = _ScanRecorder(output_dir, frame_interval / decoder.fps, dedup_tolerance)
+        for _ in _iter_recorded(decoder, classifiers, recorder, frame_interval, start_idx, end_idx, queue_size):
+            # 記録した行はすぐに返して手放す
+            yield from recorder.log_rows
+            recorder.log_rows.clear()
+            recorder.screens.clear()
+    finally:
+        decoder.release()
+
+
+def _screen_group(screen_type: str) -> str:
+    """
+    遷移判定用に画面種別をまとめる（result_win / result_lose は同じ result として扱う）。
+    """
+    return "result" if screen_type in ("result_win", "result_lose") else screen_type
+
+
+def extract_and_classify_frames_adaptive(
+    video_path: str,
+    coarse_interval_sec: float,
+    refine_interval_sec: float,
+    output_dir: str | None,
+    config_path: str,
+    classifier: ScreenClassifier | None = None,
+    min_screen_sec: float | None = None,
+) -> tuple[list[dict], int, list[dict]]:
+    """
+    粗い間隔で画面判定を行い、matching / result 画面へ切り替わる区間だけを
+    二分探索で refine_interval_sec 刻みまで詰める適応的な走査を行う。
+    粗い判定で result の直前の標本が matching でない区間は、間の matching 画面を見落とさないよう
+    refine_interval_sec 刻みで全フレームを判定する。
+    min_screen_sec（matching / result 画面の最短の表示時間）を指定すると、
+    どの画面も粗い判定で少なくとも1回は判定されるよう、粗い間隔をそれより短く抑える。
+    フレーム番号は refine_interval_sec 間隔の抽出番号で表すため、
+    タイムスタンプの計算には refine_interval_sec を用いる。
+    classifier を指定した場合は、新たに生成せずその画面判定器を使う。
+    戻り値: (screens, match_count, log_rows)
+    """
+    if output_dir is not None:
+        ensure_dir(output_dir)
+    if classifier is None:
+        classifier = ScreenClassifier(config_path)
     cap = open_video(video_path)
     fps = get_fps(cap)
-    frame_interval = int(fps * frame_interval_sec)
+    frame_interval = int(fps * refine_interval_sec)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    total_extracted = -(-total_frames // frame_interval)
+    step = max(1, round(coarse_interval_sec / refine_interval_sec))
+    if min_screen_sec is not None:
+        # 抽出位置のずれを見込んで、最短の画面に含まれる抽出番号の数より1つ少ない間隔にする
+        max_step = max(1, int(min_screen_sec / refine_interval_sec) - 1)
+        if step > max_step:
+            print(
+                f"粗い判定間隔 {coarse_interval_sec} 秒は画面の最短表示時間 {min_screen_sec} 秒に対して長いため、"
+                f"{max_step * refine_interval_sec} 秒にします。"
+            )
+            step = max_step
 
-    screens = []
-    match_count = 0
-    prev_type = None
-    log_rows = []
+    screen_types: dict[int, str] = {}
+    # 判定順はフレーム順と一致しないため、抽出番号ごとに記録して最後に並べ直す
+    records: dict[int, tuple[list[dict], list[dict]]] = {}
 
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    total_extracted = total_frames // frame_interval
-    pbar = tqdm(total=total_extracted, desc="フレーム抽出・画面判定")
+    def classify_at(idx: int) -> str | None:
+        """
+        抽出番号 idx のフレームへシークして画面判定する。読み込めない場合はNoneを返す。
+        """
+        if idx in screen_types:
+            return screen_types[idx]
+        with profiler.stage("seek_read"):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, idx * frame_interval)
+            ret, frame = cap.read()
+        if not ret:
+            return None
+        screen_type, scores = classifier.classify_with_scores(frame)
+        screen_types[idx] = screen_type
+        records[idx] = ([], [])
+        _record_frame(idx, frame, screen_type, idx * frame_interval / fps, output_dir, *records[idx], scores=scores)
+        return screen_type
 
-    frame_count = 0
-    idx = 0
-    while True:
-        if not cap.grab():
+    # 1. 粗い走査
+    coarse_indices = []
+    for idx in tqdm(range(0, total_extracted, step), desc="粗い走査"):
+        if classify_at(idx) is None:
             break
-        if frame_count % frame_interval == 0:
-            ret, frame = cap.retrieve()
-            if not ret:
-                break
-
-            screen_type = classifier.classify(frame)
-            frame_path = os.path.join(output_dir, f"frame_{idx:05d}.png")
-            log_rows.append({"frame": f"frame_{idx:05d}.png", "screen_type": screen_type})
+        coarse_indices.append(idx)
 
-            if screen_type in ("matching", "result_win", "result_lose"):
-                cv2.imwrite(frame_path, frame)
-                screens.append({"type": screen_type, "path": frame_path})
-                if prev_type == "matching" and screen_type in ("result_win", "result_lose"):
-                    match_count += 1
-                prev_type = screen_type
+    # 2. result の直前の標本が matching でない区間は、粗い間隔より短い matching 画面を見落とさないよう密に判定する
+    gaps = [
+        (lo, hi) for lo, hi in zip(coarse_indices, coarse_indices[1:])
+        if _screen_group(screen_types[hi]) == "result" and screen_types[lo] != "matching"
+    ]
+    for lo, hi in tqdm(gaps, desc="見落としの確認"):
+        for idx in range(lo + 1, hi):
+            classify_at(idx)
 
-            idx += 1
-            pbar.update(1)
-        frame_count += 1
+    # 3. matching / result 画面へ切り替わる区間を二分探索で詰める
+    transitions = [
+        (lo, hi) for lo, hi in zip(coarse_indices, coarse_indices[1:])
+        if screen_types[hi] != "other" and _screen_group(screen_types[lo]) != _screen_group(screen_types[hi])
+    ]
+    for lo, hi in tqdm(transitions, desc="遷移位置の絞り込み"):
+        target = _screen_group(screen_types[hi])
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            mid_type = classify_at(mid)
+            if mid_type is not None and _screen_group(mid_type) == target:
+                hi = mid
+            else:
+                lo = mid
 
     cap.release()
-    pbar.close()
+    _print_scan_counts(classifier.stage_counts)
+
+    screens = []
+    log_rows = []
+    for idx in sorted(records):
+        screens.extend(records[idx][0])
+        log_rows.extend(records[idx][1])
+    match_count = count_matches(screens)
+    print(f"デコードしたフレーム数: {len(screen_types)}（{refine_interval_sec}秒間隔の密な走査では {total_extracted}）")
     return screens, match_count, log_rows
@@ -0,0 +1,102 @@
+import cv2
+import os
+import time
+import numpy as np
+from typing import BinaryIO, Iterator
+from src.video.handler import get_fps
+
+
+def iter_growing_video_frames(
+    video_path: str,
+    frame_interval_sec: float,
+    poll_interval: float = 1.0,
+    idle_timeout: float = 60.0,
+) -> Iterator[tuple[int, np.ndarray, float]]:
+    """
+    録画中で末尾に書き足されていく動画ファイルから、frame_interval_sec ごとに
+    (抽出番号, フレーム画像, 再生位置[秒]) を返すジェネレータ。
+    末尾まで読んだらファイルが伸びるのを poll_interval 秒ごとに確認し、伸びていれば開き直して続きから読む。
+    idle_timeout 秒の間ファイルが伸びなければ録画が終わったとみなして終了する。
+    """
+    frame_count = 0
+    last_size = -1
+    idle_since = time.monotonic()
+    finished = False
+
+    while True:
+        cap = cv2.VideoCapture(video_path)
+        if cap.isOpened():
+            fps = get_fps(cap)
+            frame_interval = max(1, int(fps * frame_interval_sec))
+            if frame_count > 0:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_count)
+            # 書き込み途中の末尾のフレームを判定しないよう、次のフレームが読めてから確定する
+            pending = None
+            grabbed = False
+            while cap.grab():
+                if pending is not None:
+                    yield pending
+                    pending = None
+                if frame_count % frame_interval == 0:
+                    ret, frame = cap.retrieve()
+                    if ret:
+                        pending = (frame_count // frame_interval, frame, frame_count / fps)
+                frame_count += 1
+                grabbed = True
+            if finished:
+                if pending is not None:
+                    yield pending
+                cap.release()
+                return
+            if grabbed:
+                # 末尾のフレームは次に開き直したときに読み直す
+                frame_count -= 1
+        cap.release()
+        if finished:
+            return
+
+        # 書き足されるまで待つ（ヘッダーが書き込まれる前は開けないため、開けない場合も待つ）
+        while True:
+            size = os.path.getsize(video_path) if os.path.exists(video_path) else -1
+            if size != last_size:
+                last_size = size
+                idle_since = time.monotonic()
+                break
+            if time.monotonic() - idle_since >= idle_timeout:
+                # 録画が終わったとみなし、末尾のフレームまで読み切る
+                finished = True
+                break
+            time.sleep(poll_interval)
+
+
+def iter_raw_frames(
+    stream: BinaryIO,
+    width: int,
+    height: int,
+    fps: float,
+    frame_interval_sec: float,
+) -> Iterator[tuple[int, np.ndarray, float]]:
+    """
+    パイプから流れてくる生フレーム（bgr24）を読み、frame_interval_sec ごとに
+    (抽出番号, フレーム画像, 再生位置[秒]) を返すジェネレータ。
+    例: ffmpeg -i <入力> -f rawvideo -pix_fmt bgr24 - | python main.py --input - --follow ...
+    読み込み用のバッファは使い回すため、返したフレーム画像は次の読み込みで上書きされる。
+    """
+    frame_interval = max(1, int(fps * frame_interval_sec))
+    frame_size = width * height * 3
+    buffer = bytearray(frame_size)
+    view = memoryview(buffer)
+    frame = np.frombuffer(buffer, dtype=np.uint8).reshape(height, width, 3)
+    frame_count = 0
+
+    while True:
+        # 読み捨てるフレームも、フレームの区切りを保つために全バイトを読む
+        filled = 0
+        while filled < frame_size:
+            n = stream.readinto(view[filled:])
+            if not n:
+                return
+            filled += n
+        if frame_count % frame_interval == 0:
+            yield frame_count // frame_interval, frame, frame_count / fps
+        frame_count += 1
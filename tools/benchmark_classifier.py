@@ -0,0 +1,86 @@
+import argparse
+import time
+import cv2
+import numpy as np
+from src.core.config import Config
+from src.screen.classifier import ScreenClassifier
+from src.util.image import roi_ratio_to_absolute
+
+RESOLUTIONS = {"720p": (1280, 720), "1080p": (1920, 1080), "4K": (3840, 2160)}
+
+
+def classify_legacy(classifier: ScreenClassifier, img: np.ndarray) -> str:
+    """
+    事前計算を使わない従来の判定処理（フレームごとにROI計算・リサイズ・グレースケール化を行う）。
+    """
+    roi_config = classifier.roi_config
+    for screen_type, template, key in (
+        ("matching", classifier.vs_template, "vs"),
+        ("result_win", classifier.win_template, "win"),
+        ("result_lose", classifier.lose_template, "lose"),
+    ):
+        roi = roi_config.get(key)
+        if template is not None and roi and classifier.match_template(img, template, roi_ratio_to_absolute(img, roi)):
+            return screen_type
+    return "other"
+
+
+def make_frames(config: Config, classifier: ScreenClassifier, size: tuple[int, int]) -> dict[str, np.ndarray]:
+    """
+    ノイズ画像と、各ロゴをROIに貼り付けた画像を生成する。
+    """
+    w, h = size
+    rng = np.random.default_rng(0)
+    noise = cv2.resize(rng.integers(0, 256, (h // 8, w // 8, 3), dtype=np.uint8), (w, h), interpolation=cv2.INTER_NEAREST)
+    frames = {"other": noise}
+    for screen_type, template, key in (
+        ("matching", classifier.vs_template, "vs"),
+        ("result_win", classifier.win_template, "win"),
+        ("result_lose", classifier.lose_template, "lose"),
+    ):
+        img = np.full_like(noise, 40)
+        x1, y1, x2, y2 = roi_ratio_to_absolute(img, config.get("roi", key))
+        logo = cv2.resize(template, (x2 - x1, y2 - y1), interpolation=cv2.INTER_AREA)
+        img[y1:y2, x1:x2] = cv2.cvtColor(logo, cv2.COLOR_GRAY2BGR)
+        frames[screen_type] = img
+    return frames
+
+
+def measure(func, img: np.ndarray, repeat: int) -> float:
+    """
+    func(img) の1回あたりの平均実行時間（ミリ秒）を返す。
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(img)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    """
+    720p / 1080p / 4K の合成画像で、従来の判定処理と解像度別の事前計算を使う classify() の所要時間を比較する。
+    """
+    parser = argparse.ArgumentParser(description="画面判定 classify() のマイクロベンチマーク")
+    parser.add_argument("--config", default="config/config.yaml", help="設定ファイルのパス")
+    parser.add_argument("--repeat", type=int, default=20, help="1画像あたりの計測回数")
+    args = parser.parse_args()
+
+    config = Config(args.config)
+    classifier = ScreenClassifier(args.config)
+    print(f"{'解像度':<8}{'画像':<13}{'従来(ms)':>10}{'事前計算(ms)':>14}{'初回の計画作成(ms)':>20}  判定")
+    for name, size in RESOLUTIONS.items():
+        frames = make_frames(config, classifier, size)
+        start = time.perf_counter()
+        classifier._get_plan(frames["other"])
+        build_ms = (time.perf_counter() - start) * 1000
+        for screen_type, img in frames.items():
+            legacy_ms = measure(lambda x: classify_legacy(classifier, x), img, args.repeat)
+            plan_ms = measure(classifier.classify, img, args.repeat)
+            legacy_type = classify_legacy(classifier, img)
+            plan_type = classifier.classify(img)
+            status = plan_type if legacy_type == plan_type else f"不一致 ({legacy_type} / {plan_type})"
+            print(f"{name:<8}{screen_type:<13}{legacy_ms:>10.2f}{plan_ms:>14.3f}{build_ms:>20.1f}  {status}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import argparse
+import os
+import time
+import numpy as np
+from src.core.config import Config
+from src.screen.classifier import ScreenClassifier
+from src.video.handler import open_decoder
+
+
+def run(video_path: str, frame_interval_sec: float, decoder_options: dict, classifier: ScreenClassifier) -> dict:
+    """
+    指定したデコーダーで全区間のフレームを取り出して画面判定し、
+    所要時間・CPU時間（ffmpeg の子プロセスを含む）・画面判定結果を返す。
+    """
+    decoder = open_decoder(video_path, **decoder_options)
+    frame_interval = int(decoder.fps * frame_interval_sec)
+    screen_types = []
+    decode_time = 0.0
+    times_before = os.times()
+    start = time.perf_counter()
+    frames = decoder.iter_frames(frame_interval)
+    while True:
+        decode_start = time.perf_counter()
+        item = next(frames, None)
+        decode_time += time.perf_counter() - decode_start
+        if item is None:
+            break
+        screen_types.append(classifier.classify(item[1]))
+    elapsed = time.perf_counter() - start
+    times_after = os.times()
+    decoder.release()
+    cpu_self = (times_after.user - times_before.user) + (times_after.system - times_before.system)
+    cpu_children = (times_after.children_user - times_before.children_user) + (times_after.children_system - times_before.children_system)
+    return {
+        "elapsed": elapsed,
+        "decode_time": decode_time,
+        "cpu_self": cpu_self,
+        "cpu_children": cpu_children,
+        "screen_types": screen_types,
+    }
+
+
+def main():
+    """
+    OpenCV と ffmpeg のデコーダーで走査し、フレーム数/秒と CPU 時間を比較する。
+    両デコーダーの画面判定結果が一致するかも確認する。
+    """
+    parser = argparse.ArgumentParser(description="デコーダーのベンチマーク")
+    parser.add_argument("--input", required=True, help="入力動画ファイルのパス")
+    parser.add_argument("--config", default="config/config.yaml", help="設定ファイルのパス")
+    parser.add_argument("--scale", type=float, default=None, help="ffmpeg バックエンドの縮小率（省略時は設定ファイルの値）")
+    args = parser.parse_args()
+
+    config = Config(args.config)
+    frame_interval_sec = config.get("video", "frame_interval")
+    ffmpeg_config = config.get("video", "decoder", "ffmpeg", default={}) or {}
+    rois = [config.get("roi", key) for key in ("vs", "win", "lose")]
+    scale = args.scale if args.scale is not None else ffmpeg_config.get("scale", 1.0)
+    ffmpeg_path = ffmpeg_config.get("path", "ffmpeg")
+    cases = [
+        ("opencv", {"backend": "opencv", "sampling": config.get("video", "sampling", default="grab")}),
+        ("ffmpeg", {"backend": "ffmpeg", "ffmpeg_path": ffmpeg_path}),
+        ("ffmpeg+crop", {"backend": "ffmpeg", "ffmpeg_path": ffmpeg_path, "crop_rois": rois, "scale": scale}),
+    ]
+
+    classifier = ScreenClassifier(args.config)
+    results = {name: run(args.input, frame_interval_sec, options, classifier) for name, options in cases}
+
+    print(f"{'デコーダー':<14}{'時間(秒)':>10}{'デコード(秒)':>14}{'フレーム/秒':>12}{'CPU 本体(秒)':>14}{'CPU ffmpeg(秒)':>16}")
+    for name, r in results.items():
+        fps = len(r["screen_types"]) / r["elapsed"] if r["elapsed"] else 0.0
+        print(f"{name:<14}{r['elapsed']:>10.2f}{r['decode_time']:>14.2f}{fps:>12.1f}{r['cpu_self']:>14.2f}{r['cpu_children']:>16.2f}")
+
+    reference = results["opencv"]["screen_types"]
+    for name, r in results.items():
+        if name == "opencv":
+            continue
+        mismatched = int(np.sum(np.array(r["screen_types"]) != np.array(reference))) if len(r["screen_types"]) == len(reference) else None
+        if mismatched == 0:
+            print(f"{name}: 画面判定結果は opencv と一致しました。")
+        else:
+            print(f"{name}: 画面判定結果が opencv と異なります（抽出数 {len(r['screen_types'])} / {len(reference)}、不一致 {mismatched} 件）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import argparse
+import os
+import tempfile
+import time
+from src.core.config import Config
+from src.video.handler import extract_and_classify_frames
+
+
+def directory_size(dir_path: str) -> int:
+    """
+    ディレクトリ内のファイルサイズの合計（バイト）を返す。
+    """
+    return sum(os.path.getsize(os.path.join(root, file)) for root, _, files in os.walk(dir_path) for file in files)
+
+
+def main():
+    """
+    matching/result フレームの画像を保存する場合としない場合で走査し、所要時間とディスク使用量を比較する。
+    """
+    parser = argparse.ArgumentParser(description="フレーム画像保存の有無による走査時間・ディスク使用量の比較")
+    parser.add_argument("--input", required=True, help="入力動画ファイルのパス")
+    parser.add_argument("--config", default="config/config.yaml", help="設定ファイルのパス")
+    args = parser.parse_args()
+
+    config = Config(args.config)
+    frame_interval = config.get("video", "frame_interval")
+    sampling = config.get("video", "sampling", default="grab")
+
+    with tempfile.TemporaryDirectory() as frames_dir:
+        start = time.perf_counter()
+        saved_screens, _, _ = extract_and_classify_frames(args.input, frame_interval, frames_dir, args.config, sampling)
+        saved_time = time.perf_counter() - start
+        saved_bytes = directory_size(frames_dir)
+
+    start = time.perf_counter()
+    screens, _, _ = extract_and_classify_frames(args.input, frame_interval, None, args.config, sampling)
+    deferred_time = time.perf_counter() - start
+
+    print(f"画像を保存する:   {saved_time:8.2f} 秒、{len(saved_screens)} 枚、{saved_bytes / 1024 ** 2:.1f} MB")
+    print(f"画像を保存しない: {deferred_time:8.2f} 秒、{len(screens)} 件、0.0 MB")
+    print(f"削減: {saved_time - deferred_time:.2f} 秒、{saved_bytes / 1024 ** 2:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import glob
+import os
+import statistics
+import time
+import cv2
+from src.core.config import Config
+from src.ocr import create_ocr_engine, preprocess_for_ocr
+from src.util.image import get_player_unit_roi_from_ratio, get_roi
+
+
+def load_regions(frames_dir: str, config: Config, limit: int) -> list:
+    """
+    マッチング画面のフレーム画像からプレイヤー名・機体名の領域を切り出し、OCR用に前処理した画像を返す。
+    """
+    roi_config = config.get("roi", "player_unit", default={})
+    processed = []
+    for path in sorted(glob.glob(os.path.join(frames_dir, "*.png")))[:limit]:
+        img = cv2.imread(path)
+        if img is None:
+            continue
+        for roi in get_player_unit_roi_from_ratio(img, roi_config).values():
+            processed.append(preprocess_for_ocr(get_roi(img, roi), config))
+    return processed
+
+
+def run(engine, processed: list) -> dict:
+    """
+    1領域ずつOCRしたときの1回あたりの所要時間と、1フレーム分（8領域）をまとめて渡したときの所要時間を測る。
+    """
+    latencies = []
+    texts = []
+    for img in processed:
+        start = time.perf_counter()
+        texts.append(engine.image_to_string(img))
+        latencies.append(time.perf_counter() - start)
+
+    frame_times = []
+    for i in range(0, len(processed), 8):
+        start = time.perf_counter()
+        engine.images_to_strings(processed[i:i + 8])
+        frame_times.append(time.perf_counter() - start)
+    return {"latencies": latencies, "frame_times": frame_times, "texts": texts}
+
+
+def main():
+    """
+    pytesseract と tesserocr のOCRエンジンで、1領域あたり・1フレームあたりの所要時間を比較する。
+    両エンジンのOCR結果が一致するかも確認する。
+    """
+    parser = argparse.ArgumentParser(description="OCRエンジンのベンチマーク")
+    parser.add_argument("--input", required=True, help="マッチング画面のフレーム画像（PNG）のディレクトリ")
+    parser.add_argument("--config", default="config/config.yaml", help="設定ファイルのパス")
+    parser.add_argument("--limit", type=int, default=20, help="使うフレーム画像の最大枚数")
+    args = parser.parse_args()
+
+    config = Config(args.config)
+    processed = load_regions(args.input, config, args.limit)
+    if not processed:
+        print(f"{args.input} にフレーム画像がありません。")
+        return
+
+    results = {}
+    for backend in ("pytesseract", "tesserocr"):
+        try:
+            engine = create_ocr_engine(config, backend=backend)
+        except ImportError as e:
+            print(f"{backend}: {e}")
+            continue
+        results[backend] = run(engine, processed)
+        engine.close()
+
+    print(f"{'エンジン':<14}{'1領域 中央値(ms)':>18}{'1領域 p95(ms)':>16}{'1フレーム 平均(ms)':>20}")
+    for name, r in results.items():
+        latencies = sorted(r["latencies"])
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(
+            f"{name:<14}{statistics.median(latencies) * 1000:>18.1f}{p95 * 1000:>16.1f}"
+            f"{statistics.mean(r['frame_times']) * 1000:>20.1f}"
+        )
+
+    if len(results) == 2:
+        mismatched = sum(a != b for a, b in zip(results["pytesseract"]["texts"], results["tesserocr"]["texts"]))
+        print(f"OCR結果の不一致: {mismatched} / {len(processed)} 領域")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import argparse
+import glob
+import os
+import time
+import cv2
+import numpy as np
+from src.core.config import Config
+from src.ocr import OcrPreprocessPlan, preprocess_for_ocr
+from src.util.image import get_player_unit_roi_from_ratio, get_roi
+
+
+def main():
+    """
+    マッチング画面のフレーム画像1枚あたりの、8領域のOCR前処理にかかる時間を
+    領域ごとの preprocess_for_ocr と前計算した手順（OcrPreprocessPlan）で比較する。
+    両者の二値化画像が一致するかも確認する。
+    """
+    parser = argparse.ArgumentParser(description="OCR前処理のベンチマーク")
+    parser.add_argument("--input", required=True, help="マッチング画面のフレーム画像（PNG）のディレクトリ")
+    parser.add_argument("--config", default="config/config.yaml", help="設定ファイルのパス")
+    parser.add_argument("--repeat", type=int, default=20, help="各フレームを処理する回数")
+    args = parser.parse_args()
+
+    config = Config(args.config)
+    roi_config = config.get("roi", "player_unit", default={})
+    imgs = [cv2.imread(path) for path in sorted(glob.glob(os.path.join(args.input, "*.png")))]
+    imgs = [img for img in imgs if img is not None]
+    if not imgs:
+        print(f"{args.input} にフレーム画像がありません。")
+        return
+    rois = [list(get_player_unit_roi_from_ratio(img, roi_config).values()) for img in imgs]
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        expected = [[preprocess_for_ocr(get_roi(img, roi), config) for roi in frame_rois] for img, frame_rois in zip(imgs, rois)]
+    per_roi_time = (time.perf_counter() - start) / (args.repeat * len(imgs))
+
+    plan = OcrPreprocessPlan(config)
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        actual = [plan.apply_regions(img, frame_rois) for img, frame_rois in zip(imgs, rois)]
+    plan_time = (time.perf_counter() - start) / (args.repeat * len(imgs))
+
+    mismatched = sum(
+        not np.array_equal(a, b)
+        for frame_a, frame_b in zip(expected, actual)
+        for a, b in zip(frame_a, frame_b)
+    )
+    print(f"preprocess_for_ocr: 1フレームあたり {per_roi_time * 1000:.3f} ms")
+    print(f"OcrPreprocessPlan:  1フレームあたり {plan_time * 1000:.3f} ms")
+    print(f"二値化画像の不一致: {mismatched} / {sum(len(frame_rois) for frame_rois in rois)} 領域")
+
+
+if __name__ == "__main__":
+    main()
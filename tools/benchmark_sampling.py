@@ -0,0 +1,101 @@
+import argparse
+import hashlib
+import time
+import cv2
+from src.core.config import Config
+from src.video.handler import get_fps, iter_sampled_frames, list_keyframes, open_video
+
+
+class CountingCapture:
+    """
+    cv2.VideoCaptureをラップし、grab/retrieve/シークの呼び出し回数を数えるクラス。
+    """
+
+    def __init__(self, cap: cv2.VideoCapture) -> None:
+        self._cap = cap
+        self.grabbed = 0
+        self.retrieved = 0
+        self.seeks = 0
+
+    def grab(self) -> bool:
+        self.grabbed += 1
+        return self._cap.grab()
+
+    def retrieve(self):
+        self.retrieved += 1
+        return self._cap.retrieve()
+
+    def read(self):
+        self.grabbed += 1
+        self.retrieved += 1
+        return self._cap.read()
+
+    def set(self, prop_id: int, value: float) -> bool:
+        if prop_id in (cv2.CAP_PROP_POS_FRAMES, cv2.CAP_PROP_POS_MSEC):
+            self.seeks += 1
+        return self._cap.set(prop_id, value)
+
+    def get(self, prop_id: int) -> float:
+        return self._cap.get(prop_id)
+
+
+def run(video_path: str, frame_interval_sec: float, sampling: str, keyframe_tolerance: float = 0.5) -> dict:
+    """
+    指定したサンプリング方式でフレームを取得し、所要時間・呼び出し回数・フレームのハッシュ列を返す。
+    seek_keyframe 方式の所要時間にはキーフレームの位置を調べる時間を含める。
+    """
+    cap = open_video(video_path)
+    fps = get_fps(cap)
+    frame_interval = int(fps * frame_interval_sec)
+    counting = CountingCapture(cap)
+    digests = []
+    start = time.perf_counter()
+    keyframes = list_keyframes(video_path) if sampling == "seek_keyframe" else None
+    frames = iter_sampled_frames(counting, frame_interval, sampling, keyframes=keyframes, keyframe_tolerance=int(keyframe_tolerance * fps))
+    for _, frame in frames:
+        digests.append(hashlib.md5(frame.tobytes()).hexdigest())
+    elapsed = time.perf_counter() - start
+    cap.release()
+    return {
+        "sampling": sampling,
+        "elapsed": elapsed,
+        "sampled": len(digests),
+        "grabbed": counting.grabbed,
+        "retrieved": counting.retrieved,
+        "seeks": counting.seeks,
+        "digests": digests,
+    }
+
+
+def main():
+    """
+    grab方式・seek方式・seek_keyframe方式でフレーム取得を行い、デコード回数と実行時間を比較する。
+    seek方式で取得したフレームが grab方式と一致するかも確認する（seek_keyframe方式は近くのキーフレームを使うため一致するとは限らない）。
+    """
+    parser = argparse.ArgumentParser(description="フレーム取得方式のベンチマーク")
+    parser.add_argument("--input", required=True, help="入力動画ファイルのパス")
+    parser.add_argument("--config", default="config/config.yaml", help="設定ファイルのパス")
+    args = parser.parse_args()
+
+    config = Config(args.config)
+    frame_interval_sec = config.get("video", "frame_interval")
+    keyframe_tolerance = config.get("video", "keyframe_tolerance", default=0.5)
+
+    results = [run(args.input, frame_interval_sec, sampling, keyframe_tolerance) for sampling in ("grab", "seek", "seek_keyframe")]
+    print(f"{'方式':<14}{'時間(秒)':>10}{'抽出数':>8}{'grab数':>10}{'retrieve数':>12}{'シーク数':>8}")
+    for r in results:
+        print(f"{r['sampling']:<14}{r['elapsed']:>10.2f}{r['sampled']:>8}{r['grabbed']:>10}{r['retrieved']:>12}{r['seeks']:>8}")
+    print("※ seek方式ではシーク先の直前キーフレームからのデコードは grab数 に含まれない。")
+
+    grab, seek, seek_keyframe = results
+    snapped = sum(a != b for a, b in zip(grab["digests"], seek_keyframe["digests"]))
+    print(f"seek_keyframe方式でキーフレームにずらしたフレーム: {snapped} / {seek_keyframe['sampled']}")
+    mismatched = sum(a != b for a, b in zip(grab["digests"], seek["digests"]))
+    if grab["sampled"] != seek["sampled"] or mismatched:
+        print(f"フレーム不一致: 抽出数 {grab['sampled']} / {seek['sampled']}、内容の不一致 {mismatched} 件")
+    else:
+        print("両方式で取得したフレームは一致しました。")
+
+
+if __name__ == "__main__":
+    main()
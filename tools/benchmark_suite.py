@@ -0,0 +1,256 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import yaml
+from src.core.config import Config
+from src.core.pipeline import Pipeline
+from src.ocr import Matcher, create_ocr_engine, ocr_on_matching_regions
+from src.screen.classifier import ScreenClassifier
+from src.util.timestamp import format_timestamp
+from src.video.handler import extract_and_classify_frames, extract_and_classify_frames_adaptive
+from tools.synthetic_video import PLAYER_NAMES, UNIT_NAMES, SyntheticFrames, make_timeline, write_synthetic_video
+
+# 合成動画の条件（名前, (幅, 高さ), FPS, 試合数）
+SCENARIOS = {
+    "quick": [
+        ("480p30", (854, 480), 30, 2),
+    ],
+    "full": [
+        ("480p30", (854, 480), 30, 2),
+        ("720p30", (1280, 720), 30, 5),
+        ("720p60", (1280, 720), 60, 3),
+        ("1080p30", (1920, 1080), 30, 3),
+    ],
+}
+
+# 照合の候補数（合成した名前に加えるランダムな名前の数）
+EXTRA_PLAYER_CANDIDATES = 5000
+
+
+def write_benchmark_config(config_path: str, work_dir: str) -> str:
+    """
+    出力先・候補リストを作業ディレクトリに向けた設定ファイルを書き出し、そのパスを返す。
+    """
+    with open(config_path, encoding="utf-8") as f:
+        config = yaml.safe_load(f)
+    rng = random.Random(0)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    players = PLAYER_NAMES + ["".join(rng.choice(letters) for _ in range(rng.randint(4, 10))) for _ in range(EXTRA_PLAYER_CANDIDATES)]
+    data_paths = {"player_names": players, "unit_names": UNIT_NAMES}
+    for key, names in data_paths.items():
+        path = os.path.join(work_dir, f"{key}.csv")
+        pd.DataFrame({"name": names}).to_csv(path, index=False, header=False)
+        config.setdefault("data", {})[key] = path
+    config["output"] = {
+        **config.get("output", {}),
+        "frames": os.path.join(work_dir, "frames"),
+        "cache": os.path.join(work_dir, "cache"),
+        "results": os.path.join(work_dir, "results"),
+        "cache_max_mb": 0,
+    }
+    config.setdefault("video", {})["checkpoint"] = {"enabled": False}
+    path = os.path.join(work_dir, "config.yaml")
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(config, f, allow_unicode=True)
+    return path
+
+
+def check_timestamps(csv_path: str, matches: list[dict], frame_interval: float, fps: float, fractional: bool) -> dict:
+    """
+    出力されたタイムスタンプが正解（マッチング画面の開始時刻以降で最初に抽出されるフレームの時刻）と一致するかを確認する。
+    """
+    detected = pd.read_csv(csv_path)["start_time"].tolist() if os.path.getsize(csv_path) > 3 else []
+    interval_frames = int(fps * frame_interval)
+    expected = []
+    for match in matches:
+        first_frame = int(np.ceil(match["matching"][0] * fps))
+        extracted = -(-first_frame // interval_frames)
+        expected.append(format_timestamp(extracted * frame_interval, fractional))
+    return {"expected": expected, "detected": detected, "ok": detected == expected}
+
+
+def bench_scenario(name: str, size: tuple[int, int], fps: float, num_matches: int, config_path: str, work_dir: str) -> dict:
+    """
+    1つの条件の合成動画を作り、走査（extract_and_classify_frames）と全体（Pipeline.run_pipeline）の時間を測る。
+    """
+    config = Config(config_path)
+    frame_interval = config.get("video", "frame_interval")
+    video_path = os.path.join(work_dir, f"{name}.mp4")
+    matches = write_synthetic_video(video_path, config, size, fps, num_matches)
+    duration = make_timeline(num_matches)[1]
+
+    start = time.perf_counter()
+    _, match_count, log_rows = extract_and_classify_frames(video_path, frame_interval, None, config_path)
+    scan_sec = time.perf_counter() - start
+
+    # 適応的な走査が密な走査と同じ試合数を検出するか
+    adaptive_count = extract_and_classify_frames_adaptive(
+        video_path,
+        config.get("video", "adaptive", "coarse_interval", default=5),
+        config.get("video", "adaptive", "refine_interval", default=0.5),
+        None,
+        config_path,
+        min_screen_sec=config.get("video", "adaptive", "min_screen_sec", default=None),
+    )[1]
+
+    shutil.rmtree(config.get("output", "cache"), ignore_errors=True)
+    start = time.perf_counter()
+    Pipeline(video_path, config_path).run_pipeline()
+    pipeline_sec = time.perf_counter() - start
+
+    csv_path = os.path.join(config.get("output", "results"), f"timestamps_{name}.csv")
+    check = check_timestamps(csv_path, matches, frame_interval, fps, config.get("output", "fractional_seconds", default=False))
+    check["match_count"] = match_count
+    check["adaptive_match_count"] = adaptive_count
+    check["ok"] = check["ok"] and match_count == num_matches and adaptive_count == match_count
+    return {
+        "metrics": {
+            f"{name}.scan_sec": scan_sec,
+            f"{name}.scan_frames_per_sec": len(log_rows) / scan_sec,
+            f"{name}.pipeline_sec": pipeline_sec,
+            f"{name}.video_sec_per_sec": duration / pipeline_sec,
+        },
+        "check": check,
+    }
+
+
+def measure_ms(func, items: list, repeat: int = 1) -> float:
+    """
+    items の各要素に func を適用したときの1回あたりの平均時間（ミリ秒）を返す。
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            func(item)
+    return (time.perf_counter() - start) / (repeat * len(items)) * 1000
+
+
+def bench_components(config_path: str, size: tuple[int, int]) -> tuple[dict, dict]:
+    """
+    ScreenClassifier.classify・Matcher・ocr_on_matching_regions の1フレームあたりの時間を測る。
+    OCRは tesseract が使える場合のみ測る。
+    """
+    config = Config(config_path)
+    frames = SyntheticFrames(config, size)
+    matches, _ = make_timeline(8)
+    screens = [frames.gameplay(t) for t in range(8)]
+    screens += [frames.matching(match["fields"]) for match in matches[:4]]
+    screens += [frames.result("result_win"), frames.result("result_lose")]
+    metrics = {"classify_ms": measure_ms(ScreenClassifier(config_path).classify, screens, repeat=20)}
+
+    # 記憶が効かないよう、フレームごとに異なる誤認識を加えたテキストを照合する
+    rng = random.Random(0)
+    matcher = Matcher(config)
+    queries = []
+    for i in range(200):
+        fields = matches[i % len(matches)]["fields"]
+        queries.append({key: value[:-1] + rng.choice("abcdefghij") + str(i) for key, value in fields.items()})
+    metrics["matcher_ms_per_frame"] = measure_ms(matcher.match_texts, queries)
+
+    checks = {}
+    if shutil.which("tesseract"):
+        engine = create_ocr_engine(config)
+        matching = [frames.matching(match["fields"]) for match in matches[:4]]
+        results = []
+        metrics["ocr_ms_per_frame"] = measure_ms(
+            lambda img: results.append(ocr_on_matching_regions(img, config, matcher, engine)), matching,
+        )
+        correct = sum(r[key] == match["fields"][key] for r, match in zip(results, matches) for key in r)
+        checks["ocr_field_accuracy"] = correct / max(1, sum(len(r) for r in results))
+        engine.close()
+    return metrics, checks
+
+
+def find_regressions(metrics: dict, baseline: dict, max_regression: float, thresholds: dict[str, float]) -> list[str]:
+    """
+    基準の結果と比べて、許容する割合を超えて悪化した指標を返す。
+    名前が _per_sec で終わる指標は大きいほど良く、それ以外は小さいほど良いものとして扱う。
+    """
+    regressions = []
+    for name, value in metrics.items():
+        if name not in baseline:
+            continue
+        base = baseline[name]
+        limit = thresholds.get(name, max_regression)
+        if name.endswith("_per_sec"):
+            worse = value < base * (1 - limit)
+        else:
+            worse = value > base * (1 + limit)
+        if worse:
+            regressions.append(f"{name}: {base:.4g} → {value:.4g}（許容 {limit:.0%}）")
+    return regressions
+
+
+def main():
+    """
+    合成動画で走査・画面判定・OCR・照合・パイプライン全体の処理時間を測り、JSONに書き出す。
+    検出したタイムスタンプが正解と一致しない場合や、基準の結果から性能が悪化した場合は終了コード1で終了する。
+    """
+    parser = argparse.ArgumentParser(description="合成動画によるパイプライン全体のベンチマーク")
+    parser.add_argument("--config", default="config/config.yaml", help="設定ファイルのパス")
+    parser.add_argument("--scenarios", choices=sorted(SCENARIOS), default="quick", help="合成動画の条件の組")
+    parser.add_argument("--output", default="benchmark_results.json", help="結果のJSONファイルのパス")
+    parser.add_argument("--baseline", help="比較する基準の結果のJSONファイル")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="許容する悪化の割合（0.2 = 20%%）")
+    parser.add_argument("--threshold", action="append", default=[], metavar="NAME=RATIO",
+                        help="指標ごとの許容する悪化の割合（複数指定可）")
+    parser.add_argument("--keep", action="store_true", help="合成動画と出力を残す")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="exvs_bench_")
+    config_path = write_benchmark_config(args.config, work_dir)
+    metrics = {}
+    checks = {}
+    try:
+        for name, size, fps, num_matches in SCENARIOS[args.scenarios]:
+            result = bench_scenario(name, size, fps, num_matches, config_path, work_dir)
+            metrics.update(result["metrics"])
+            checks[f"{name}.timestamps"] = result["check"]
+        component_metrics, component_checks = bench_components(config_path, (1280, 720))
+        metrics.update(component_metrics)
+        checks.update(component_checks)
+    finally:
+        if args.keep:
+            print(f"合成動画と出力を {work_dir} に残しました。")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "environment": {"python": sys.version.split()[0], "platform": platform.platform(), "cpu_count": os.cpu_count()},
+        "scenarios": args.scenarios,
+        "metrics": metrics,
+        "checks": checks,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    for name, value in metrics.items():
+        print(f"{name:<36}{value:>12.3f}")
+    failures = [
+        f"{name}: 正解 {check['expected']} / 検出 {check['detected']}"
+        f"（試合数 {check['match_count']}、適応的な走査の試合数 {check['adaptive_match_count']}）"
+        for name, check in checks.items()
+        if isinstance(check, dict) and not check["ok"]
+    ]
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["metrics"]
+        thresholds = {name: float(ratio) for name, ratio in (item.split("=", 1) for item in args.threshold)}
+        failures += find_regressions(metrics, baseline, args.max_regression, thresholds)
+    print(f"結果を {args.output} に保存しました。")
+    if failures:
+        for failure in failures:
+            print(f"失敗: {failure}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import argparse
+import os
+import time
+import cv2
+import numpy as np
+from src.core.config import Config
+from src.screen.classifier import ScreenClassifier
+from src.video.handler import get_fps, iter_sampled_frames, open_video
+
+
+def iter_images(input_path: str, frame_interval_sec: float):
+    """
+    入力がディレクトリならPNG画像を、動画ファイルなら frame_interval_sec 間隔のフレームを順に返す。
+    """
+    if os.path.isdir(input_path):
+        for root, _, files in os.walk(input_path):
+            for file in sorted(files):
+                if file.lower().endswith(".png"):
+                    yield cv2.imread(os.path.join(root, file))
+        return
+    cap = open_video(input_path)
+    frame_interval = int(get_fps(cap) * frame_interval_sec)
+    for _, frame in iter_sampled_frames(cap, frame_interval, "seek"):
+        yield frame
+    cap.release()
+
+
+def main():
+    """
+    サンプル画像（または動画）に対してテンプレートマッチングと前段フィルタの類似度を求め、
+    指定した再現率を保証するための margin と、そのときの棄却率・所要時間を表示する。
+    正解ラベルには前段フィルタなしのテンプレートマッチングの判定結果を用いる。
+    """
+    parser = argparse.ArgumentParser(description="前段フィルタの margin を再現率から決める")
+    parser.add_argument("--input", required=True, help="サンプル画像のディレクトリ、または動画ファイルのパス")
+    parser.add_argument("--config", default="config/config.yaml", help="設定ファイルのパス")
+    parser.add_argument("--recall", type=float, default=1.0, help="保証したい再現率（0〜1）")
+    args = parser.parse_args()
+
+    config = Config(args.config)
+    classifier = ScreenClassifier(args.config)
+    classifier.prefilter_enabled = True
+    threshold = classifier.threshold
+
+    required_margins = []
+    negative_max_scores = []
+    full_time = 0.0
+    coarse_time = 0.0
+    for img in iter_images(args.input, config.get("video", "frame_interval")):
+        if img is None:
+            continue
+        start = time.perf_counter()
+        scores = classifier.scores(img)
+        full_time += time.perf_counter() - start
+        start = time.perf_counter()
+        coarse_max = max(classifier.prefilter_scores(img).values(), default=np.inf)
+        coarse_time += time.perf_counter() - start
+
+        if any(score >= threshold for score in scores.values()):
+            required_margins.append(threshold - coarse_max)
+        else:
+            negative_max_scores.append(coarse_max)
+
+    total = len(required_margins) + len(negative_max_scores)
+    if not required_margins:
+        print("matching / result と判定された画像がないため margin を決められません。")
+        return
+
+    margin = max(0.0, float(np.quantile(required_margins, args.recall, method="higher")))
+    cutoff = threshold - margin
+    rejected = sum(score < cutoff for score in negative_max_scores)
+    print(f"画像数: {total}（matching/result: {len(required_margins)}、other: {len(negative_max_scores)}）")
+    print(f"再現率 {args.recall} を保証する margin: {margin:.4f}")
+    if negative_max_scores:
+        print(f"この margin での other の棄却率: {rejected / len(negative_max_scores):.1%}")
+    print(f"1画像あたりの所要時間: テンプレートマッチング {full_time / total * 1000:.3f} ms、前段フィルタ {coarse_time / total * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+import argparse
+from src.core.config import Config
+from src.processing.match_extractor import MatchExtractor
+from src.util.frame_index import FrameIndex
+from src.video.handler import extract_and_classify_frames
+
+
+def main():
+    """
+    項目ごとに結果を確定させる方法（ocr.consensus）と、全項目が埋まるフレームを探す従来の方法で試合情報を抽出し、
+    試合ごとのOCRした領域数と抽出結果の違いを比較する。OCRの記憶は無効にして数える。
+    """
+    parser = argparse.ArgumentParser(description="項目ごとのOCR確定の比較")
+    parser.add_argument("--input", required=True, help="入力動画ファイルのパス")
+    parser.add_argument("--config", default="config/config.yaml", help="設定ファイルのパス")
+    parser.add_argument("--votes", type=int, default=None, help="項目を確定する得票数（省略時は設定ファイルの値）")
+    args = parser.parse_args()
+
+    config = Config(args.config)
+    ocr_config = config.as_dict().setdefault("ocr", {})
+    ocr_config["memo"] = {**(ocr_config.get("memo") or {}), "enabled": False}
+    frame_interval = config.get("video", "frame_interval")
+    _, _, log_rows = extract_and_classify_frames(
+        args.input, frame_interval, None, args.config, config.get("video", "sampling", default="grab"),
+    )
+    index = FrameIndex.from_scan(log_rows)
+
+    extractors = {}
+    results = {}
+    for name, enabled in (("従来", False), ("項目ごと", True)):
+        ocr_config["consensus"] = {**(ocr_config.get("consensus") or {}), "enabled": enabled}
+        if args.votes is not None:
+            ocr_config["consensus"]["votes"] = args.votes
+        extractors[name] = MatchExtractor(frame_interval, config, video_path=args.input)
+        results[name] = extractors[name].extract_match_results(index)
+
+    print(f"{'試合':>4}{'従来':>8}{'項目ごと':>10}  異なる項目")
+    for n, (old_counts, new_counts, old, new) in enumerate(zip(
+        extractors["従来"].ocr_region_counts, extractors["項目ごと"].ocr_region_counts, results["従来"], results["項目ごと"],
+    ), start=1):
+        diffs = [f"{key}: {old[key]} → {new[key]}" for key in old if key.startswith("player") and old[key] != new[key]]
+        print(f"{n:>4}{old_counts:>8}{new_counts:>10}  {', '.join(diffs)}")
+    for name, extractor in extractors.items():
+        total = sum(extractor.ocr_region_counts)
+        print(f"{name}: OCRした領域 計 {total}（試合あたり {total / max(1, len(extractor.ocr_region_counts)):.1f}）")
+
+
+if __name__ == "__main__":
+    main()
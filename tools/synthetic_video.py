@@ -0,0 +1,139 @@
+import cv2
+import numpy as np
+from src.core.config import Config
+from src.util.image import roi_ratio_to_absolute
+
+# 合成動画の1試合分の構成（秒）: マッチング画面 → ゲームプレイ → リザルト画面
+MATCHING_SEC = 6.0
+GAMEPLAY_SEC = 20.0
+RESULT_SEC = 6.0
+# 試合の前後に入れるゲームプレイ以外の区間（秒）
+LEAD_SEC = 5.0
+
+# 合成するプレイヤー名・機体名の候補（cv2.putText で描画できるASCII文字のみ）
+PLAYER_NAMES = ["Amuro", "Char", "Kamille", "Judau", "Banagher", "Setsuna", "Kira", "Athrun"]
+UNIT_NAMES = ["Nu Gundam", "Sazabi", "Zeta Gundam", "ZZ Gundam", "Unicorn", "Exia", "Freedom", "Justice"]
+
+
+def make_timeline(num_matches: int, seed: int = 0) -> tuple[list[dict], float]:
+    """
+    試合ごとの区間（マッチング画面の開始時刻、リザルト画面の区間と勝敗、各プレイヤーの名前・機体名）を作る。
+    戻り値: (試合のリスト, 動画の長さ（秒）)
+    """
+    rng = np.random.default_rng(seed)
+    matches = []
+    t = LEAD_SEC
+    for _ in range(num_matches):
+        players = rng.choice(len(PLAYER_NAMES), 4, replace=False)
+        units = rng.choice(len(UNIT_NAMES), 4, replace=False)
+        fields = {}
+        for n in range(4):
+            fields[f"player{n + 1}_name"] = PLAYER_NAMES[players[n]]
+            fields[f"player{n + 1}_unit"] = UNIT_NAMES[units[n]]
+        result_start = t + MATCHING_SEC + GAMEPLAY_SEC
+        matches.append({
+            "matching": (t, t + MATCHING_SEC),
+            "result": (result_start, result_start + RESULT_SEC),
+            "result_type": "result_win" if rng.random() < 0.5 else "result_lose",
+            "fields": fields,
+        })
+        t = result_start + RESULT_SEC + LEAD_SEC
+    return matches, t
+
+
+def _paste_logo(img: np.ndarray, template: np.ndarray, roi_ratio: list) -> None:
+    """
+    テンプレート画像をROIの大きさに縮小して貼り付ける。
+    """
+    x1, y1, x2, y2 = roi_ratio_to_absolute(img, roi_ratio)
+    logo = cv2.resize(template, (x2 - x1, y2 - y1), interpolation=cv2.INTER_AREA)
+    img[y1:y2, x1:x2] = cv2.cvtColor(logo, cv2.COLOR_GRAY2BGR)
+
+
+def _put_text(img: np.ndarray, text: str, roi_ratio: list) -> None:
+    """
+    ROIに収まる大きさで、暗い背景に白い文字を描画する。
+    """
+    x1, y1, x2, y2 = roi_ratio_to_absolute(img, roi_ratio)
+    img[y1:y2, x1:x2] = 30
+    height = y2 - y1
+    (text_w, text_h), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 1.0, 2)
+    scale = min(height * 0.7 / text_h, (x2 - x1) * 0.95 / text_w)
+    thickness = max(1, round(scale * 2))
+    baseline_y = y1 + (height + round(text_h * scale)) // 2
+    cv2.putText(img, text, (x1 + 2, baseline_y), cv2.FONT_HERSHEY_SIMPLEX, scale, (255, 255, 255), thickness, cv2.LINE_AA)
+
+
+class SyntheticFrames:
+    """
+    ゲームプレイ風のノイズに、マッチング画面（VSロゴ・プレイヤー名・機体名）と
+    リザルト画面（WIN/LOSEロゴ）を既知の時刻に合成したフレームを生成するクラス。
+    """
+
+    def __init__(self, config: Config, size: tuple[int, int], seed: int = 0) -> None:
+        self.config = config
+        self.width, self.height = size
+        rng = np.random.default_rng(seed)
+        # 縦横に2倍の大きさのブロックノイズをスクロールさせてゲームプレイ画面の代わりにする
+        blocks = rng.integers(0, 256, (self.height // 8, self.width // 8, 3), dtype=np.uint8)
+        self._texture = np.tile(cv2.resize(blocks, (self.width, self.height), interpolation=cv2.INTER_NEAREST), (2, 2, 1))
+        self._templates = {
+            key: cv2.imread(config.get("template", key), cv2.IMREAD_GRAYSCALE) for key in ("vs", "win", "lose")
+        }
+        self._screens: dict[str, np.ndarray] = {}
+
+    def gameplay(self, t: float) -> np.ndarray:
+        """
+        時刻 t のゲームプレイ風のフレームを返す。
+        """
+        dx = int(t * 97) % self.width
+        dy = int(t * 53) % self.height
+        return self._texture[dy:dy + self.height, dx:dx + self.width].copy()
+
+    def matching(self, fields: dict[str, str]) -> np.ndarray:
+        """
+        VSロゴとプレイヤー名・機体名を描画したマッチング画面を返す。
+        """
+        img = np.full((self.height, self.width, 3), 40, dtype=np.uint8)
+        _paste_logo(img, self._templates["vs"], self.config.get("roi", "vs"))
+        for key, roi_ratio in self.config.get("roi", "player_unit", default={}).items():
+            _put_text(img, fields[key], roi_ratio)
+        return img
+
+    def result(self, result_type: str) -> np.ndarray:
+        """
+        WIN/LOSEロゴを貼り付けたリザルト画面を返す。
+        """
+        if result_type not in self._screens:
+            key = "win" if result_type == "result_win" else "lose"
+            img = np.full((self.height, self.width, 3), 40, dtype=np.uint8)
+            _paste_logo(img, self._templates[key], self.config.get("roi", key))
+            self._screens[result_type] = img
+        return self._screens[result_type]
+
+
+def write_synthetic_video(
+    path: str, config: Config, size: tuple[int, int], fps: float, num_matches: int, seed: int = 0,
+) -> list[dict]:
+    """
+    合成動画を書き出し、試合ごとの正解（マッチング画面の開始時刻・勝敗・プレイヤー名・機体名）を返す。
+    """
+    matches, duration = make_timeline(num_matches, seed)
+    frames = SyntheticFrames(config, size, seed)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    if not writer.isOpened():
+        raise RuntimeError(f"動画を書き出せません: {path}")
+    matching_cache: dict[int, np.ndarray] = {}
+    for i in range(int(duration * fps)):
+        t = i / fps
+        img = None
+        for n, match in enumerate(matches):
+            if match["matching"][0] <= t < match["matching"][1]:
+                if n not in matching_cache:
+                    matching_cache[n] = frames.matching(match["fields"])
+                img = matching_cache[n]
+            elif match["result"][0] <= t < match["result"][1]:
+                img = frames.result(match["result_type"])
+        writer.write(img if img is not None else frames.gameplay(t))
+    writer.release()
+    return matches
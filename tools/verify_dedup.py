@@ -0,0 +1,33 @@
+import argparse
+from src.core.config import Config
+from src.video.handler import extract_and_classify_frames
+
+
+def main():
+    """
+    重複フレーム省略の有無で走査し、フレームごとの画面種別と試合数が一致するかを確認する。
+    """
+    parser = argparse.ArgumentParser(description="重複フレーム省略の精度確認")
+    parser.add_argument("--input", required=True, help="入力動画ファイルのパス")
+    parser.add_argument("--config", default="config/config.yaml", help="設定ファイルのパス")
+    parser.add_argument("--tolerance", type=float, default=None, help="許容値（省略時は設定ファイルの値）")
+    args = parser.parse_args()
+
+    config = Config(args.config)
+    frame_interval = config.get("video", "frame_interval")
+    sampling = config.get("video", "sampling", default="grab")
+    tolerance = args.tolerance if args.tolerance is not None else config.get("video", "dedup", "tolerance", default=2.0)
+
+    _, full_count, full_rows = extract_and_classify_frames(args.input, frame_interval, None, args.config, sampling)
+    _, dedup_count, dedup_rows = extract_and_classify_frames(
+        args.input, frame_interval, None, args.config, sampling, dedup_tolerance=tolerance
+    )
+
+    mismatches = [(a["frame"], a["screen_type"], b["screen_type"]) for a, b in zip(full_rows, dedup_rows) if a["screen_type"] != b["screen_type"]]
+    print(f"許容値 {tolerance}: 試合数 {full_count} / {dedup_count}、画面種別の不一致 {len(mismatches)} 件")
+    for frame, full_type, dedup_type in mismatches[:20]:
+        print(f"  {frame}: {full_type} → {dedup_type}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import argparse
+import random
+import time
+from src.core.config import Config
+from src.ocr import Matcher
+from src.ocr.scorer import matching_scorer_for_player_name, matching_scorer_for_unit_name
+
+
+def add_noise(text: str, alphabet: list[str], rng: random.Random) -> str:
+    """
+    OCRの誤認識を模して、文字の削除・挿入・置換をランダムに加える。
+    """
+    chars = list(text)
+    for _ in range(rng.randint(0, 3)):
+        op = rng.random()
+        if op < 0.3 and chars:
+            chars.pop(rng.randrange(len(chars)))
+        elif op < 0.6:
+            chars.insert(rng.randrange(len(chars) + 1), rng.choice(alphabet))
+        elif chars:
+            chars[rng.randrange(len(chars))] = rng.choice(alphabet)
+    return "".join(chars)
+
+
+def main():
+    """
+    候補リストから作ったノイズ入りのクエリを、process.extractOne による照合（従来の方法）と
+    Matcher.match_texts で照合し、結果が一致するかと所要時間を比較する。
+    """
+    parser = argparse.ArgumentParser(description="候補マッチングの精度確認")
+    parser.add_argument("--config", default="config/config.yaml", help="設定ファイルのパス")
+    parser.add_argument("--frames", type=int, default=200, help="照合するフレーム数（1フレームにつき8領域）")
+    parser.add_argument("--seed", type=int, default=0, help="乱数の種")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    matcher = Matcher(Config(args.config))
+    alphabet = sorted(set("".join(matcher.player_candidates + matcher.unit_candidates)))
+    frames = []
+    for _ in range(args.frames):
+        texts = {}
+        for n in range(1, 5):
+            if matcher.player_candidates:
+                texts[f"player{n}_name"] = add_noise(rng.choice(matcher.player_candidates), alphabet, rng)
+            texts[f"player{n}_unit"] = add_noise(rng.choice(matcher.unit_candidates), alphabet, rng)
+        frames.append(texts)
+
+    start = time.perf_counter()
+    expected = [
+        {
+            key: matcher.match_candidate(text, matcher.player_candidates, matching_scorer_for_player_name)
+            if "name" in key else matcher.match_candidate(text, matcher.unit_candidates, matching_scorer_for_unit_name)
+            for key, text in texts.items()
+        }
+        for texts in frames
+    ]
+    extract_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = [matcher.match_texts(texts) for texts in frames]
+    index_time = time.perf_counter() - start
+
+    mismatches = [(texts[key], a[key], b[key]) for texts, a, b in zip(frames, expected, actual) for key in a if a[key] != b[key]]
+    print(f"候補数: プレイヤー名 {len(matcher.player_candidates)}、機体名 {len(matcher.unit_candidates)}")
+    print(f"extractOne: {extract_time:.2f} 秒、match_texts: {index_time:.2f} 秒")
+    print(f"{args.frames} フレーム中、結果の不一致 {len(mismatches)} 件")
+    for text, a, b in mismatches[:20]:
+        print(f"  {text}: {a} → {b}")
+
+
+if __name__ == "__main__":
+    main()
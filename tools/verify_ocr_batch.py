@@ -0,0 +1,60 @@
+import argparse
+import glob
+import os
+import time
+import cv2
+from src.core.config import Config
+from src.ocr import Matcher, create_ocr_engine, ocr_on_matching_frames, ocr_on_matching_regions
+
+
+def main():
+    """
+    マッチング画面のフレーム画像を、領域ごとのOCRと8領域をまとめたOCRで処理し、
+    候補マッチング後の結果が一致するか、OCRの呼び出し回数と所要時間がどれだけ減るかを確認する。
+    """
+    parser = argparse.ArgumentParser(description="まとめたOCRの精度確認")
+    parser.add_argument("--input", required=True, help="マッチング画面のフレーム画像（PNG）のディレクトリ")
+    parser.add_argument("--config", default="config/config.yaml", help="設定ファイルのパス")
+    parser.add_argument("--frames", type=int, default=None, help="1回のOCRにまとめるフレーム数（省略時は設定ファイルの値）")
+    parser.add_argument("--engine", choices=["pytesseract", "tesserocr"], default="pytesseract", help="OCRエンジン")
+    args = parser.parse_args()
+
+    config = Config(args.config)
+    config.as_dict().setdefault("ocr", {})["batch"] = {
+        **(config.get("ocr", "batch", default={}) or {}), "enabled": False,
+    }
+    frames_per_call = args.frames or config.get("ocr", "batch", "frames", default=1)
+    matcher = Matcher(config)
+    paths = sorted(glob.glob(os.path.join(args.input, "*.png")))
+    imgs = [cv2.imread(path) for path in paths]
+
+    engine = create_ocr_engine(config, backend=args.engine)
+    start = time.perf_counter()
+    single = [ocr_on_matching_regions(img, config, matcher, engine) for img in imgs]
+    single_time = time.perf_counter() - start
+    single_calls = engine.calls
+
+    engine.calls = 0
+    start = time.perf_counter()
+    batched = []
+    for i in range(0, len(imgs), frames_per_call):
+        batched += ocr_on_matching_frames(imgs[i:i + frames_per_call], config, matcher, engine)
+    batched_time = time.perf_counter() - start
+    batched_calls = engine.calls
+    engine.close()
+
+    mismatches = [
+        (os.path.basename(path), key, a[key], b[key])
+        for path, a, b in zip(paths, single, batched)
+        for key in a
+        if a[key] != b[key]
+    ]
+    print(f"領域ごと: OCR {single_calls} 回、{single_time:.2f} 秒")
+    print(f"まとめて（{frames_per_call} フレームずつ）: OCR {batched_calls} 回、{batched_time:.2f} 秒")
+    print(f"{len(paths)} フレーム中、結果の不一致 {len(mismatches)} 件")
+    for name, key, a, b in mismatches[:20]:
+        print(f"  {name} {key}: {a} → {b}")
+
+
+if __name__ == "__main__":
+    main()